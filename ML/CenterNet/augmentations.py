@@ -2,6 +2,7 @@ import torch
 import random
 import numpy as np
 from torch.utils.data import Dataset
+from torch.utils.data.dataloader import default_collate
 from itertools import product
 
 
@@ -90,3 +91,75 @@ class AugmentedRadarDataset(Dataset):
         heatmap = heatmap.clone()
         return (torch.roll(image, shifts=shift_amount, dims=1),
                 torch.roll(heatmap, shifts=shift_amount, dims=1))
+
+
+class BatchAugmenter:
+    """
+    Random augmentations applied to whole collated [B, 1, azimuth, range] batches.
+
+    Every sample gets its own random parameters on every call, so each epoch sees
+    new variants instead of the fixed expansion of AugmentedRadarDataset. Use it as
+    a DataLoader `collate_fn` (runs in the workers) or call it in the training loop.
+    """
+
+    def __init__(self, flip_prob=0.5, shift_fraction=0.15, jitter=0.1, clip_prob=0.0, clip_std=(2/3, 3.0)):
+        """
+        Args:
+            flip_prob: Probability of flipping a sample along azimuth
+            shift_fraction: Maximum circular azimuth shift as a fraction of the azimuth size
+            jitter: Maximum relative intensity gain change, 0 disables it
+            clip_prob: Probability of clipping a sample at mean + k * std and renormalizing,
+                       like the clipping in yolo_infer.run_model
+            clip_std: (min, max) range k is drawn from
+        """
+        self.flip_prob = flip_prob
+        self.shift_fraction = shift_fraction
+        self.jitter = jitter
+        self.clip_prob = clip_prob
+        self.clip_std = clip_std
+
+    def collate(self, batch):
+        images, heatmaps = default_collate(batch)
+        return self(images, heatmaps)
+
+    def __call__(self, images, heatmaps):
+        batch_size, _, height, _ = images.shape
+        device = images.device
+
+        # Flip and circular shift along azimuth as a single gather of source rows
+        rows = torch.arange(height, device=device).expand(batch_size, -1)
+        max_shift = int(height * self.shift_fraction)
+        if max_shift > 0:
+            shifts = torch.randint(-max_shift, max_shift + 1, (batch_size, 1), device=device)
+            rows = (rows - shifts) % height
+        if self.flip_prob > 0:
+            flip = torch.rand(batch_size, 1, device=device) < self.flip_prob
+            rows = torch.where(flip, height - 1 - rows, rows)
+        if max_shift > 0 or self.flip_prob > 0:
+            images = self._gather_rows(images, rows)
+            heatmaps = self._gather_rows(heatmaps, rows)
+
+        # Intensity gain jitter, images stay in [0, 1]
+        if self.jitter > 0:
+            gain = 1 + (torch.rand(batch_size, 1, 1, 1, device=device) * 2 - 1) * self.jitter
+            images = (images * gain).clamp_(0, 1)
+
+        # Clip bright returns at mean + k * std, then renormalize to [0, 1]
+        if self.clip_prob > 0:
+            clip = (torch.rand(batch_size, device=device) < self.clip_prob).view(-1, 1, 1, 1)
+            k = torch.empty(batch_size, 1, 1, 1, device=device).uniform_(*self.clip_std)
+            flat = images.flatten(1)
+            upper = flat.mean(1).view(-1, 1, 1, 1) + k * flat.std(1).view(-1, 1, 1, 1)
+            clipped = torch.minimum(images, upper)
+            low = clipped.flatten(1).min(1).values.view(-1, 1, 1, 1)
+            high = clipped.flatten(1).max(1).values.view(-1, 1, 1, 1)
+            clipped = (clipped - low) / (high - low + 1e-8)
+            images = torch.where(clip, clipped, images)
+
+        return images, heatmaps
+
+    @staticmethod
+    def _gather_rows(batch, rows):
+        """batch[b, :, rows[b], :] for every sample b"""
+        index = rows.view(rows.shape[0], 1, -1, 1).expand(-1, batch.shape[1], -1, batch.shape[3])
+        return torch.gather(batch, 2, index)
@@ -0,0 +1,87 @@
+# Epoch time of the enumerated AugmentedRadarDataset expansion vs per-batch random augmentation
+#
+# --load-ms simulates the per-sample read cost of the base dataset (JSON parsing or store reads).
+import time
+import argparse
+import torch
+from torch.utils.data import DataLoader, Dataset
+from augmentations import AugmentedRadarDataset, BatchAugmenter
+
+
+class SyntheticPPIDataset(Dataset):
+    def __init__(self, n_samples, rows, cols, load_ms):
+        self.images = torch.rand(n_samples, 1, rows, cols)
+        self.heatmaps = torch.rand(n_samples, 1, rows, cols)
+        self.load_ms = load_ms
+
+    def __len__(self):
+        return len(self.images)
+
+    def __getitem__(self, idx):
+        if self.load_ms:
+            time.sleep(self.load_ms / 1000)
+        return self.images[idx].clone(), self.heatmaps[idx].clone()
+
+
+def epoch_seconds(loader, step=None):
+    start = time.perf_counter()
+    samples = 0
+    for images, heatmaps in loader:
+        if step is not None:
+            step(images, heatmaps)
+        samples += len(images)
+    return time.perf_counter() - start, samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Augmentation epoch time benchmark')
+    parser.add_argument('--samples', type=int, default=64)
+    parser.add_argument('--rows', type=int, default=720)
+    parser.add_argument('--cols', type=int, default=1000)
+    parser.add_argument('--batch-size', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=0)
+    parser.add_argument('--load-ms', type=float, default=20.0, help='Simulated per-sample load time')
+    parser.add_argument('--train-step', action='store_true',
+                        help='Include a CenterNet forward/backward pass per batch')
+    args = parser.parse_args()
+
+    base = SyntheticPPIDataset(args.samples, args.rows, args.cols, args.load_ms)
+    step = None
+    if args.train_step:
+        from centernetresnet import CenterNetBackbone, FocalLoss
+        model = CenterNetBackbone(in_channels=1)
+        criterion = FocalLoss()
+        optimizer = torch.optim.Adam(model.parameters(), lr=1e-3)
+
+        def step(images, heatmaps):
+            optimizer.zero_grad()
+            loss = criterion(model(images), heatmaps.clamp(0, 1))
+            loss.backward()
+            optimizer.step()
+
+    enumerated = AugmentedRadarDataset(base, flip_prob=0.5, num_shifts=3, shift_fraction=0.15)
+    augmenter = BatchAugmenter(flip_prob=0.5, shift_fraction=0.15, jitter=0.1)
+
+    loaders = {
+        'enumerated': DataLoader(enumerated, batch_size=args.batch_size, shuffle=True, num_workers=args.workers),
+        'batch (collate)': DataLoader(base, batch_size=args.batch_size, shuffle=True, num_workers=args.workers,
+                                      collate_fn=augmenter.collate),
+    }
+
+    print(f"{args.samples} base samples {args.rows}x{args.cols}, batch {args.batch_size}, "
+          f"{args.workers} workers, {args.load_ms} ms simulated load")
+    print(f"{'pipeline':>16} {'samples/epoch':>14} {'epoch s':>8} {'ms/sample':>10}")
+    for name, loader in loaders.items():
+        seconds, samples = epoch_seconds(loader, step)
+        print(f"{name:>16} {samples:>14} {seconds:>8.2f} {seconds / samples * 1000:>10.2f}")
+
+    # Cost of the augmentation itself on one collated batch
+    images, heatmaps = next(iter(DataLoader(base, batch_size=args.batch_size)))
+    start = time.perf_counter()
+    for _ in range(10):
+        augmenter(images, heatmaps)
+    print(f"BatchAugmenter: {(time.perf_counter() - start) / 10 * 1000:.2f} ms per batch of {args.batch_size}")
+
+
+if __name__ == "__main__":
+    main()
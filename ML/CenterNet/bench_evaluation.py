@@ -0,0 +1,94 @@
+# Per-sample evaluate_model loop vs the batched evaluation engine
+import time
+import argparse
+import numpy as np
+import torch
+from torch.utils.data import TensorDataset
+from centernetresnet import CenterNetBackbone, detect_points
+from dataset import ship_centers, render_heatmaps
+from evaluation import evaluate, distance_matrix, match_greedy, match_hungarian
+from test import calculate_metrics
+
+
+def evaluate_per_sample(model, dataset, device, distance_thresholds, threshold=0.3):
+    """test.evaluate_model as it was: batch-1 inference and calculate_metrics per threshold"""
+    counts = {d: np.zeros(3, dtype=np.int64) for d in distance_thresholds}
+    for image, target_heatmap in dataset:
+        with torch.no_grad():
+            pred_heatmap = model(image.unsqueeze(0).to(device))[0, 0].cpu()
+        target_points = detect_points(target_heatmap[0], threshold=threshold)
+        pred_points = detect_points(pred_heatmap, threshold=threshold)
+        for d in distance_thresholds:
+            counts[d] += calculate_metrics(pred_points, target_points, distance_threshold=d)
+    return counts
+
+
+def synthetic(n_samples, rows, cols, rng):
+    centers = []
+    for _ in range(n_samples):
+        ships = rng.uniform([0, 0], [360, 5000], (rng.integers(30, 121), 2))
+        centers.append(ship_centers(ships, (rows, cols), (rows, cols), 5000))
+    heatmaps = torch.from_numpy(render_heatmaps(centers, (rows, cols), sigma=2).astype(np.float32)).unsqueeze(1)
+    return heatmaps
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluation engine benchmark')
+    parser.add_argument('--rows', type=int, default=720)
+    parser.add_argument('--cols', type=int, default=1000)
+    parser.add_argument('--samples', type=int, default=16)
+    parser.add_argument('--batch-size', type=int, default=None, help='Default: 8')
+    parser.add_argument('--thresholds', type=float, nargs='+', default=[5, 10, 20])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+
+    # Matching alone on realistic point sets
+    point_sets = []
+    for _ in range(200):
+        gt = rng.uniform(0, 1000, (rng.integers(30, 121), 2))
+        pred = np.concatenate([gt + rng.normal(0, 4, gt.shape), rng.uniform(0, 1000, (10, 2))])
+        point_sets.append(([tuple(p) for p in rng.permutation(pred)], [tuple(g) for g in gt]))
+
+    start = time.perf_counter()
+    loop_tp = sum(np.array([calculate_metrics(p, g, d)[0] for d in args.thresholds]) for p, g in point_sets)
+    loop_s = time.perf_counter() - start
+    start = time.perf_counter()
+    greedy_tp = sum(match_greedy(distance_matrix(p, g), args.thresholds) for p, g in point_sets)
+    greedy_s = time.perf_counter() - start
+    start = time.perf_counter()
+    hungarian_tp = sum(match_hungarian(distance_matrix(p, g), args.thresholds) for p, g in point_sets)
+    hungarian_s = time.perf_counter() - start
+    assert np.array_equal(loop_tp, greedy_tp)
+
+    print(f"Matching 200 images, thresholds {args.thresholds}")
+    print(f"  calculate_metrics loop: {loop_s * 1000:8.1f} ms, TP {loop_tp.tolist()}")
+    print(f"  vectorized greedy:      {greedy_s * 1000:8.1f} ms, TP {greedy_tp.tolist()}")
+    print(f"  hungarian:              {hungarian_s * 1000:8.1f} ms, TP {hungarian_tp.tolist()}")
+
+    # End to end with the real network
+    heatmaps = synthetic(args.samples, args.rows, args.cols, rng)
+    images = torch.clamp(heatmaps + torch.rand(heatmaps.shape) * 0.3, 0, 1)
+    dataset = TensorDataset(images, heatmaps)
+    model = CenterNetBackbone(in_channels=1).to(device).eval()
+
+    start = time.perf_counter()
+    reference = evaluate_per_sample(model, dataset, device, args.thresholds)
+    per_sample_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = evaluate(model, dataset, device, distance_thresholds=args.thresholds, batch_size=args.batch_size)
+    engine_s = time.perf_counter() - start
+
+    for d in args.thresholds:
+        r = results[d]
+        assert [r['true_positives'], r['false_positives'], r['false_negatives']] == reference[d].tolist()
+
+    print(f"End to end, {args.samples} samples {args.rows}x{args.cols}, untrained CenterNet")
+    print(f"  per-sample loop x{len(args.thresholds)} thresholds: {per_sample_s:6.2f} s")
+    print(f"  batched engine, all thresholds:   {engine_s:6.2f} s ({per_sample_s / engine_s:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
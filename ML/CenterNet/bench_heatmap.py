@@ -0,0 +1,107 @@
+# Compares vectorized heatmap rendering against the former per-ship loop
+import time
+import argparse
+import numpy as np
+from dataset import gaussian_kernel, ship_centers, render_heatmaps
+
+
+def generate_heatmap_loop(ships, output_size, original_size, radar_range, sigma):
+    """PPIDataset.generate_heatmap as it was before vectorization, kept as the reference"""
+    heatmap = np.zeros(output_size)
+
+    for ship in ships:
+        x, y = ship['Azimuth'], ship['Distance']
+
+        if output_size != original_size:
+            x = x * (output_size[1] / original_size[1])
+            y = y * (output_size[0] / original_size[0])
+
+        x_scaled = int(x / 360 * output_size[0])
+        y_scaled = int(y / radar_range * output_size[1])
+
+        x_scaled = min(max(0, x_scaled), output_size[0] - 1)
+        y_scaled = min(max(0, y_scaled), output_size[1] - 1)
+
+        tmp_size = 6 * sigma + 1
+        g = np.zeros((tmp_size, tmp_size))
+        center = tmp_size // 2
+        for i in range(tmp_size):
+            for j in range(tmp_size):
+                g[i, j] = np.exp(-((i-center)**2 + (j-center)
+                                 ** 2) / (2*sigma**2))
+
+        x_left = max(0, x_scaled - center)
+        x_right = min(output_size[0], x_scaled + center + 1)
+        y_left = max(0, y_scaled - center)
+        y_right = min(output_size[1], y_scaled + center + 1)
+
+        g_x_left = max(0, center-(x_scaled-x_left))
+        g_x_right = min(tmp_size, center+(x_right-x_scaled))
+        g_y_left = max(0, center-(y_scaled-y_left))
+        g_y_right = min(tmp_size, center+(y_right-y_scaled))
+
+        heatmap[x_left:x_right, y_left:y_right] = np.maximum(
+            heatmap[x_left:x_right, y_left:y_right],
+            g[g_x_left:g_x_right, g_y_left:g_y_right]
+        )
+
+    return heatmap
+
+
+def random_ships(n_ships, radar_range, rng):
+    # Includes ships on and beyond the edges to exercise clipping
+    return [{'Azimuth': float(rng.uniform(-5, 365)), 'Distance': float(rng.uniform(-50, radar_range + 50))}
+            for _ in range(n_ships)]
+
+
+def median_ms(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return np.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Heatmap rendering micro-benchmark')
+    parser.add_argument('--rows', type=int, default=720)
+    parser.add_argument('--cols', type=int, default=1000)
+    parser.add_argument('--ships', type=int, nargs='+', default=[30, 60, 120])
+    parser.add_argument('--sigma', type=int, default=2)
+    parser.add_argument('--batch', type=int, default=16)
+    parser.add_argument('--repeats', type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    size = (args.rows, args.cols)
+    radar_range = 5000
+    gaussian_kernel(args.sigma)
+
+    print(f"Heatmap {args.rows}x{args.cols}, sigma {args.sigma}, median of {args.repeats} runs")
+    print(f"{'ships':>6} {'loop ms':>8} {'vectorized ms':>14} {'batched ms/img':>15} {'speedup':>8}")
+
+    for n_ships in args.ships:
+        samples = [random_ships(n_ships, radar_range, rng) for _ in range(args.batch)]
+
+        # Identical output, including a resized heatmap
+        for output_size in (size, (args.rows // 2, args.cols // 2)):
+            reference = [generate_heatmap_loop(s, output_size, size, radar_range, args.sigma) for s in samples]
+            centers = [ship_centers(s, output_size, size, radar_range) for s in samples]
+            assert np.array_equal(np.stack(reference), render_heatmaps(centers, output_size, args.sigma))
+
+        def vectorized():
+            render_heatmaps([ship_centers(samples[0], size, size, radar_range)], size, args.sigma)
+
+        def batched():
+            render_heatmaps([ship_centers(s, size, size, radar_range) for s in samples], size, args.sigma)
+
+        loop_ms = median_ms(lambda: generate_heatmap_loop(samples[0], size, size, radar_range, args.sigma),
+                            args.repeats)
+        vector_ms = median_ms(vectorized, args.repeats)
+        batch_ms = median_ms(batched, args.repeats) / args.batch
+        print(f"{n_ships:>6} {loop_ms:>8.2f} {vector_ms:>14.2f} {batch_ms:>15.2f} {loop_ms / vector_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
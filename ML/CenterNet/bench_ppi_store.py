@@ -0,0 +1,82 @@
+# DataLoader throughput of the JSON dataset vs the memory-mapped PPI store
+#
+# python bench_ppi_store.py --samples 64 --workers 0 2 8
+# Pass --json-dir to use a real dataset instead of generated samples.
+import os
+import json
+import time
+import argparse
+import tempfile
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+from dataset import PPIDataset
+from ppi_store import PPIStoreDataset, convert
+
+
+def write_samples(json_dir, n_samples, rows, cols, rng):
+    for i in range(n_samples):
+        data = {
+            'PPI': rng.integers(0, 2000, (rows, cols)).tolist(),
+            'ships': [{'Azimuth': float(rng.uniform(0, 360)), 'Distance': float(rng.uniform(0, 5000))}
+                      for _ in range(rng.integers(30, 120))],
+            'range': 5000,
+        }
+        with open(os.path.join(json_dir, f'radar_{i}.json'), 'w') as f:
+            json.dump(data, f)
+
+
+def samples_per_second(dataset, workers, batch_size, epochs):
+    loader = DataLoader(dataset, batch_size=batch_size, shuffle=True, num_workers=workers,
+                        persistent_workers=workers > 0)
+    timings = []
+    for _ in range(epochs):
+        start = time.perf_counter()
+        for _ in loader:
+            pass
+        timings.append(time.perf_counter() - start)
+    # The first epoch includes worker startup
+    return len(dataset) / min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PPI store DataLoader benchmark')
+    parser.add_argument('--json-dir', default=None, help='Existing dataset (default: generate one)')
+    parser.add_argument('--samples', type=int, default=64)
+    parser.add_argument('--rows', type=int, default=720)
+    parser.add_argument('--cols', type=int, default=1000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 2, 8])
+    parser.add_argument('--batch-size', type=int, default=4)
+    parser.add_argument('--epochs', type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_dir = args.json_dir
+        if json_dir is None:
+            json_dir = os.path.join(tmp, 'json')
+            os.makedirs(json_dir)
+            write_samples(json_dir, args.samples, args.rows, args.cols, np.random.default_rng(0))
+
+        store_dir = os.path.join(tmp, 'store')
+        start = time.perf_counter()
+        convert(json_dir, store_dir)
+        print(f"Conversion: {time.perf_counter() - start:.1f} s")
+
+        json_dataset = PPIDataset(json_dir)
+        store_dataset = PPIStoreDataset(store_dir)
+
+        # Both paths must produce the same samples
+        for idx in range(min(4, len(json_dataset))):
+            for a, b in zip(json_dataset[idx], store_dataset[idx]):
+                assert torch.equal(a, b)
+
+        print(f"{len(json_dataset)} samples, batch size {args.batch_size}, best of {args.epochs} epochs")
+        print(f"{'workers':>7} {'json samples/s':>15} {'store samples/s':>16} {'speedup':>8}")
+        for workers in args.workers:
+            json_rate = samples_per_second(json_dataset, workers, args.batch_size, args.epochs)
+            store_rate = samples_per_second(store_dataset, workers, args.batch_size, args.epochs)
+            print(f"{workers:>7} {json_rate:>15.1f} {store_rate:>16.1f} {store_rate / json_rate:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 # dataset.py
 import os
 import json
+from functools import lru_cache
 import numpy as np
 import torch
 from torch.utils.data import Dataset
@@ -8,8 +9,84 @@ from torchvision import transforms
 from PIL import Image
 
 
+@lru_cache(maxsize=None)
+def gaussian_kernel(sigma):
+    """(6*sigma+1)^2 Gaussian with a peak of 1, computed once per sigma"""
+    tmp_size = 6 * sigma + 1
+    center = tmp_size // 2
+    offsets = np.arange(tmp_size) - center
+    g = np.exp(-(offsets[:, None] ** 2 + offsets[None, :] ** 2) / (2 * sigma ** 2))
+    g.flags.writeable = False
+    return g
+
+
+def ship_centers(ships, output_size, original_size, radar_range):
+    """
+    Heatmap (azimuth row, range column) of every ship
+
+    Args:
+        ships: List of ship dicts with 'Azimuth' and 'Distance', or a [N, 2] array of them
+        output_size: (height, width) of the heatmap
+        original_size: (height, width) of the source PPI
+        radar_range: Radar range in the units of 'Distance'
+    """
+    if len(ships) and isinstance(ships[0], dict):
+        ships = [(ship['Azimuth'], ship['Distance']) for ship in ships]
+    ships = np.asarray(ships, dtype=np.float64).reshape(-1, 2)
+    x, y = ships[:, 0], ships[:, 1]
+
+    # Scale coordinates if output size is different from original size
+    if tuple(output_size) != tuple(original_size):
+        x = x * (output_size[1] / original_size[1])
+        y = y * (output_size[0] / original_size[0])
+
+    # Truncate towards zero like int()
+    x_scaled = np.trunc(x / 360 * output_size[0]).astype(np.int64)
+    y_scaled = np.trunc(y / radar_range * output_size[1]).astype(np.int64)
+
+    # Ensure coordinates are within bounds
+    x_scaled = np.clip(x_scaled, 0, output_size[0] - 1)
+    y_scaled = np.clip(y_scaled, 0, output_size[1] - 1)
+    return x_scaled, y_scaled
+
+
+def render_heatmaps(centers, output_size, sigma):
+    """
+    Render the Gaussians of several samples with one scatter-max
+
+    Args:
+        centers: List of (rows, cols) arrays from ship_centers, one per sample
+        output_size: (height, width) of each heatmap
+        sigma: Standard deviation of the Gaussian kernel
+
+    Returns:
+        np.ndarray: float64 [len(centers), height, width]
+    """
+    heatmaps = np.zeros((len(centers), *output_size))
+    g = gaussian_kernel(sigma)
+    center = g.shape[0] // 2
+    offsets = np.arange(g.shape[0]) - center
+
+    sample_idx = np.concatenate([np.full(len(rows), i) for i, (rows, _) in enumerate(centers)] + [[]]).astype(np.int64)
+    rows = np.concatenate([rows for rows, _ in centers] + [[]]).astype(np.int64)
+    cols = np.concatenate([cols for _, cols in centers] + [[]]).astype(np.int64)
+
+    # Every (ship, kernel row, kernel column) combination, clipped at the borders
+    patch_rows = rows[:, None, None] + offsets[None, :, None]
+    patch_cols = cols[:, None, None] + offsets[None, None, :]
+    patch_rows, patch_cols = np.broadcast_arrays(patch_rows, patch_cols)
+    valid = ((patch_rows >= 0) & (patch_rows < output_size[0]) &
+             (patch_cols >= 0) & (patch_cols < output_size[1]))
+    samples = np.broadcast_to(sample_idx[:, None, None], valid.shape)
+    values = np.broadcast_to(g, valid.shape)
+
+    flat_idx = np.ravel_multi_index((samples[valid], patch_rows[valid], patch_cols[valid]), heatmaps.shape)
+    np.maximum.at(heatmaps.reshape(-1), flat_idx, values[valid])
+    return heatmaps
+
+
 class PPIDataset(Dataset):
-    def __init__(self, json_dir, output_size=None, sigma=2, transform=None):
+    def __init__(self, json_dir, output_size=None, sigma=2, transform=None, cache_heatmaps=False):
         """
         Args:
             json_dir: Directory containing JSON files
@@ -17,10 +94,13 @@ class PPIDataset(Dataset):
                         If None, uses original image size
             sigma: Standard deviation for Gaussian kernel
             transform: Optional transform to be applied on the image
+            cache_heatmaps: Save rendered heatmaps as .npy files next to the
+                        source files and reuse them on later reads
         """
         self.json_dir = json_dir
         self.transform = transform
         self.sigma = sigma
+        self.cache_heatmaps = cache_heatmaps
         self.json_files = [file for file in os.listdir(
             json_dir) if file.endswith('.json')]
 
@@ -35,60 +115,65 @@ class PPIDataset(Dataset):
             self.output_size = output_size
 
     def generate_heatmap(self, ships, original_size, radar_range):
-        heatmap = np.zeros(self.output_size)
-
-        for ship in ships:
-            # Get original coordinates
-            x, y = ship['Azimuth'], ship['Distance']
-
-            # Scale coordinates if output size is different from original size
-            if self.output_size != original_size:
-                x = x * (self.output_size[1] / original_size[1])
-                y = y * (self.output_size[0] / original_size[0])
-
-            # Convert normalized coordinates (if they are normalized)
-            # x_scaled = int(x * self.output_size[1] if x <= 1 else x)
-            # y_scaled = int(y * self.output_size[0] if y <= 1 else y)
-            x_scaled = int(x / 360 * self.output_size[0])
-            y_scaled = int(y / radar_range * self.output_size[1])
-
-            # Ensure coordinates are within bounds
-            x_scaled = min(max(0, x_scaled), self.output_size[0] - 1)
-            y_scaled = min(max(0, y_scaled), self.output_size[1] - 1)
-
-            # Generate 2D Gaussian
-            tmp_size = 6 * self.sigma + 1
-            g = np.zeros((tmp_size, tmp_size))
-            center = tmp_size // 2
-            for i in range(tmp_size):
-                for j in range(tmp_size):
-                    g[i, j] = np.exp(-((i-center)**2 + (j-center)
-                                     ** 2) / (2*self.sigma**2))
-
-            # Add Gaussian to heatmap
-            x_left = max(0, x_scaled - center)
-            x_right = min(self.output_size[0], x_scaled + center + 1)
-            y_left = max(0, y_scaled - center)
-            y_right = min(self.output_size[1], y_scaled + center + 1)
-
-            g_x_left = max(0, center-(x_scaled-x_left))
-            g_x_right = min(tmp_size, center+(x_right-x_scaled))
-            g_y_left = max(0, center-(y_scaled-y_left))
-            g_y_right = min(tmp_size, center+(y_right-y_scaled))
-
-            heatmap[x_left:x_right, y_left:y_right] = np.maximum(
-                heatmap[x_left:x_right, y_left:y_right],
-                g[g_x_left:g_x_right, g_y_left:g_y_right]
-            )
-
+        return self.generate_heatmaps([ships], [original_size], [radar_range])[0]
+
+    def generate_heatmaps(self, ships_list, original_sizes, radar_ranges):
+        """Heatmaps of several samples at once, float64 [n, height, width]"""
+        centers = [ship_centers(ships, self.output_size, original_size, radar_range)
+                   for ships, original_size, radar_range in zip(ships_list, original_sizes, radar_ranges)]
+        return render_heatmaps(centers, self.output_size, self.sigma)
+
+    def heatmap_cache_path(self, idx):
+        name = os.path.splitext(self.json_files[idx])[0]
+        height, width = self.output_size
+        return os.path.join(self.json_dir, f'{name}.heatmap_s{self.sigma}_{height}x{width}.npy')
+
+    def source_path(self, idx):
+        """File the sample is read from, used to invalidate cached heatmaps"""
+        return os.path.join(self.json_dir, self.json_files[idx])
+
+    def load_heatmap(self, idx, ships, original_size, radar_range):
+        """Heatmap of a sample, read from or written to the on-disk cache if enabled"""
+        if not self.cache_heatmaps:
+            return self.generate_heatmap(ships, original_size, radar_range)
+
+        cache_path = self.heatmap_cache_path(idx)
+        if (os.path.exists(cache_path) and
+                os.path.getmtime(cache_path) >= os.path.getmtime(self.source_path(idx))):
+            return np.load(cache_path)
+
+        heatmap = self.generate_heatmap(ships, original_size, radar_range).astype(np.float32)
+        self.save_heatmap(cache_path, heatmap)
         return heatmap
 
+    @staticmethod
+    def save_heatmap(cache_path, heatmap):
+        # Written under a temporary name so concurrent DataLoader workers never read a partial file
+        tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, heatmap)
+        os.replace(tmp_path, cache_path)
+
+    def precompute_heatmaps(self, batch_size=64):
+        """Fill the on-disk heatmap cache for every sample, rendering `batch_size` samples at a time"""
+        for start in range(0, len(self), batch_size):
+            indices = range(start, min(start + batch_size, len(self)))
+            samples = [self.load_sample(idx) for idx in indices]
+            heatmaps = self.generate_heatmaps(
+                [ships for _, ships, _ in samples],
+                [ppi_array.shape for ppi_array, _, _ in samples],
+                [radar_range for _, _, radar_range in samples]
+            ).astype(np.float32)
+            for idx, heatmap in zip(indices, heatmaps):
+                self.save_heatmap(self.heatmap_cache_path(idx), heatmap)
+
     def __len__(self):
         return len(self.json_files)
 
    
 
-    def __getitem__(self, idx):
+    def load_sample(self, idx):
+        """Returns the raw PPI array, ship list and radar range of a sample"""
         json_path = os.path.join(self.json_dir, self.json_files[idx])
 
         with open(json_path, 'r') as file:
@@ -96,6 +181,10 @@ class PPIDataset(Dataset):
 
         # Load PPI array
         ppi_array = np.array(data['PPI'], dtype=np.float32)
+        return ppi_array, data['ships'], data['range']
+
+    def __getitem__(self, idx):
+        ppi_array, ships, radar_range = self.load_sample(idx)
         original_size = ppi_array.shape
 
         # Resize if necessary
@@ -114,8 +203,8 @@ class PPIDataset(Dataset):
         image = torch.FloatTensor(ppi_array).unsqueeze(0)
 
         # Generate heatmap from ship coordinates
-        heatmap = self.generate_heatmap(
-            data['ships'], original_size, data['range'])
+        heatmap = self.load_heatmap(
+            idx, ships, original_size, radar_range)
         heatmap = torch.FloatTensor(heatmap).unsqueeze(0)
 
         return image, heatmap
@@ -0,0 +1,175 @@
+# evaluation.py
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+from centernetresnet import detect_points_batched
+
+DEFAULT_DISTANCE_THRESHOLDS = (10,)
+
+MATCH_GREEDY = 'greedy'
+MATCH_HUNGARIAN = 'hungarian'
+
+
+def distance_matrix(pred_points, gt_points):
+    """[P, G] Euclidean distances between two lists of (x, y) points"""
+    pred = np.asarray(pred_points, dtype=np.float64).reshape(-1, 2)
+    gt = np.asarray(gt_points, dtype=np.float64).reshape(-1, 2)
+    return np.sqrt(((pred[:, None, :] - gt[None, :, :]) ** 2).sum(-1))
+
+
+def match_greedy(distances, thresholds):
+    """
+    True positives per threshold with the matching of test.calculate_metrics: every
+    prediction in order takes its closest still unmatched ground truth point if it is
+    within the threshold. All thresholds are matched together, one prediction at a time.
+
+    Args:
+        distances: [P, G] distance matrix
+        thresholds: [T] distance thresholds
+
+    Returns:
+        np.ndarray: [T] true positive counts
+    """
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    n_pred, n_gt = distances.shape
+    if n_pred == 0 or n_gt == 0:
+        return np.zeros(len(thresholds), dtype=np.int64)
+
+    matched = np.zeros((len(thresholds), n_gt), dtype=bool)
+    true_positives = np.zeros(len(thresholds), dtype=np.int64)
+    rows = np.arange(len(thresholds))
+
+    for pred_idx in range(n_pred):
+        candidates = np.where(matched, np.inf, distances[pred_idx][None, :])
+        closest = candidates.argmin(axis=1)
+        hit = candidates[rows, closest] <= thresholds
+        matched[rows[hit], closest[hit]] = True
+        true_positives += hit
+
+    return true_positives
+
+
+def match_hungarian(distances, thresholds):
+    """
+    True positives per threshold with an optimal one-to-one assignment: pairs further
+    apart than the threshold cannot be matched, the rest minimize the total distance
+    """
+    # Only needed for Hungarian matching
+    from scipy.optimize import linear_sum_assignment
+
+    true_positives = np.zeros(len(thresholds), dtype=np.int64)
+    if distances.size == 0:
+        return true_positives
+
+    for i, threshold in enumerate(thresholds):
+        allowed = distances <= threshold
+        if not allowed.any():
+            continue
+        # Out-of-threshold pairs cost more than any set of valid matches
+        cost = np.where(allowed, distances, distances[allowed].sum() + 1)
+        pred_idx, gt_idx = linear_sum_assignment(cost)
+        true_positives[i] = allowed[pred_idx, gt_idx].sum()
+
+    return true_positives
+
+
+def summarize(true_positives, n_pred, n_gt):
+    """Precision, recall and F1 from detection counts"""
+    false_positives = n_pred - true_positives
+    false_negatives = n_gt - true_positives
+    precision = true_positives / n_pred if n_pred > 0 else 0
+    recall = true_positives / n_gt if n_gt > 0 else 0
+    f1 = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0
+    return {
+        'precision': float(precision),
+        'recall': float(recall),
+        'f1': float(f1),
+        'true_positives': int(true_positives),
+        'false_positives': int(false_positives),
+        'false_negatives': int(false_negatives),
+    }
+
+
+def evaluate(model, data, device, distance_thresholds=DEFAULT_DISTANCE_THRESHOLDS, detection_threshold=0.3,
+             matching=MATCH_GREEDY, batch_size=None, num_workers=0, max_batches=None, detection_batch_size=16):
+    """
+    Detection metrics of a model for several matching distances in one pass
+
+    Args:
+        model: CenterNetBackbone
+        data: Dataset of (image, heatmap) pairs, or a DataLoader over one
+        device: torch.device to run inference on
+        distance_thresholds: Maximum pixel distances for a prediction to count as a hit
+        detection_threshold: Heatmap threshold passed to detect_points_batched
+        matching: MATCH_GREEDY (same counts as test.calculate_metrics) or MATCH_HUNGARIAN
+        batch_size: Batch size when `data` is a Dataset, 8 by default
+        num_workers: DataLoader workers when `data` is a Dataset
+        max_batches: Optional limit on the number of batches evaluated
+        detection_batch_size: Heatmaps gathered across forward passes before their points
+                    are extracted in one detect_points_batched call each for predictions
+                    and targets
+
+    Returns:
+        dict: distance threshold -> metrics dict (precision, recall, f1, true_positives,
+              false_positives, false_negatives)
+    """
+    if matching not in (MATCH_GREEDY, MATCH_HUNGARIAN):
+        raise ValueError(f"Unknown matching method: {matching}")
+    match = match_greedy if matching == MATCH_GREEDY else match_hungarian
+
+    if batch_size is None:
+        batch_size = 8
+    # oneDNN convolutions on CPU run fastest on NHWC, the layout the weights are
+    # converted to for the pass and back from afterwards
+    memory_format = torch.channels_last if device.type == 'cpu' else torch.preserve_format
+
+    loader = data if isinstance(data, DataLoader) else DataLoader(
+        data, batch_size=batch_size, shuffle=False, num_workers=num_workers,
+        pin_memory=device.type == 'cuda'
+    )
+
+    thresholds = list(distance_thresholds)
+    true_positives = np.zeros(len(thresholds), dtype=np.int64)
+    total_pred = 0
+    total_gt = 0
+
+    pending_pred, pending_target = [], []
+
+    def flush():
+        nonlocal total_pred, total_gt, true_positives
+        if not pending_pred:
+            return
+        pred_points = detect_points_batched(torch.cat(pending_pred), threshold=detection_threshold)
+        target_points = detect_points_batched(torch.cat(pending_target), threshold=detection_threshold)
+        pending_pred.clear()
+        pending_target.clear()
+
+        for pred, target in zip(pred_points, target_points):
+            true_positives += match(distance_matrix(pred, target), thresholds)
+            total_pred += len(pred)
+            total_gt += len(target)
+
+    model.eval()
+    # Converted outside inference_mode, the parameters must stay usable for training
+    if memory_format is torch.channels_last:
+        model.to(memory_format=torch.channels_last)
+    try:
+        with torch.inference_mode():
+            for batch_idx, (images, target_heatmaps) in enumerate(loader):
+                if max_batches is not None and batch_idx >= max_batches:
+                    break
+
+                pred_heatmaps = model(images.to(device, non_blocking=True, memory_format=memory_format))
+                # Frames of different sizes cannot be stacked
+                if pending_pred and pred_heatmaps.shape[1:] != pending_pred[0].shape[1:]:
+                    flush()
+                pending_pred.append(pred_heatmaps.contiguous())
+                pending_target.append(target_heatmaps.to(pending_pred[-1].device))
+                if sum(len(heatmaps) for heatmaps in pending_pred) >= detection_batch_size:
+                    flush()
+            flush()
+    finally:
+        if memory_format is torch.channels_last:
+            model.to(memory_format=torch.contiguous_format)
+
+    return {threshold: summarize(tp, total_pred, total_gt) for threshold, tp in zip(thresholds, true_positives)}
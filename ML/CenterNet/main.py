@@ -1,16 +1,16 @@
 
 from random import randint
-from augmentations import AugmentedRadarDataset
+from augmentations import BatchAugmenter
 import os
 import torch
 import torch.nn as nn
 from torch.utils.data import DataLoader, random_split
 import matplotlib.pyplot as plt
-from dataset import PPIDataset
-from centernetResnet import CenterNetBackbone, FocalLoss, detect_points
+from ppi_store import load_dataset
+from evaluation import evaluate
+from centernetresnet import CenterNetBackbone, FocalLoss, detect_points
 import logging
 import datetime
-import numpy as np
 
 
 def setup_logging():
@@ -108,61 +108,14 @@ def visualize_predictions(model, dataset, device, num_samples=5, threshold=0.3):
     logging.info(f'Saved visualization to {save_path}')
 
 
-def evaluate_model(model, dataset, device, threshold=0.3):
+def evaluate_model(model, dataset, device, threshold=0.3, distance_threshold=10, batch_size=None):
     """
-    Evaluate model performance on the dataset
+    Evaluate model performance on the dataset, with batched inference and
+    vectorized point matching (see evaluation.evaluate)
     """
-    model.eval()
-    total_correct = 0
-    total_pred = 0
-    total_true = 0
-
-    with torch.no_grad():
-        for i in range(len(dataset)):
-            image, target_heatmap = dataset[i]
-
-            # Add batch dimension if necessary
-            if image.dim() == 3:
-                image = image.unsqueeze(0)
-
-            # Get predictions
-            pred_heatmap = model(image.to(device))
-            pred_heatmap = pred_heatmap[0, 0].cpu()
-
-            # Detect points
-            target_points = detect_points(
-                target_heatmap[0], threshold=threshold)
-            pred_points = detect_points(
-                pred_heatmap, threshold=threshold)
-
-            # Count matches (using a simple distance threshold)
-            matched_points = set()
-            for pred_x, pred_y in pred_points:
-                for idx, (true_x, true_y) in enumerate(target_points):
-                    if idx not in matched_points:
-                        dist = np.sqrt((pred_x - true_x)**2 +
-                                       (pred_y - true_y)**2)
-                        if dist < 10:  # Distance threshold in pixels
-                            total_correct += 1
-                            matched_points.add(idx)
-                            break
-
-            total_pred += len(pred_points)
-            total_true += len(target_points)
-
-    precision = total_correct / total_pred if total_pred > 0 else 0
-    recall = total_correct / total_true if total_true > 0 else 0
-    f1 = 2 * (precision * recall) / (precision +
-                                     recall) if (precision + recall) > 0 else 0
-
-    return {
-        'precision': precision,
-        'recall': recall,
-        'f1': f1,
-        'true_positives': total_correct,
-        'false_positives': total_pred - total_correct,
-        'false_negatives': total_true - total_correct
-    }
+    results = evaluate(model, dataset, device, distance_thresholds=[distance_threshold],
+                       detection_threshold=threshold, batch_size=batch_size)
+    return results[distance_threshold]
 
 
 def train(model, train_loader, val_loader, criterion, optimizer, scheduler, num_epochs, device, patience):
@@ -304,7 +257,8 @@ def main():
 
     # Dataset setup
     json_directory = os.path.expanduser(r'D:\Datasets\MYA')
-    base_dataset = PPIDataset(json_directory, sigma=SIGMA)
+    # Reads the memory-mapped store from ppi_store.py when one has been built
+    base_dataset = load_dataset(json_directory, sigma=SIGMA)
 
     # Split dataset before augmentation
     train_size = int(0.8 * len(base_dataset))
@@ -313,17 +267,16 @@ def main():
     train_dataset_base, val_dataset = random_split(
         base_dataset, [train_size, val_size])
 
-    # Create augmented training dataset
-    train_dataset = AugmentedRadarDataset(
-        train_dataset_base,
+    # Random flips, azimuth shifts and intensity jitter drawn per batch, so every
+    # epoch sees new variants without multiplying the epoch length
+    augmenter = BatchAugmenter(
         flip_prob=0.5,
-        num_shifts=3,
-        shift_fraction=0.15
+        shift_fraction=0.15,
+        jitter=0.1
     )
 
     logging.info(
         f'Original dataset size - Train: {len(train_dataset_base)}, Validation: {len(val_dataset)}')
-    logging.info(f'Augmented training dataset size: {len(train_dataset)}')
 
     # Create data loaders
     train_loader = DataLoader(
@@ -331,6 +284,7 @@ def main():
         batch_size=BATCH_SIZE,
         shuffle=True,
         num_workers=2,
+        collate_fn=augmenter.collate,
         pin_memory=True if device == 'cuda' else False
     )
 
@@ -0,0 +1,242 @@
+# ppi_store.py
+#
+# Packs a directory of radar_*.json samples into a chunked binary store once, so
+# training reads memory-mapped arrays instead of re-parsing JSON every epoch.
+#
+# Usage: python ppi_store.py <json_dir> [<store_dir>] [--chunk-size 32]
+import os
+import json
+import shutil
+import argparse
+import numpy as np
+from dataset import PPIDataset
+
+STORE_VERSION = 2
+MANIFEST_FILE = 'manifest.json'
+INDEX_FILE = 'index.npz'
+DEFAULT_STORE_NAME = 'ppi_store'
+
+
+def chunk_filename(chunk_idx):
+    return f'ppi_{chunk_idx:05d}.npy'
+
+
+def source_state(json_dir):
+    """
+    Number of JSON samples in `json_dir` and the latest modification time among
+    them, in nanoseconds, which the manifest records to detect added or edited samples
+    """
+    count = 0
+    latest = 0
+    with os.scandir(json_dir) as entries:
+        for entry in entries:
+            if entry.name.endswith('.json') and entry.is_file():
+                count += 1
+                latest = max(latest, entry.stat().st_mtime_ns)
+    return count, latest
+
+
+def convert(json_dir, store_dir, chunk_size=32):
+    """
+    Convert every JSON sample in `json_dir` into a store in `store_dir`.
+
+    The store holds:
+        ppi_XXXXX.npy: float32 [n, azimuth, range] chunks of raw PPI frames
+        index.npz: per-sample chunk/row, radar range and ship offsets, plus all
+                   ships as one [total_ships, 2] (Azimuth, Distance) table
+        manifest.json: source file names, count and latest mtime, chunk shapes and
+                       the store version
+
+    Samples keep the os.listdir order PPIDataset uses, so splits stay comparable.
+    A chunk is closed early when the frame shape changes.
+
+    Returns:
+        int: Number of samples written
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    # Heatmaps cached by sample index belong to the previous contents
+    shutil.rmtree(os.path.join(store_dir, 'heatmaps'), ignore_errors=True)
+    # Taken before reading, so samples edited during the conversion make the store stale
+    source_count, source_mtime_ns = source_state(json_dir)
+    json_files = [file for file in os.listdir(json_dir) if file.endswith('.json')]
+
+    chunk_shapes = []
+    sample_chunk = []
+    sample_row = []
+    ranges = []
+    ship_counts = []
+    ships = []
+
+    pending = []
+
+    def flush():
+        if pending:
+            np.save(os.path.join(store_dir, chunk_filename(len(chunk_shapes))), np.stack(pending))
+            chunk_shapes.append([len(pending), *pending[0].shape])
+            pending.clear()
+
+    for i, file in enumerate(json_files):
+        with open(os.path.join(json_dir, file), 'r') as f:
+            data = json.load(f)
+
+        ppi_array = np.array(data['PPI'], dtype=np.float32)
+        if pending and (len(pending) >= chunk_size or ppi_array.shape != pending[0].shape):
+            flush()
+
+        sample_chunk.append(len(chunk_shapes))
+        sample_row.append(len(pending))
+        pending.append(ppi_array)
+
+        ranges.append(data['range'])
+        ship_counts.append(len(data['ships']))
+        ships.extend((ship['Azimuth'], ship['Distance']) for ship in data['ships'])
+
+        if (i + 1) % 100 == 0:
+            print(f"Converted {i + 1}/{len(json_files)} samples")
+    flush()
+
+    np.savez(
+        os.path.join(store_dir, INDEX_FILE),
+        chunk=np.array(sample_chunk, dtype=np.int32),
+        row=np.array(sample_row, dtype=np.int32),
+        range=np.array(ranges, dtype=np.float64),
+        ship_offsets=np.concatenate([[0], np.cumsum(ship_counts)]).astype(np.int64),
+        ships=np.array(ships, dtype=np.float64).reshape(-1, 2),
+    )
+
+    with open(os.path.join(store_dir, MANIFEST_FILE), 'w') as f:
+        json.dump({
+            'version': STORE_VERSION,
+            'files': json_files,
+            'source_count': source_count,
+            'source_mtime_ns': source_mtime_ns,
+            'chunks': chunk_shapes,
+        }, f)
+
+    return len(json_files)
+
+
+class PPIStoreDataset(PPIDataset):
+    """
+    PPIDataset backed by a store written by `convert`.
+
+    Chunks are opened with np.load(mmap_mode='r') on first use in each process
+    (so DataLoader workers map them after forking) and samples are sliced out
+    without copying. Heatmaps and normalization are the same as PPIDataset.
+    """
+
+    def __init__(self, store_dir, output_size=None, sigma=2, transform=None, cache_heatmaps=False):
+        """
+        Args:
+            store_dir: Directory written by `convert`
+            output_size: Optional tuple (height, width) for resizing.
+                        If None, uses original image size
+            sigma: Standard deviation for Gaussian kernel
+            transform: Optional transform to be applied on the image
+            cache_heatmaps: Save rendered heatmaps in the store's heatmaps/
+                        directory and reuse them on later reads
+        """
+        self.store_dir = store_dir
+        self.transform = transform
+        self.sigma = sigma
+        self.cache_heatmaps = cache_heatmaps
+
+        with open(os.path.join(store_dir, MANIFEST_FILE), 'r') as f:
+            manifest = json.load(f)
+        if manifest['version'] != STORE_VERSION:
+            raise ValueError(f"Unsupported PPI store version {manifest['version']} in {store_dir}")
+
+        self.json_files = manifest['files']
+        self.chunk_shapes = [tuple(shape) for shape in manifest['chunks']]
+
+        with np.load(os.path.join(store_dir, INDEX_FILE)) as index:
+            self.sample_chunk = index['chunk']
+            self.sample_row = index['row']
+            self.ranges = index['range']
+            self.ship_offsets = index['ship_offsets']
+            self.ships = index['ships']
+
+        self.chunks = {}
+
+        if output_size is None:
+            self.output_size = self.chunk_shapes[0][1:]
+        else:
+            self.output_size = output_size
+
+    def __getstate__(self):
+        # Memory maps are reopened in each DataLoader worker instead of being pickled
+        state = self.__dict__.copy()
+        state['chunks'] = {}
+        return state
+
+    def get_chunk(self, chunk_idx):
+        chunk = self.chunks.get(chunk_idx)
+        if chunk is None:
+            chunk = np.load(os.path.join(self.store_dir, chunk_filename(chunk_idx)), mmap_mode='r')
+            self.chunks[chunk_idx] = chunk
+        return chunk
+
+    def load_sample(self, idx):
+        ppi_array = self.get_chunk(self.sample_chunk[idx])[self.sample_row[idx]]
+
+        # [n, 2] (Azimuth, Distance) rows, which generate_heatmap takes directly
+        ships = self.ships[self.ship_offsets[idx]:self.ship_offsets[idx + 1]]
+
+        return ppi_array, ships, float(self.ranges[idx])
+
+    def heatmap_cache_path(self, idx):
+        height, width = self.output_size
+        cache_dir = os.path.join(self.store_dir, 'heatmaps')
+        os.makedirs(cache_dir, exist_ok=True)
+        return os.path.join(cache_dir, f'{idx:06d}_s{self.sigma}_{height}x{width}.npy')
+
+    def source_path(self, idx):
+        return os.path.join(self.store_dir, INDEX_FILE)
+
+
+def is_stale(store_dir, json_dir):
+    """Whether the store was written by another version or samples were added, removed or edited since"""
+    with open(os.path.join(store_dir, MANIFEST_FILE), 'r') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != STORE_VERSION:
+        return True
+    return [manifest['source_count'], manifest['source_mtime_ns']] != list(source_state(json_dir))
+
+
+def load_dataset(json_dir, sigma=2, store_dir=None, cache_heatmaps=False, rebuild=True):
+    """
+    PPIStoreDataset if a store exists for `json_dir` (by default in its
+    `ppi_store` subdirectory), otherwise the JSON-backed PPIDataset
+
+    A store that no longer matches the JSON files (see is_stale) is converted again,
+    or with `rebuild=False` raises a ValueError.
+    """
+    if store_dir is None:
+        store_dir = os.path.join(json_dir, DEFAULT_STORE_NAME)
+
+    if os.path.exists(os.path.join(store_dir, MANIFEST_FILE)):
+        if is_stale(store_dir, json_dir):
+            if not rebuild:
+                raise ValueError(f"PPI store {store_dir} is out of date with {json_dir}, "
+                                 f"run ppi_store.py again")
+            print(f"PPI store {store_dir} is out of date with {json_dir}, converting again")
+            convert(json_dir, store_dir)
+        return PPIStoreDataset(store_dir, sigma=sigma, cache_heatmaps=cache_heatmaps)
+    return PPIDataset(json_dir, sigma=sigma, cache_heatmaps=cache_heatmaps)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pack radar JSON samples into a memory-mappable store')
+    parser.add_argument('json_dir', help='Directory containing radar_*.json files')
+    parser.add_argument('store_dir', nargs='?', default=None,
+                        help=f'Output directory (default: <json_dir>/{DEFAULT_STORE_NAME})')
+    parser.add_argument('--chunk-size', type=int, default=32, help='Frames per chunk file')
+    args = parser.parse_args()
+
+    store_dir = args.store_dir or os.path.join(args.json_dir, DEFAULT_STORE_NAME)
+    count = convert(args.json_dir, store_dir, chunk_size=args.chunk_size)
+    print(f"Wrote {count} samples to {store_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,8 @@ import numpy as np
 import os
 import logging
 import datetime
-from dataset import PPIDataset
+from ppi_store import load_dataset
+from evaluation import evaluate, MATCH_GREEDY
 from centernetresnet import CenterNetBackbone, detect_points
 import json
 
@@ -134,38 +135,22 @@ def plot_detection_metrics(tp, fp, fn, save_dir='test_results'):
     plt.tight_layout()
     plt.savefig(f'{save_dir}/detection_metrics.png')
     plt.close()
-def evaluate_model(model, test_loader, device, save_dir='test_results'):
-    """Comprehensive model evaluation"""
+def evaluate_model(model, test_loader, device, save_dir='test_results', distance_thresholds=(10, 5, 20),
+                   matching=MATCH_GREEDY, batch_size=None):
+    """Comprehensive model evaluation, metrics are reported for the first distance threshold"""
     if not os.path.exists(save_dir):
         os.makedirs(save_dir)
     
-    all_tp = 0
-    all_fp = 0
-    all_fn = 0
-    
-    for i, (image, target_heatmap) in enumerate(test_loader.dataset):
-        # Add batch dimension
-        image = image.unsqueeze(0)
-        
-        # Get predictions
-        with torch.no_grad():
-            pred_heatmap = model(image.to(device))
-            pred_heatmap = pred_heatmap[0, 0].cpu()
-        
-        # Detect points
-        target_points = detect_points(target_heatmap[0], threshold=0.3)
-        pred_points = detect_points(pred_heatmap, threshold=0.3)
-        
-        # Calculate metrics
-        tp, fp, fn = calculate_metrics(pred_points, target_points)
-        all_tp += tp
-        all_fp += fp
-        all_fn += fn
-    
-    # Calculate final metrics
-    precision = all_tp / (all_tp + all_fp) if (all_tp + all_fp) > 0 else 0
-    recall = all_tp / (all_tp + all_fn) if (all_tp + all_fn) > 0 else 0
-    f1 = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0
+    # Batched inference over the loader's dataset, every distance threshold in one pass
+    results = evaluate(model, test_loader.dataset, device, distance_thresholds=distance_thresholds,
+                       detection_threshold=0.3, matching=matching, batch_size=batch_size)
+    primary = results[distance_thresholds[0]]
+    all_tp = primary['true_positives']
+    all_fp = primary['false_positives']
+    all_fn = primary['false_negatives']
+    precision = primary['precision']
+    recall = primary['recall']
+    f1 = primary['f1']
     
     # Plot detection metrics
     plot_detection_metrics(int(all_tp), int(all_fp), int(all_fn), save_dir)
@@ -177,7 +162,8 @@ def evaluate_model(model, test_loader, device, save_dir='test_results'):
         'f1_score': float(f1),
         'true_positives': int(all_tp),
         'false_positives': int(all_fp),
-        'false_negatives': int(all_fn)
+        'false_negatives': int(all_fn),
+        'distance_thresholds': {str(threshold): result for threshold, result in results.items()}
     }
     
     with open(f'{save_dir}/metrics.json', 'w') as f:
@@ -193,7 +179,7 @@ def main():
     
     # Load dataset
     json_directory = os.path.expanduser('~/RadarDataSubset/')
-    test_dataset = PPIDataset(json_directory, sigma=2)
+    test_dataset = load_dataset(json_directory, sigma=2)
     test_loader = DataLoader(test_dataset, batch_size=1, shuffle=False)
     
     # Load model
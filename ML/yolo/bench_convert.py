@@ -0,0 +1,137 @@
+# Throughput of the YOLO dataset conversion: the serial PPIDataset loop of train.py
+# against convert_dataset.py on a process pool, and reruns that resume from the manifest
+#
+# Generates --samples JSON frames with 30-120 ships each, then converts them serially
+# (with the list membership test per sample the loop used to do), with convert() on each
+# --workers count, again with nothing changed, and after touching and editing a tenth of
+# the files. The split lookup is also timed on its own for --lookup-files names.
+# python bench_convert.py --samples 2000 --workers 1 2 4 8
+# Pass --json-dir to use a real dataset instead of generated samples.
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+from convert_dataset import convert, split_of, write_sample
+
+
+def write_samples(json_dir, n_samples, rows, cols, rng):
+    radar_range = 5000
+    for i in range(n_samples):
+        ppi = rng.integers(0, 40, (rows, cols))
+        ships = []
+        for _ in range(rng.integers(30, 120)):
+            distance, azimuth = rng.uniform(0, radar_range), rng.uniform(0, 360)
+            width, height = rng.uniform(20, 200, 2)
+            row, col = int(azimuth / 360 * rows), int(distance / radar_range * cols)
+            # Most ships show up as echoes, the rest are hidden and filtered by intensity
+            if rng.random() < 0.8:
+                ppi[max(0, row - 3):row + 3, max(0, col - 3):col + 3] = 2000
+            ships.append({'Bounds': f"0 {distance} {azimuth} {width} {height}"})
+        with open(os.path.join(json_dir, f'radar_{i}.json'), 'w') as f:
+            json.dump({'PPI': ppi.tolist(), 'ships': ships, 'range': radar_range}, f)
+
+
+def serial_before(json_dir, save_dir, val_split):
+    """The loop of train.py: one sample at a time, subset by list membership"""
+    for subset in ('train', 'val'):
+        os.makedirs(os.path.join(save_dir, 'images', subset), exist_ok=True)
+        os.makedirs(os.path.join(save_dir, 'labels', subset), exist_ok=True)
+    json_files = [file for file in os.listdir(json_dir) if file.endswith('.json')]
+    train_files = [file for file in json_files if split_of(file, val_split) == 'train']
+    start = time.perf_counter()
+    for file in json_files:
+        with open(os.path.join(json_dir, file), 'r') as f:
+            data = json.load(f)
+        write_sample(data, save_dir, file, 'train' if file in train_files else 'val')
+    return time.perf_counter() - start
+
+
+def same_outputs(dir_a, dir_b):
+    for root, _, files in os.walk(os.path.join(dir_a, 'labels')):
+        for file in files:
+            path = os.path.join(root, file)
+            with open(path, 'rb') as a, open(os.path.join(dir_b, os.path.relpath(path, dir_a)), 'rb') as b:
+                if a.read() != b.read():
+                    return False
+    return True
+
+
+def lookup_seconds(n_files, val_split):
+    names = [f'radar_{i}.json' for i in range(n_files)]
+    train_files = [file for file in names if split_of(file, val_split) == 'train']
+    train_set = set(train_files)
+    timings = {}
+    for name, container in (('list', train_files), ('set', train_set)):
+        start = time.perf_counter()
+        for file in names:
+            _ = file in container
+        timings[name] = time.perf_counter() - start
+    start = time.perf_counter()
+    for file in names:
+        split_of(file, val_split)
+    timings['hash'] = time.perf_counter() - start
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='YOLO dataset conversion benchmark')
+    parser.add_argument('--json-dir', default=None)
+    parser.add_argument('--samples', type=int, default=2000)
+    parser.add_argument('--rows', type=int, default=360)
+    parser.add_argument('--cols', type=int, default=500)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, os.cpu_count()])
+    parser.add_argument('--val-split', type=float, default=0.2)
+    parser.add_argument('--lookup-files', type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_dir = args.json_dir
+        if json_dir is None:
+            json_dir = os.path.join(tmp, 'json')
+            os.makedirs(json_dir)
+            write_samples(json_dir, args.samples, args.rows, args.cols, np.random.default_rng(0))
+        n_samples = len([file for file in os.listdir(json_dir) if file.endswith('.json')])
+        print(f"{n_samples} samples, {os.cpu_count()} cores")
+        print(f"{'run':>28} {'seconds':>8} {'samples/s':>10} {'converted':>10} {'skipped':>8}")
+
+        before_dir = os.path.join(tmp, 'before')
+        seconds = serial_before(json_dir, before_dir, args.val_split)
+        print(f"{'serial loop (before)':>28} {seconds:>8.2f} {n_samples / seconds:>10.1f} {n_samples:>10} {0:>8}")
+
+        save_dir = os.path.join(tmp, 'yolo')
+        for workers in dict.fromkeys(args.workers):
+            shutil.rmtree(save_dir, ignore_errors=True)
+            result = convert(json_dir, save_dir, val_split=args.val_split, workers=workers, verbose=False)
+            print(f"{f'convert, {workers} workers':>28} {result['seconds']:>8.2f} "
+                  f"{n_samples / result['seconds']:>10.1f} {result['converted']:>10} {result['skipped']:>8}")
+        print(f"labels identical to the serial loop: {same_outputs(before_dir, save_dir)}")
+
+        workers = max(args.workers)
+        result = convert(json_dir, save_dir, val_split=args.val_split, workers=workers, verbose=False)
+        print(f"{'rerun, nothing changed':>28} {result['seconds']:>8.2f} {'':>10} "
+              f"{result['converted']:>10} {result['skipped']:>8}")
+
+        if args.json_dir is None:
+            files = sorted(file for file in os.listdir(json_dir) if file.endswith('.json'))
+            for i, file in enumerate(files[::10]):
+                path = os.path.join(json_dir, file)
+                if i % 2:
+                    # Touched, contents unchanged: hashed, not converted
+                    os.utime(path)
+                else:
+                    with open(path, 'a') as f:
+                        f.write(' ')
+            result = convert(json_dir, save_dir, val_split=args.val_split, workers=workers, verbose=False)
+            print(f"{'rerun, 10% touched/edited':>28} {result['seconds']:>8.2f} {'':>10} "
+                  f"{result['converted']:>10} {result['skipped']:>8}   ({result['unchanged']} unchanged)")
+
+    timings = lookup_seconds(args.lookup_files, args.val_split)
+    print(f"\nSplit lookup of {args.lookup_files} files: " +
+          ', '.join(f"{name} {seconds:.3f} s" for name, seconds in timings.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# Compares summed-area YOLO label generation against the former per-ship crop loop
+import time
+import argparse
+import numpy as np
+from PIL import Image
+from convert_dataset import yolo_labels, MIN_INTENSITY_THRESHOLD, MAX_INTENSITY_THRESHOLD
+
+
+def yolo_labels_loop(data, image):
+    """yolo_labels as it was before vectorization, kept as the reference"""
+    img_width, img_height = image.size
+    yolo_bboxes = []
+
+    for ship in data['ships']:
+        model_class, x_center, y_center, width, height = ship["Bounds"].split()
+        x_center, y_center, width, height = map(float, (x_center, y_center, width, height))
+
+        x_scaled = int(x_center / data['range'] * img_width)
+        y_scaled = int(y_center / 360 * img_height)
+
+        x_scaled = min(max(0, x_scaled), img_width - 1)
+        y_scaled = min(max(0, y_scaled), img_height - 1)
+
+        width_scaled = int(width / data['range'] * img_width)
+        height_scaled = int(height / data['range'] * img_height)
+
+        width_scaled = min(max(0, width_scaled), img_width - 1)
+        height_scaled = min(max(0, height_scaled), img_height - 1)
+
+        tleft = x_scaled - width_scaled // 2
+        tright = y_scaled - height_scaled // 2
+        bleft = x_scaled + width_scaled // 2
+        bright = y_scaled + height_scaled // 2
+        cropped_array = np.array(image.crop((tleft, tright, bleft, bright)))
+
+        with np.errstate(invalid='ignore'):
+            average_intensity = np.mean(cropped_array) if cropped_array.size else np.nan
+
+        if MIN_INTENSITY_THRESHOLD < average_intensity < MAX_INTENSITY_THRESHOLD:
+            x_normalized = x_scaled / img_width
+            y_normalized = y_scaled / img_height
+            width_normalized = width_scaled / img_width
+            height_normalized = height_scaled / img_height
+
+            model_class = 0
+            yolo_bboxes.append(f"{model_class} {x_normalized} {y_normalized} {width_normalized} {height_normalized}")
+
+    return yolo_bboxes
+
+
+def random_sample(n_ships, rows, cols, radar_range, rng):
+    """A frame with echoes under most ships; boxes include tiny, huge and edge ones to exercise clipping"""
+    pixels = rng.integers(0, 12, (rows, cols)).astype(np.uint8)
+    ships = []
+    for _ in range(n_ships):
+        distance, azimuth = rng.uniform(-50, radar_range + 50), rng.uniform(-5, 365)
+        width, height = rng.choice([rng.uniform(0, 20), rng.uniform(20, 400), rng.uniform(400, 2 * radar_range)], 2)
+        row, col = int(azimuth / 360 * rows), int(distance / radar_range * cols)
+        if rng.random() < 0.7:
+            pixels[max(0, row - 4):max(0, row + 4), max(0, col - 4):max(0, col + 4)] = rng.integers(100, 256)
+        ships.append({'Bounds': f"0 {distance} {azimuth} {width} {height}"})
+    return {'ships': ships, 'range': radar_range}, Image.fromarray(pixels)
+
+
+def median_ms(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return np.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='YOLO label generation micro-benchmark')
+    parser.add_argument('--ships', type=int, nargs='+', default=[30, 60, 120])
+    parser.add_argument('--rows', type=int, default=360)
+    parser.add_argument('--cols', type=int, default=500)
+    parser.add_argument('--frames', type=int, default=50, help='Frames per ship count')
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{args.rows}x{args.cols} frames")
+    print(f"{'ships':>6} {'loop ms':>9} {'vectorized ms':>14} {'speedup':>8} {'kept':>6} {'identical':>10}")
+    for n_ships in args.ships:
+        samples = [random_sample(n_ships, args.rows, args.cols, 5000, rng) for _ in range(args.frames)]
+        identical = all(yolo_labels(data, image) == yolo_labels_loop(data, image) for data, image in samples)
+        kept = np.mean([len(yolo_labels(data, image)) for data, image in samples])
+
+        # Per frame, averaged over all frames as the loop's time depends on the box sizes
+        loop_ms = median_ms(lambda: [yolo_labels_loop(data, image) for data, image in samples],
+                            args.repeats) / len(samples)
+        vectorized_ms = median_ms(lambda: [yolo_labels(data, image) for data, image in samples],
+                                  args.repeats) / len(samples)
+        print(f"{n_ships:>6} {loop_ms:>9.2f} {vectorized_ms:>14.2f} {loop_ms / vectorized_ms:>7.1f}x "
+              f"{kept:>6.1f} {str(identical):>10}")
+
+
+if __name__ == "__main__":
+    main()
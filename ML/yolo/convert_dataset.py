@@ -0,0 +1,300 @@
+# convert_dataset.py
+#
+# Converts a directory of radar JSON samples into the YOLO dataset layout
+# (images/{train,val}/<name>.png and labels/{train,val}/<name>.txt) on a process pool.
+# A manifest of the converted sources lets reruns skip samples that are up to date, so
+# an interrupted conversion resumes where it stopped and a grown dataset only converts
+# the new files.
+#
+# Usage: python convert_dataset.py <json_dir> <save_dir> [--val-split 0.2] [--workers N]
+import os
+import json
+import time
+import hashlib
+import argparse
+import multiprocessing
+import numpy as np
+from PIL import Image
+
+# Bumped when the written images or labels change, so existing outputs are redone
+CONVERTER_VERSION = 1
+MANIFEST_FILE = 'manifest.json'
+SUBSETS = ('train', 'val')
+
+# A box is kept when its mean intensity shows it mostly covers a visible object
+MIN_INTENSITY_THRESHOLD = 6
+MAX_INTENSITY_THRESHOLD = 240
+
+
+def split_of(file, val_split):
+    """
+    'train' or 'val' for a JSON file name
+
+    Decided by a hash of the name, so a file stays in its subset across runs, machines
+    and dataset sizes, and about `val_split` of the files are validation samples.
+    """
+    digest = hashlib.blake2b(file.encode(), digest_size=8).digest()
+    return 'val' if int.from_bytes(digest, 'big') / 2 ** 64 < val_split else 'train'
+
+
+def output_paths(save_dir, file, subset):
+    name = os.path.splitext(file)[0]
+    return (os.path.join(save_dir, 'images', subset, name + '.png'),
+            os.path.join(save_dir, 'labels', subset, name + '.txt'))
+
+
+def ppi_image(data):
+    """The PPI normalized to a grayscale image"""
+    ppi_array = np.array(data['PPI'], dtype=np.float32)
+    ppi_array_normalized = (ppi_array - ppi_array.min()) / (ppi_array.max() - ppi_array.min() + 1e-8)
+    return Image.fromarray((ppi_array_normalized * 255).astype(np.uint8))
+
+
+def box_sums(pixels, left, top, right, bottom):
+    """
+    Sum of the pixels inside every box, from a summed-area table of the image
+
+    Boxes are [left, right) x [top, bottom) and may reach beyond the image, whose
+    outside counts as zero like in PIL's Image.crop. The table is only built on the
+    rows of the box edges: column sums are accumulated down the whole image, then
+    across those rows alone, as accumulating along the rows is the slow direction.
+    """
+    height, width = pixels.shape
+    # 8-bit sums of frames below 8M pixels fit in int32
+    dtype = np.int32 if height * width < 2 ** 23 else np.int64
+
+    left, right = np.clip(left, 0, width), np.clip(right, 0, width)
+    top, bottom = np.clip(top, 0, height), np.clip(bottom, 0, height)
+    rows, row_index = np.unique(np.concatenate([top, bottom]), return_inverse=True)
+    top_index, bottom_index = row_index[:len(top)], row_index[len(top):]
+
+    # Sums of each column above every row, accumulated in place
+    column_sums = np.zeros((height + 1, width), dtype=dtype)
+    column_sums[1:] = pixels
+    np.cumsum(column_sums[1:], axis=0, out=column_sums[1:])
+
+    # [width + 1, len(rows)] summed-area table, indexed by column then edge row
+    integral = np.zeros((width + 1, len(rows)), dtype=dtype)
+    np.cumsum(column_sums[rows].T, axis=0, out=integral[1:])
+    return (integral[right, bottom_index] - integral[right, top_index]
+            - integral[left, bottom_index] + integral[left, top_index])
+
+
+def yolo_labels(data, image):
+    """
+    YOLO label lines of the ships in a sample
+
+    Returns:
+        list: "class x_center y_center width height" strings, normalized to the image size
+    """
+    img_width, img_height = image.size
+    if not data['ships']:
+        return []
+
+    # [n, 4] x_center, y_center, width, height of every ship, in range units and degrees
+    bounds = np.array([[float(value) for value in ship["Bounds"].split()[1:]] for ship in data['ships']])
+    x_center, y_center, width, height = bounds.T
+
+    # Pixel values, truncated like int() and kept within the image
+    x_scaled = np.clip(np.trunc(x_center / data['range'] * img_width), 0, img_width - 1).astype(np.int64)
+    y_scaled = np.clip(np.trunc(y_center / 360 * img_height), 0, img_height - 1).astype(np.int64)
+    width_scaled = np.clip(np.trunc(width / data['range'] * img_width), 0, img_width - 1).astype(np.int64)
+    height_scaled = np.clip(np.trunc(height / data['range'] * img_height), 0, img_height - 1).astype(np.int64)
+
+    # Check the average intensity in the bounding box
+    # to ensure that it mostly covers a visible object
+    tleft = x_scaled - width_scaled // 2
+    tright = y_scaled - height_scaled // 2
+    bleft = x_scaled + width_scaled // 2
+    bright = y_scaled + height_scaled // 2
+    area = (bleft - tleft) * (bright - tright)
+
+    # Boxes narrower than two pixels are empty and never kept, as np.mean of an empty crop is NaN
+    visible = area > 0
+    average_intensity = np.zeros(len(bounds))
+    average_intensity[visible] = (box_sums(np.asarray(image), tleft, tright, bleft, bright)[visible]
+                                  / area[visible])
+    keep = visible & (MIN_INTENSITY_THRESHOLD < average_intensity) & (average_intensity < MAX_INTENSITY_THRESHOLD)
+
+    # Normalize bounding box values for YOLO format, class 0 is ships
+    return [f"0 {x_normalized} {y_normalized} {width_normalized} {height_normalized}"
+            for x_normalized, y_normalized, width_normalized, height_normalized in zip(
+                (x_scaled[keep] / img_width).tolist(), (y_scaled[keep] / img_height).tolist(),
+                (width_scaled[keep] / img_width).tolist(), (height_scaled[keep] / img_height).tolist())]
+
+
+def write_sample(data, save_dir, file, subset):
+    """
+    Write the image and label file of one sample
+
+    Returns:
+        PIL.Image: The image
+    """
+    image = ppi_image(data)
+    yolo_bboxes = yolo_labels(data, image)
+
+    image_path, label_path = output_paths(save_dir, file, subset)
+    image.save(image_path)
+    with open(label_path, 'w') as yolo_file:
+        for bbox in yolo_bboxes:
+            yolo_file.write(bbox + '\n')
+    return image
+
+
+def convert_file(task):
+    """
+    Pool task: convert one JSON file unless its contents hash to the manifest's
+
+    Args:
+        task: (json_dir, save_dir, file, subset, hash of the converted contents or None)
+
+    Returns:
+        tuple: (file, manifest record, whether it was converted)
+    """
+    json_dir, save_dir, file, subset, known_hash = task
+    path = os.path.join(json_dir, file)
+    stat = os.stat(path)
+    with open(path, 'rb') as f:
+        contents = f.read()
+    digest = hashlib.blake2b(contents, digest_size=16).hexdigest()
+
+    # Touched or copied, but the same sample as converted before
+    converted = digest != known_hash
+    if converted:
+        write_sample(json.loads(contents), save_dir, file, subset)
+    return file, {'subset': subset, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': digest}, converted
+
+
+def load_manifest(save_dir):
+    """Records of the converted sources, empty when missing or written by another converter version"""
+    try:
+        with open(os.path.join(save_dir, MANIFEST_FILE), 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get('version') != CONVERTER_VERSION:
+        return {}
+    return manifest['files']
+
+
+def save_manifest(save_dir, records):
+    # Replaced in one step, so an interrupted run never leaves a truncated manifest
+    path = os.path.join(save_dir, MANIFEST_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump({'version': CONVERTER_VERSION, 'files': records}, f)
+    os.replace(path + '.tmp', path)
+
+
+def remove_outputs(save_dir, file, subset):
+    for path in output_paths(save_dir, file, subset):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def convert(json_dir, save_dir, val_split=0.2, workers=None, chunksize=8, force=False,
+            checkpoint_seconds=10.0, verbose=True):
+    """
+    Convert the JSON samples in `json_dir` that changed since the last run
+
+    A sample is up to date when the manifest records its size and mtime and both
+    outputs exist. Samples whose mtime changed are hashed and only converted again
+    when their contents did. Outputs of deleted samples are removed, and samples that
+    moved to the other subset because `val_split` changed are converted into it.
+    The manifest is saved every `checkpoint_seconds` and when the run ends or is
+    interrupted; samples converted after the last save are redone on the next run.
+
+    Args:
+        json_dir: Directory containing the JSON samples (no subdirectories)
+        save_dir: YOLO dataset directory, the `path` of ppi_dataset.yaml
+        val_split: Fraction of samples in the validation subset, see split_of()
+        workers: Conversion processes, os.cpu_count() by default; 0 converts in this process
+        chunksize: Samples handed to a worker at once
+        force: Convert every sample regardless of the manifest
+        checkpoint_seconds: Seconds between manifest saves
+        verbose: Print progress and throughput
+
+    Returns:
+        dict: Sample counts (converted, unchanged, skipped, removed) and seconds taken
+    """
+    start = time.perf_counter()
+    for subset in SUBSETS:
+        os.makedirs(os.path.join(save_dir, 'images', subset), exist_ok=True)
+        os.makedirs(os.path.join(save_dir, 'labels', subset), exist_ok=True)
+
+    records = {} if force else load_manifest(save_dir)
+    json_files = sorted(file for file in os.listdir(json_dir) if file.endswith('.json'))
+    sources = set(json_files)
+
+    removed = 0
+    for file in [file for file in records if file not in sources]:
+        remove_outputs(save_dir, file, records.pop(file)['subset'])
+        removed += 1
+
+    tasks = []
+    for file in json_files:
+        subset = split_of(file, val_split)
+        record = records.get(file)
+        if record is not None and record['subset'] != subset:
+            remove_outputs(save_dir, file, record['subset'])
+            del records[file]
+            record = None
+        if record is not None and all(os.path.exists(path) for path in output_paths(save_dir, file, subset)):
+            stat = os.stat(os.path.join(json_dir, file))
+            if stat.st_size == record['size'] and stat.st_mtime_ns == record['mtime_ns']:
+                continue
+            known_hash = record['hash']
+        else:
+            known_hash = None
+        tasks.append((json_dir, save_dir, file, subset, known_hash))
+
+    skipped = len(json_files) - len(tasks)
+    if verbose:
+        print(f"{len(json_files)} samples, {skipped} up to date, {removed} removed, converting {len(tasks)}")
+
+    converted = unchanged = 0
+    last_save = last_report = time.perf_counter()
+    pool = multiprocessing.Pool(workers or os.cpu_count()) if workers != 0 and tasks else None
+    try:
+        results = pool.imap_unordered(convert_file, tasks, chunksize) if pool else map(convert_file, tasks)
+        for done, (file, record, was_converted) in enumerate(results, 1):
+            records[file] = record
+            converted += was_converted
+            unchanged += not was_converted
+
+            now = time.perf_counter()
+            if now - last_save >= checkpoint_seconds:
+                save_manifest(save_dir, records)
+                last_save = now
+            if verbose and (now - last_report >= 1.0 or done == len(tasks)):
+                elapsed = now - start
+                print(f"Converted {done}/{len(tasks)} samples, {done / elapsed:.1f} samples/s")
+                last_report = now
+    finally:
+        if pool:
+            pool.terminate()
+        save_manifest(save_dir, records)
+
+    seconds = time.perf_counter() - start
+    if verbose:
+        print(f"Converted {converted}, unchanged {unchanged}, skipped {skipped}, removed {removed} "
+              f"in {seconds:.1f} s")
+    return {'converted': converted, 'unchanged': unchanged, 'skipped': skipped, 'removed': removed,
+            'seconds': seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert radar JSON samples into a YOLO dataset')
+    parser.add_argument('json_dir', help='Directory containing the JSON samples')
+    parser.add_argument('save_dir', help='YOLO dataset directory (the path in ppi_dataset.yaml)')
+    parser.add_argument('--val-split', type=float, default=0.2, help='Fraction of validation samples')
+    parser.add_argument('--workers', type=int, default=None, help='Processes (default: all cores, 0: none)')
+    parser.add_argument('--chunksize', type=int, default=8, help='Samples handed to a worker at once')
+    parser.add_argument('--force', action='store_true', help='Convert every sample again')
+    args = parser.parse_args()
+
+    convert(args.json_dir, args.save_dir, val_split=args.val_split, workers=args.workers,
+            chunksize=args.chunksize, force=args.force)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,8 @@
 import os
 import json
-import numpy as np
-from PIL import Image, ImageDraw
-import random
 from torch.utils.data import Dataset
 from ultralytics import YOLO
+from convert_dataset import convert, split_of, write_sample
 import matplotlib.pyplot as plt
 
 class PPIDataset(Dataset):
@@ -20,106 +18,22 @@ class PPIDataset(Dataset):
         os.makedirs(os.path.join(save_dir, 'labels', 'train'), exist_ok=True)
         os.makedirs(os.path.join(save_dir, 'labels', 'val'), exist_ok=True)
 
-        # Shuffle files and split into train and validation
-        random.shuffle(self.json_files)
-        split_index = int(len(self.json_files) * (1 - val_split))
-        self.train_files = self.json_files[:split_index]
-        self.val_files = self.json_files[split_index:]
+        # Split into train and validation by file name hash, the same split as convert_dataset.py
+        self.subsets = {file: split_of(file, val_split) for file in self.json_files}
+        self.train_files = [file for file in self.json_files if self.subsets[file] == 'train']
+        self.val_files = [file for file in self.json_files if self.subsets[file] == 'val']
 
     def __len__(self):
         return len(self.json_files)
 
     def __getitem__(self, idx):
-        json_path = os.path.join(self.json_dir, self.json_files[idx])
+        file = self.json_files[idx]
 
-        with open(json_path, 'r') as file:
-            data = json.load(file)
+        with open(os.path.join(self.json_dir, file), 'r') as f:
+            data = json.load(f)
 
-        ppi_array = np.array(data['PPI'], dtype=np.float32)
-
-        ppi_array_normalized = (ppi_array - ppi_array.min()) / (ppi_array.max() - ppi_array.min() + 1e-8)
-
-        # Convert to PIL Image
-        image = Image.fromarray((ppi_array_normalized * 255).astype(np.uint8))
-        # draw = ImageDraw.Draw(image)
-
-        ships = data['ships']
-        output_size = ppi_array.shape
-
-        yolo_bboxes = []
-
-        minIntensityThreshold = 6
-        maxIntensityThreshold = 240
-
-        # Draw bounding boxes for each ship
-        for ship in ships:
-            model_class, x_center, y_center, width, height = ship["Bounds"].split()
-            x_center, y_center, width, height = map(float, (x_center, y_center, width, height))
-
-            img_width, img_height = output_size[1], output_size[0]
-
-            # Convert normalized coordinates to pixel values
-            x_scaled = int(x_center / data['range'] * img_width)
-            y_scaled = int(y_center / 360 * img_height)
-
-            # Ensure coordinates are within bounds
-            x_scaled = min(max(0, x_scaled), img_width - 1)
-            y_scaled = min(max(0, y_scaled), img_height - 1)
-
-            # Scale width and height to pixel values
-            width_scaled = int(width / data['range'] * img_width)
-            height_scaled = int(height / data['range'] * img_height)
-
-            # Ensure width and height are within bounds
-            width_scaled = min(max(0, width_scaled), img_width - 1)
-            height_scaled = min(max(0, height_scaled), img_height - 1)
-
-            # Check the average intensity in the bounding box
-            # to ensure that it mostly covers a visible object
-
-            tleft = x_scaled - width_scaled // 2
-            tright = y_scaled - height_scaled // 2
-            bleft = x_scaled + width_scaled // 2
-            bright = y_scaled + height_scaled // 2
-            cropped_image = image.crop((tleft, tright, bleft, bright))
-
-            cropped_array = np.array(cropped_image)
-
-            average_intensity = np.mean(cropped_array)
-            #print(average_intensity)
-
-            if minIntensityThreshold < average_intensity < maxIntensityThreshold:
-
-                # Normalize bounding box values for YOLO format
-                x_normalized = x_scaled / img_width
-                y_normalized = y_scaled / img_height
-                width_normalized = width_scaled / img_width
-                height_normalized = height_scaled / img_height
-
-                model_class = 0 # Class 0 is ships
-                yolo_bboxes.append(f"{model_class} {x_normalized} {y_normalized} {width_normalized} {height_normalized}")
-
-                #draw.rectangle([tleft, tright, bleft, bright], outline="red", width=1)
-
-        #image.show()
-
-        # Determine save directory based on training/validation split
-        if self.json_files[idx] in self.train_files:
-            save_subdir = 'train'
-        else:
-            save_subdir = 'val'
-
-        # Save the image
-        image_file_name = os.path.splitext(os.path.basename(json_path))[0] + '.png'
-        image.save(os.path.join(self.save_dir, 'images', save_subdir, image_file_name))
-
-        # Save the YOLO format bounding boxes to a text file
-        yolo_file_path = os.path.splitext(image_file_name)[0] + '.txt'
-        with open(os.path.join(self.save_dir, 'labels', save_subdir, yolo_file_path), 'w') as yolo_file:
-            for bbox in yolo_bboxes:
-                yolo_file.write(bbox + '\n')
-
-        return image
+        # Save the image and the YOLO format bounding boxes in the sample's subset
+        return write_sample(data, self.save_dir, file, self.subsets[file])
 
 if __name__ == '__main__':
     json_directory = os.path.expanduser('~/Downloads/output') # Dataset's directory path (that contains the JSON files only with no subdirectories)
@@ -127,13 +41,12 @@ if __name__ == '__main__':
     save_directory = os.path.expanduser('~/Downloads/yolo_dataset')
     os.makedirs(save_directory, exist_ok=True)
 
-    dataset = PPIDataset(json_directory, save_directory, val_split=0.2)
+    #dataset = PPIDataset(json_directory, save_directory, val_split=0.2)
     #image = dataset[170]
-    
-    # Create the image and labels in the directories (train and val) for YOLO
-    for i in range(len(dataset)):
-       image = dataset[i]
-       print(f"Processed image {i + 1}/{len(dataset)}")
+
+    # Create the image and labels in the directories (train and val) for YOLO, on all cores.
+    # Samples converted by an earlier run are skipped
+    convert(json_directory, save_directory, val_split=0.2)
 
     model = YOLO("./yolo11n.pt")  # Load a pretrained model
 
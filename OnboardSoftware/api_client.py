@@ -0,0 +1,208 @@
+# api_client.py
+import time
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from radar import predictions_to_detections
+
+
+class DetectionPublisher:
+    """
+    Bounded send queue drained by a background thread, so a slow API does not stall
+    frame processing.
+
+    Every submitted call has a key (e.g. ('detections', radar_id)). A newer call with
+    the same key replaces the pending one, and when `max_pending` calls are waiting the
+    oldest one is dropped. Both cases are counted as dropped updates.
+    """
+
+    def __init__(self, max_pending=8):
+        self.max_pending = max_pending
+        self.pending = OrderedDict()
+        self.condition = threading.Condition()
+        self.stop_event = threading.Event()
+        self.worker = None
+
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.last_latency = 0.0
+
+    def start(self):
+        if self.worker is None:
+            self.worker = threading.Thread(target=self._run, daemon=True)
+            self.worker.start()
+        return self
+
+    def stop(self, flush=True):
+        """Stop the worker, sending what is still queued first if `flush` is set"""
+        with self.condition:
+            if not flush:
+                self.dropped += len(self.pending)
+                self.pending.clear()
+            self.stop_event.set()
+            self.condition.notify()
+        if self.worker is not None:
+            self.worker.join()
+            self.worker = None
+
+    def submit(self, key, fn, *args, **kwargs):
+        """
+        Queue fn(*args, **kwargs) to be called on the worker thread
+
+        Returns:
+            bool: False if an older update had to be dropped to make room
+        """
+        with self.condition:
+            accepted = True
+            if key in self.pending:
+                # Keep the queue position of the update being replaced
+                self.dropped += 1
+                accepted = False
+            elif len(self.pending) >= self.max_pending:
+                self.pending.popitem(last=False)
+                self.dropped += 1
+                accepted = False
+
+            self.pending[key] = (fn, args, kwargs)
+            self.condition.notify()
+            return accepted
+
+    def stats(self):
+        with self.condition:
+            return {
+                'queue_depth': len(self.pending),
+                'sent': self.sent,
+                'failed': self.failed,
+                'dropped': self.dropped,
+                'last_latency_ms': self.last_latency * 1000,
+            }
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.stop_event.is_set():
+                    self.condition.wait()
+                if not self.pending:
+                    return
+                _, (fn, args, kwargs) = self.pending.popitem(last=False)
+
+            start = time.perf_counter()
+            try:
+                # The radar.py helpers report failures by returning None
+                ok = fn(*args, **kwargs) not in (None, False)
+            except Exception as e:
+                print(f"Error publishing update: {e}")
+                ok = False
+
+            with self.condition:
+                self.last_latency = time.perf_counter() - start
+                if ok:
+                    self.sent += 1
+                else:
+                    self.failed += 1
+
+
+class AsyncRadarAPIClient:
+    """
+    asyncio counterpart of the radar.py helpers. Connections are kept alive in an
+    aiohttp connection pool shared by all calls made through the client.
+    """
+
+    def __init__(self, base_url: str = "http://localhost:7777", pool_size: int = 10, timeout: float = 10.0):
+        # Only needed for the asyncio client
+        import aiohttp
+
+        self.aiohttp = aiohttp
+        self.base_url = base_url
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def _request(self, method: str, path: str, payload=None) -> Optional[dict]:
+        # The session has to be created inside the running event loop
+        if self.session is None:
+            self.session = self.aiohttp.ClientSession(
+                connector=self.aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=self.aiohttp.ClientTimeout(total=self.timeout)
+            )
+
+        try:
+            async with self.session.request(method, f"{self.base_url}{path}", json=payload) as response:
+                response.raise_for_status()
+                return await response.json()
+        except self.aiohttp.ClientError as e:
+            print(f"Error calling {method} {path}: {str(e)}")
+            return None
+
+    async def create_radar_with_id(
+        self,
+        radar_id: int,
+        latitude: float = 0.0,
+        longitude: float = 0.0,
+        range_km: float = 100.0,
+        azimuth_resolution: float = 1.0
+    ) -> Optional[dict]:
+        """Async version of radar.create_radar_with_id"""
+        return await self._request("POST", "/radars/", {
+            "radar_id": radar_id,
+            "latitude": latitude,
+            "longitude": longitude,
+            "range_km": range_km,
+            "azimuth_resolution": azimuth_resolution
+        })
+
+    async def update_radar_location(
+        self,
+        radar_id: int,
+        latitude: float,
+        longitude: float,
+        range_km: float,
+        azimuth_resolution: float
+    ) -> Optional[dict]:
+        """Async version of radar.update_radar_location"""
+        if not -90 <= latitude <= 90:
+            raise ValueError("Latitude must be between -90 and 90 degrees")
+        if not -180 <= longitude <= 180:
+            raise ValueError("Longitude must be between -180 and 180 degrees")
+
+        return await self._request("PATCH", f"/radars/{radar_id}/location", {
+            "latitude": latitude,
+            "longitude": longitude,
+            "range_km": range_km,
+            "azimuth_resolution": azimuth_resolution
+        })
+
+    async def process_radar_detections(
+        self,
+        radar_id: int,
+        radar_lat: float,
+        radar_long: float,
+        predictions: List[Tuple[float, float]],
+        radar_range: float,
+        ppi_max_distance: float,
+        azimuth_resolution: float,
+        confidence: float = 0.9,
+        vessel_type: str = "UNKNOWN"
+    ) -> Optional[dict]:
+        """Async version of radar.process_radar_detections"""
+        detections = predictions_to_detections(
+            radar_lat, radar_long, predictions, radar_range, ppi_max_distance,
+            azimuth_resolution, confidence, vessel_type
+        )
+        return await self._request("PUT", f"/detections/by_radar/{radar_id}", detections)
+
+    async def clearall(self) -> bool:
+        """Async version of radar.clearall"""
+        return await self._request("DELETE", "/radars") is not None
@@ -0,0 +1,98 @@
+# Compares the vectorized detect_points against the former DBSCAN implementation
+import time
+import argparse
+from math import pi
+import numpy as np
+import torch
+import torch.nn.functional as F
+from sklearn.cluster import DBSCAN
+from centernetresnet import convert_to_polar, detect_points, detect_points_batched
+
+
+def detect_points_dbscan(heatmap, threshold=0.3, nms_kernel_size=3, eps=20, min_samples=2):
+    """detect_points as it was before vectorization, kept as the reference"""
+    with torch.no_grad():
+        pad = (nms_kernel_size - 1) // 2
+        hmax = F.max_pool2d(heatmap.unsqueeze(0).unsqueeze(0),
+                            kernel_size=nms_kernel_size, stride=1, padding=pad)[0, 0]
+        keep = (heatmap == hmax) & (heatmap > threshold)
+        ys, xs = torch.where(keep)
+        points = np.array([(x.item(), y.item()) for x, y in zip(xs, ys)])
+        if len(points) == 0:
+            return []
+
+        polar_points = np.array([convert_to_polar(p, heatmap.shape) for p in points])
+        X = np.column_stack([
+            np.sin(polar_points[:, 0] * pi / 180) * polar_points[:, 1],
+            np.cos(polar_points[:, 0] * pi / 180) * polar_points[:, 1],
+        ])
+        labels = DBSCAN(eps=eps, min_samples=min_samples).fit(X).labels_
+
+        final_points = []
+        for label in np.unique(labels):
+            if label == -1:
+                final_points.extend([(x, y) for x, y in points[labels == label]])
+            else:
+                cluster_points = points[labels == label]
+                heatmap_values = [heatmap[int(y), int(x)].item() for x, y in cluster_points]
+                best_point = cluster_points[np.argmax(heatmap_values)]
+                final_points.append((best_point[0], best_point[1]))
+        return final_points
+
+
+def make_heatmap(rows, cols, n_ships, noise, rng):
+    """Gaussian blobs at random ship positions plus speckle noise above the threshold"""
+    heatmap = np.zeros((rows, cols), dtype=np.float32)
+    yy, xx = np.mgrid[-6:7, -6:7]
+    blob = np.exp(-(xx ** 2 + yy ** 2) / 8.0)
+    for _ in range(n_ships):
+        y, x = rng.integers(6, rows - 6), rng.integers(6, cols - 6)
+        heatmap[y - 6:y + 7, x - 6:x + 7] = np.maximum(heatmap[y - 6:y + 7, x - 6:x + 7],
+                                                      blob * rng.uniform(0.5, 1.0))
+    heatmap += (rng.random((rows, cols)) < noise) * rng.uniform(0.3, 0.6, (rows, cols))
+    return torch.from_numpy(heatmap.astype(np.float32))
+
+
+def median_ms(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return np.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='detect_points benchmark')
+    parser.add_argument('--rows', type=int, default=720)
+    parser.add_argument('--cols', type=int, default=1000)
+    parser.add_argument('--ships', type=int, default=100)
+    parser.add_argument('--noise', type=float, nargs='+', default=[0.0, 0.0005, 0.002])
+    parser.add_argument('--batch', type=int, default=8)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"Heatmap {args.rows}x{args.cols}, {args.ships} ships, median of {args.repeats} runs")
+    print(f"{'noise':>7} {'points':>7} {'dbscan ms':>10} {'vectorized ms':>14} {'batched ms/img':>15} {'differing':>10}")
+
+    for noise in args.noise:
+        heatmaps = [make_heatmap(args.rows, args.cols, args.ships, noise, rng) for _ in range(args.batch)]
+        batch = torch.stack(heatmaps).unsqueeze(1)
+
+        reference = [[(int(x), int(y)) for x, y in detect_points_dbscan(h)] for h in heatmaps]
+        vectorized = [detect_points(h, max_peaks=None) for h in heatmaps]
+        batched = detect_points_batched(batch, max_peaks=None)
+        assert vectorized == batched
+
+        # Differences only come from peak pairs exactly eps apart
+        differing = sum(len(set(r) ^ set(v)) for r, v in zip(reference, vectorized))
+        points = np.mean([len(p) for p in reference])
+        dbscan_ms = median_ms(lambda: detect_points_dbscan(heatmaps[0]), args.repeats)
+        vector_ms = median_ms(lambda: detect_points(heatmaps[0]), args.repeats)
+        batch_ms = median_ms(lambda: detect_points_batched(batch), args.repeats) / args.batch
+        print(f"{noise:>7} {points:>7.0f} {dbscan_ms:>10.2f} {vector_ms:>14.2f} {batch_ms:>15.2f} {differing:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# Startup time, per-frame CPU latency and detection agreement of the exported model variants
+#
+# Detections of every variant are compared with the eager checkpoint on the same frames.
+# Without --model a randomly initialized network is used, pass a trained checkpoint and
+# recorded frames (--frames-dir) for meaningful agreement numbers.
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+import torch
+from centernetresnet import CenterNetBackbone, detect_points_batched
+from inference_server import load_model
+from export_model import (export, load_artifact, load_calibration_frames,
+                          VARIANT_EAGER, VARIANT_TORCHSCRIPT, VARIANT_INT8, VARIANT_ONNX)
+
+
+def synthetic_frames(n_frames, rows, cols, rng):
+    """Sea clutter plus a few bright ship returns"""
+    frames = rng.gamma(2.0, 150.0, (n_frames, rows, cols)).astype(np.float32)
+    for frame in frames:
+        for row, col in zip(rng.integers(2, rows - 2, 40), rng.integers(2, cols - 2, 40)):
+            frame[row - 2:row + 3, col - 2:col + 3] += 3000
+    return frames
+
+
+def agreement(reference, points, distance=3.0):
+    """Fraction of reference detections reproduced within `distance` pixels, and vice versa"""
+    matched_ref = matched = 0
+    total_ref = total = 0
+    for ref, pts in zip(reference, points):
+        ref = np.asarray(ref, dtype=np.float64).reshape(-1, 2)
+        pts = np.asarray(pts, dtype=np.float64).reshape(-1, 2)
+        total_ref += len(ref)
+        total += len(pts)
+        if len(ref) and len(pts):
+            distances = np.sqrt(((ref[:, None] - pts[None]) ** 2).sum(-1))
+            matched_ref += int((distances.min(axis=1) <= distance).sum())
+            matched += int((distances.min(axis=0) <= distance).sum())
+    recall = matched_ref / total_ref if total_ref else 1.0
+    precision = matched / total if total else 1.0
+    return recall, precision, total / max(len(points), 1)
+
+
+def run_variant(load, frames, threshold):
+    start = time.perf_counter()
+    model = load()
+    with torch.no_grad():
+        model(torch.from_numpy(frames[0])[None, None])
+    startup_s = time.perf_counter() - start
+
+    heatmaps, points, latencies = [], [], []
+    with torch.no_grad():
+        for frame in frames:
+            start = time.perf_counter()
+            heatmap = model(torch.from_numpy(frame)[None, None])
+            latencies.append(time.perf_counter() - start)
+            heatmaps.append(heatmap)
+            points.extend(detect_points_batched(heatmap, threshold=threshold))
+    return startup_s, np.array(latencies) * 1000, torch.cat(heatmaps), points
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Exported CenterNet variant benchmark')
+    parser.add_argument('--model', type=str, default=None, help='Trained checkpoint (default: random weights)')
+    parser.add_argument('--frames-dir', type=str, default=None, help='Recorded JSON frames (default: synthetic)')
+    parser.add_argument('--frames', type=int, default=16)
+    parser.add_argument('--rows', type=int, default=360)
+    parser.add_argument('--cols', type=int, default=500)
+    parser.add_argument('--threshold', type=float, default=0.3)
+    parser.add_argument('--onnx', action='store_true', help='Also benchmark ONNX (needs onnx and onnxruntime)')
+    args = parser.parse_args()
+
+    device = torch.device('cpu')
+    rng = np.random.default_rng(0)
+    torch.manual_seed(0)
+
+    if args.frames_dir is not None:
+        frames = load_calibration_frames(args.frames_dir, limit=args.frames)
+    else:
+        frames = synthetic_frames(args.frames, args.rows, args.cols, rng)
+    calibration = frames[:max(len(frames) // 2, 1)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = args.model
+        if model_path is None:
+            model_path = os.path.join(tmp, 'random.pth')
+            torch.save(CenterNetBackbone(in_channels=1).state_dict(), model_path)
+        model = load_model(model_path, device)
+
+        variants = {VARIANT_EAGER: lambda: load_model(model_path, device)}
+        for variant, suffix in ((VARIANT_TORCHSCRIPT, '.ts.pt'), (VARIANT_INT8, '.int8.pt'), (VARIANT_ONNX, '.onnx')):
+            if variant == VARIANT_ONNX and not args.onnx:
+                continue
+            path = os.path.join(tmp, f'centernet{suffix}')
+            export(model, variant, path, calibration_frames=calibration, frame_shape=frames.shape[1:])
+            variants[variant] = lambda path=path: load_artifact(path, device)
+
+        print(f"{len(frames)} frames {frames.shape[1]}x{frames.shape[2]}, batch 1, "
+              f"{torch.get_num_threads()} CPU threads, {'random' if args.model is None else args.model} weights")
+        print(f"{'variant':>12} {'startup s':>10} {'p50 ms':>8} {'p95 ms':>8} {'speedup':>8} "
+              f"{'max |dh|':>9} {'recall':>7} {'prec.':>7} {'det/frame':>10}")
+
+        reference = None
+        for name, load in variants.items():
+            startup_s, latencies_ms, heatmaps, points = run_variant(load, frames, args.threshold)
+            if reference is None:
+                reference = (np.median(latencies_ms), heatmaps, points)
+            recall, precision, per_frame = agreement(reference[2], points)
+            max_diff = (heatmaps - reference[1]).abs().max().item()
+            print(f"{name:>12} {startup_s:>10.2f} {np.median(latencies_ms):>8.1f} "
+                  f"{np.percentile(latencies_ms, 95):>8.1f} {reference[0] / np.median(latencies_ms):>7.2f}x "
+                  f"{max_diff:>9.4f} {recall:>7.3f} {precision:>7.3f} {per_frame:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# Full-sweep frames vs sector streaming: bytes, decode and inference CPU per sweep, detection latency
+#
+# The simulation sweeps one azimuth row per physics step (--row-ms). In frame mode a row
+# waits for the end of the sweep before it is sent and inferred, in sector mode only for
+# the end of its sector. Frames come from bench_tiled_inference; pass a trained checkpoint
+# with --model to compare the detections of both modes.
+import time
+import argparse
+import numpy as np
+import torch
+from centernetresnet import CenterNetBackbone
+from inference_server import load_model
+from ppi_codec import encode_frame, encode_sector, decode_message
+from frame_assembler import FrameAssembler, SectorDetections, sector_rows
+from inference_server import BatchedInferenceServer
+from bench_tiled_inference import synthetic_frames, recall
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sector streaming benchmark')
+    parser.add_argument('--rows', type=int, default=720)
+    parser.add_argument('--cols', type=int, default=1000)
+    parser.add_argument('--model', type=str, default=None, help='Trained checkpoint (default: random weights)')
+    parser.add_argument('--ships', type=int, default=20)
+    parser.add_argument('--sector-rows', type=int, default=20, help='Rows per server message')
+    parser.add_argument('--cadence', type=int, default=40, help='New rows per inference')
+    parser.add_argument('--margin', type=int, default=16)
+    parser.add_argument('--row-ms', type=float, default=20.0, help='Sweep time per azimuth row')
+    parser.add_argument('--sweeps', type=int, default=2)
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    if args.model is None:
+        model = CenterNetBackbone(in_channels=1).eval()
+    else:
+        model = load_model(args.model, torch.device('cpu'))
+    server = BatchedInferenceServer(model, torch.device('cpu'), batch_window=0).start()
+
+    frames, positions = synthetic_frames(1, args.rows, args.cols, np.random.default_rng(0), args.ships)
+    ppi = frames[0].astype(np.int32)
+    ships = [{'Id': i, 'Azimuth': row / args.rows * 360, 'Distance': col / args.cols * 5000}
+             for i, (col, row) in enumerate(positions[0])]
+    location = {'x': 10.0, 'y': 0.0, 'z': -20.0}
+
+    def in_sector(ship, start):
+        return start <= round(ship['Azimuth'] / 360 * args.rows) % args.rows < start + args.sector_rows
+
+    frame = encode_frame(ppi, radar_range=5000, radar_location=location, ships=ships)
+    sectors = [encode_sector(ppi[start:start + args.sector_rows], start, args.rows, radar_range=5000,
+                             radar_location=location, ships=[ship for ship in ships if in_sector(ship, start)])
+               for start in range(0, args.rows, args.sector_rows)]
+
+    # Frame mode: one message and one full inference per sweep
+    start = time.process_time()
+    for _ in range(args.sweeps):
+        decoded = FrameAssembler().update(decode_message(frame))
+    frame_decode_ms = (time.process_time() - start) / args.sweeps * 1000
+    start = time.process_time()
+    frame_points = server.infer(0, decoded['PPI'])
+    frame_infer_ms = (time.process_time() - start) * 1000
+
+    # Sector mode: decode every sector, infer a band every `cadence` rows
+    assembler = FrameAssembler(cadence_rows=args.cadence)
+    detections = SectorDetections()
+    decode_s = infer_s = 0.0
+    band_ms = []
+    for _ in range(args.sweeps):
+        for message in sectors:
+            start = time.process_time()
+            snapshot = assembler.update(decode_message(message))
+            decode_s += time.process_time() - start
+            if snapshot is None:
+                continue
+            start = time.process_time()
+            row_start, row_count = snapshot['sector']
+            rows = sector_rows(args.rows, row_start, row_count, args.margin)
+            points = detections.update(server.infer(0, snapshot['PPI'], rows=rows), row_start, row_count, args.rows)
+            band_ms.append((time.process_time() - start) * 1000)
+            infer_s += band_ms[-1] / 1000
+    server.stop()
+    assert np.array_equal(assembler.ppi, ppi.astype(np.float32))
+    assert len(snapshot['ships']) == len(ships)
+    sector_decode_ms = decode_s / args.sweeps * 1000
+    sector_infer_ms = infer_s / args.sweeps * 1000
+
+    # Mean time from a row being swept to its detections being available
+    sweep_ms = args.rows * args.row_ms
+    frame_latency = sweep_ms / 2 + frame_infer_ms
+    sector_wait = max(args.cadence, args.sector_rows)
+    sector_latency = sector_wait * args.row_ms / 2 + np.mean(band_ms)
+
+    sector_bytes = sum(len(message) for message in sectors)
+    print(f"PPI {args.rows}x{args.cols}, {args.sector_rows} rows per sector, inference every {args.cadence} rows, "
+          f"{args.row_ms} ms per row ({sweep_ms / 1000:.1f} s sweep), {torch.get_num_threads()} CPU threads")
+    print(f"{'mode':>8} {'KB/sweep':>9} {'decode ms/sweep':>16} {'infer ms/sweep':>15} {'latency ms':>11}")
+    print(f"{'frames':>8} {len(frame) / 1e3:>9.0f} {frame_decode_ms:>16.1f} {frame_infer_ms:>15.0f} "
+          f"{frame_latency:>11.0f}")
+    print(f"{'sectors':>8} {sector_bytes / 1e3:>9.0f} {sector_decode_ms:>16.1f} {sector_infer_ms:>15.0f} "
+          f"{sector_latency:>11.0f}")
+    print(f"Detections: {len(frame_points)} full frame, {len(points)} assembled from sectors, "
+          f"recall vs full frame {recall([frame_points], [points]):.3f} (3 px), "
+          f"ship recall {recall(positions, [frame_points]):.3f} / {recall(positions, [points]):.3f}")
+    print("Bytes per message: frame {:.0f} KB, sector {:.0f} KB".format(len(frame) / 1e3, len(sectors[0]) / 1e3))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# Dataset collection throughput: one JSON file per frame vs the sharded frame writer
+#
+# Run from the repository root: python -m OnboardSoftware.bench_frame_shards --radars 1 4 8
+import os
+import json
+import time
+import argparse
+import tempfile
+import threading
+import numpy as np
+from OnboardSoftware.ppi_codec import encode_frame, decode_message
+from OnboardSoftware.frame_shards import ShardWriter, ShardReader
+
+
+def clip_ppi(radar_id, data):
+    ppi = data['PPI']
+    data['PPI'] = np.clip(ppi, 0, min(5000, np.mean(ppi) + (2/3) * np.std(ppi)))
+    return data
+
+
+def make_message(radar_id, rows, cols, rng):
+    ppi = rng.integers(0, 3000, (rows, cols), dtype=np.int32)
+    ships = [{'Azimuth': float(rng.uniform(0, 360)), 'Distance': float(rng.uniform(0, 5000))} for _ in range(60)]
+    return encode_frame(ppi, radar_id=radar_id, timestamp=time.time(), radar_range=5000,
+                        radar_location={'x': 1.0, 'y': 0.0, 'z': 2.0}, ships=ships)
+
+
+def run_feeds(n_radars, frames_per_radar, messages, handle):
+    """Every radar thread pushes its frames as fast as the handler accepts them"""
+    def feed(radar_id):
+        for _ in range(frames_per_radar):
+            handle(radar_id, decode_message(messages[radar_id % len(messages)]))
+
+    threads = [threading.Thread(target=feed, args=(i,)) for i in range(n_radars)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def bench_json(output_dir, n_radars, frames_per_radar, messages):
+    counter = iter(range(10 ** 9))
+    lock = threading.Lock()
+
+    def handle(radar_id, data):
+        with lock:
+            n = next(counter)
+        data = clip_ppi(radar_id, data)
+        data['PPI'] = data['PPI'].tolist()
+        with open(os.path.join(output_dir, f'radar_{radar_id}_{n}.json'), 'w') as f:
+            json.dump(data, f)
+
+    elapsed = run_feeds(n_radars, frames_per_radar, messages, handle)
+    size = sum(os.path.getsize(os.path.join(output_dir, f)) for f in os.listdir(output_dir))
+    return n_radars * frames_per_radar / elapsed, size / elapsed, 0
+
+
+def bench_shards(output_dir, n_radars, frames_per_radar, messages, compress):
+    writer = ShardWriter(output_dir, compress=compress, transform=clip_ppi).start()
+    start = time.perf_counter()
+    run_feeds(n_radars, frames_per_radar, messages, writer.write)
+    writer.stop()
+    elapsed = time.perf_counter() - start
+    stats = writer.stats()
+
+    assert len(ShardReader(output_dir)) == n_radars * frames_per_radar
+    return stats['frames'] / elapsed, stats['bytes'] / elapsed, stats['max_backlog']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Frame shard writer benchmark')
+    parser.add_argument('--radars', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--frames', type=int, default=10, help='Frames per radar')
+    parser.add_argument('--rows', type=int, default=720)
+    parser.add_argument('--cols', type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    messages = [make_message(i, args.rows, args.cols, rng) for i in range(4)]
+
+    print(f"Frames {args.rows}x{args.cols}, {args.frames} frames per radar")
+    print(f"{'radars':>6} {'sink':>12} {'frames/s':>9} {'MB/s':>7} {'max backlog':>12}")
+    for n_radars in args.radars:
+        for sink in ('json', 'shards', 'shards+zlib'):
+            with tempfile.TemporaryDirectory() as tmp:
+                if sink == 'json':
+                    result = bench_json(tmp, n_radars, args.frames, messages)
+                else:
+                    result = bench_shards(tmp, n_radars, args.frames, messages, compress=sink == 'shards+zlib')
+            fps, bytes_per_s, backlog = result
+            print(f"{n_radars:>6} {sink:>12} {fps:>9.1f} {bytes_per_s / 1e6:>7.1f} {backlog:>12}")
+
+
+if __name__ == "__main__":
+    main()
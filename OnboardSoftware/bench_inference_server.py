@@ -0,0 +1,81 @@
+# Benchmarks the batched inference server against one batch-1 model per radar
+import os
+import time
+import argparse
+import threading
+import numpy as np
+import torch
+from centernetresnet import CenterNetBackbone
+from inference_server import BatchedInferenceServer
+
+
+def model_bytes(model):
+    return sum(t.numel() * t.element_size() for t in list(model.parameters()) + list(model.buffers()))
+
+
+def run_per_radar_baseline(model, frames, duration):
+    """Batch-1 forward passes, like one centernet-infer.py process per radar"""
+    processed = 0
+    start = time.perf_counter()
+    with torch.no_grad():
+        while time.perf_counter() - start < duration:
+            model(torch.from_numpy(frames[processed % len(frames)]).unsqueeze(0).unsqueeze(0))
+            processed += 1
+    return processed / (time.perf_counter() - start)
+
+
+def run_server(model, frames, n_radars, duration, batch_window, max_batch_size):
+    server = BatchedInferenceServer(model, torch.device('cpu'), batch_window=batch_window,
+                                    max_batch_size=max_batch_size).start()
+    stop = threading.Event()
+    counts = [0] * n_radars
+
+    def radar_feed(radar_id):
+        while not stop.is_set():
+            server.infer(radar_id, frames[radar_id % len(frames)])
+            counts[radar_id] += 1
+
+    threads = [threading.Thread(target=radar_feed, args=(i,), daemon=True) for i in range(n_radars)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stats = server.stats()
+    server.stop()
+    return sum(counts) / elapsed, stats['mean_batch_size']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Batched inference server benchmark')
+    parser.add_argument('--radars', type=int, nargs='+', default=[1, 4, 16, 64])
+    parser.add_argument('--rows', type=int, default=720)
+    parser.add_argument('--cols', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per configuration')
+    parser.add_argument('--batch-window', type=float, default=10, help='Milliseconds')
+    parser.add_argument('--max-batch', type=int, default=16)
+    args = parser.parse_args()
+
+    cores = torch.get_num_threads()
+    model = CenterNetBackbone(in_channels=1).eval()
+    rng = np.random.default_rng(0)
+    frames = [rng.random((args.rows, args.cols), dtype=np.float32) for _ in range(4)]
+
+    baseline_fps = run_per_radar_baseline(model, frames, args.duration)
+    print(f"Frames {args.rows}x{args.cols}, {cores} torch threads, CPU {os.cpu_count()} cores")
+    print(f"Model weights: {model_bytes(model) / 1e6:.1f} MB per copy")
+    print(f"Batch-1 baseline: {baseline_fps:.2f} frames/s ({baseline_fps / cores:.3f} per core)")
+    print(f"{'radars':>6} {'frames/s':>9} {'per core':>9} {'mean batch':>11} {'model MB (server)':>18} {'model MB (per radar)':>21}")
+
+    for n_radars in args.radars:
+        fps, mean_batch = run_server(model, frames, n_radars, args.duration,
+                                     args.batch_window / 1000, args.max_batch)
+        print(f"{n_radars:>6} {fps:>9.2f} {fps / cores:>9.3f} {mean_batch:>11.1f} "
+              f"{model_bytes(model) / 1e6:>18.1f} {n_radars * model_bytes(model) / 1e6:>21.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# Compares decode time of the JSON PPI messages against the binary frame codec
+import json
+import time
+import argparse
+import numpy as np
+from ppi_codec import encode_frame, decode_message
+
+
+def make_frame(rows, cols, n_ships, seed=0):
+    rng = np.random.default_rng(seed)
+    ppi = rng.integers(0, 3000, size=(rows, cols), dtype=np.int32)
+    ppi[rng.random((rows, cols)) < 0.9] = 0  # Mostly empty sea returns
+    ships = [
+        {"Id": i, "Azimuth": float(rng.uniform(0, 360)), "Distance": float(rng.uniform(0, 5000)),
+         "Bounds": f"0 {rng.uniform(0, 5000)} {rng.uniform(0, 360)} 120.0 20.0"}
+        for i in range(n_ships)
+    ]
+    return ppi, ships
+
+
+def time_decode(fn, message, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(message)
+        timings.append(time.perf_counter() - start)
+    return np.median(timings) * 1000
+
+
+def legacy_decode(message):
+    """The receivers' decode path before the binary codec"""
+    data = json.loads(message)
+    return np.array(data['PPI'], dtype=np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PPI frame decode benchmark')
+    parser.add_argument('--rows', type=int, default=720)
+    parser.add_argument('--cols', type=int, default=1000)
+    parser.add_argument('--ships', type=int, default=100)
+    parser.add_argument('--repeats', type=int, default=10)
+    args = parser.parse_args()
+
+    ppi, ships = make_frame(args.rows, args.cols, args.ships)
+    location = {'x': 10.0, 'y': 0.0, 'z': -20.0}
+
+    json_message = json.dumps({
+        'id': 0, 'timestamp': 0, 'range': 5000, 'PPI': ppi.tolist(),
+        'ships': ships, 'radarLocation': location
+    })
+    binary_message = encode_frame(ppi, radar_id=0, radar_range=5000,
+                                  radar_location=location, ships=ships)
+
+    decoded = decode_message(binary_message)
+    assert np.array_equal(decoded['PPI'], legacy_decode(json_message))
+
+    results = [
+        ('json.loads + np.array', len(json_message), time_decode(legacy_decode, json_message, args.repeats)),
+        ('decode_message (json)', len(json_message), time_decode(decode_message, json_message, args.repeats)),
+        ('decode_message (binary)', len(binary_message), time_decode(decode_message, binary_message, args.repeats)),
+    ]
+
+    print(f"PPI {args.rows}x{args.cols}, {args.ships} ships, median of {args.repeats} runs")
+    baseline = results[0][2]
+    for name, size, ms in results:
+        print(f"{name:<26} {size / 1e6:8.2f} MB {ms:10.2f} ms  {baseline / ms:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
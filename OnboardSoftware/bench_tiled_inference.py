@@ -0,0 +1,101 @@
+# CPU time per frame and detection recall of full-frame inference vs TiledModel
+#
+# Synthetic sweeps are mostly empty: zeros, sparse noise returns, sea clutter close to
+# the radar and ships grouped in a few sectors. Recall is measured against the
+# full-frame detections and against the ship positions. Pass a trained checkpoint with
+# --model for meaningful recall numbers.
+import time
+import argparse
+import numpy as np
+import torch
+from centernetresnet import CenterNetBackbone, detect_points_batched
+from inference_server import load_model
+from tiled_inference import TiledModel
+
+
+def synthetic_frames(n_frames, rows, cols, rng, n_ships=20, n_sectors=3):
+    frames = np.zeros((n_frames, rows, cols), dtype=np.float32)
+    ships = []
+    for frame in frames:
+        noise = rng.random((rows, cols)) < 0.002
+        frame[noise] = rng.uniform(0, 800, noise.sum())
+        frame[:, :cols // 15] += rng.gamma(2.0, 150.0, (rows, cols // 15))
+
+        sectors = rng.integers(0, rows, n_sectors)
+        positions = []
+        for _ in range(n_ships):
+            row = int(sectors[rng.integers(n_sectors)] + rng.integers(-rows // 24, rows // 24)) % rows
+            col = int(rng.integers(cols // 10, cols - 4))
+            frame[max(row - 3, 0):row + 4, col - 1:col + 2] += rng.uniform(2000, 4000)
+            positions.append((col, row))
+        ships.append(positions)
+    return frames, ships
+
+
+def recall(reference, points, distance=3.0):
+    found = total = 0
+    for ref, pts in zip(reference, points):
+        ref = np.asarray(ref, dtype=np.float64).reshape(-1, 2)
+        pts = np.asarray(pts, dtype=np.float64).reshape(-1, 2)
+        total += len(ref)
+        if len(ref) and len(pts):
+            distances = np.sqrt(((ref[:, None] - pts[None]) ** 2).sum(-1))
+            found += int((distances.min(axis=1) <= distance).sum())
+    return found / total if total else 1.0
+
+
+def run(model, frames, threshold):
+    points, seconds = [], []
+    with torch.no_grad():
+        for frame in frames:
+            start = time.process_time()
+            heatmap = model(torch.from_numpy(frame)[None, None])
+            points.extend(detect_points_batched(heatmap, threshold=threshold))
+            seconds.append(time.process_time() - start)
+    return points, np.mean(seconds) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tiled inference benchmark')
+    parser.add_argument('--model', type=str, default=None, help='Trained checkpoint (default: random weights)')
+    parser.add_argument('--frames', type=int, default=4)
+    parser.add_argument('--rows', type=int, default=720)
+    parser.add_argument('--cols', type=int, default=1000)
+    parser.add_argument('--ships', type=int, default=20)
+    parser.add_argument('--sectors', type=int, default=3, help='Azimuth sectors the ships are grouped in')
+    parser.add_argument('--threshold', type=float, default=0.3)
+    parser.add_argument('--tiles', type=int, nargs='+', default=[128, 256, 256, 256],
+                        help='Tile sizes to compare, as azimuth/range pairs')
+    parser.add_argument('--overlaps', type=int, nargs='+', default=[16, 32])
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    if args.model is None:
+        model = CenterNetBackbone(in_channels=1).eval()
+    else:
+        model = load_model(args.model, torch.device('cpu'))
+
+    frames, ships = synthetic_frames(args.frames, args.rows, args.cols, np.random.default_rng(0),
+                                     args.ships, args.sectors)
+
+    full_points, full_ms = run(model, frames, args.threshold)
+    print(f"{args.frames} frames {args.rows}x{args.cols}, {args.ships} ships in {args.sectors} sectors, "
+          f"{torch.get_num_threads()} CPU threads")
+    print(f"{'mode':>22} {'CPU ms/frame':>13} {'speedup':>8} {'cells run':>10} "
+          f"{'recall vs full':>15} {'ship recall':>12}")
+    print(f"{'full frame':>22} {full_ms:>13.0f} {1.0:>7.2f}x {'-':>10} {1.0:>15.3f} "
+          f"{recall(ships, full_points):>12.3f}")
+
+    for tile_shape in zip(args.tiles[::2], args.tiles[1::2]):
+        for overlap in args.overlaps:
+            tiled = TiledModel(model, tile_shape=tile_shape, overlap=overlap)
+            points, ms = run(tiled, frames, args.threshold)
+            stats = tiled.stats()
+            name = f'{tile_shape[0]}x{tile_shape[1]}, overlap {overlap}'
+            print(f"{name:>22} {ms:>13.0f} {full_ms / ms:>7.2f}x "
+                  f"{stats['active_fraction']:>9.0%} {recall(full_points, points):>15.3f} "
+                  f"{recall(ships, points):>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
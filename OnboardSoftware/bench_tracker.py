@@ -0,0 +1,87 @@
+# MultiTargetTracker time per sweep, track ID stability and API rows written per sweep
+#
+# Ships move at constant velocity through a radar's coverage. Every sweep each ship is
+# detected with probability --pd and position noise --noise, plus --clutter false
+# detections spread over the coverage. Rows written are what the API changes per sweep:
+# the raw replace deletes and re-inserts every detection, the tracker only inserts
+# births, updates moved tracks and deletes dead ones.
+import time
+import argparse
+import numpy as np
+from tracker import MultiTargetTracker, CONFIRMED
+
+
+def simulate(n_ships, sweeps, sweep_s, radar_range, pd, noise, clutter, stationary, rng):
+    positions = rng.uniform(-radar_range / 1.5, radar_range / 1.5, (n_ships, 2))
+    speeds = rng.uniform(0, 10, n_ships)
+    speeds[:int(n_ships * stationary)] = 0
+    headings = rng.uniform(0, 2 * np.pi, n_ships)
+    velocities = np.stack([speeds * np.sin(headings), speeds * np.cos(headings)], axis=1)
+
+    for sweep in range(sweeps):
+        truth = positions + velocities * sweep * sweep_s
+        detected = rng.random(n_ships) < pd
+        measured = truth[detected] + rng.normal(0, noise, (detected.sum(), 2))
+        false = rng.uniform(-radar_range, radar_range, (rng.poisson(clutter), 2))
+        yield sweep * sweep_s, truth, np.flatnonzero(detected), np.concatenate([measured, false])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tracker benchmark')
+    parser.add_argument('--ships', type=int, nargs='+', default=[50, 200, 500])
+    parser.add_argument('--sweeps', type=int, default=200)
+    parser.add_argument('--sweep-s', type=float, default=2.0, help='Seconds per sweep')
+    parser.add_argument('--range', type=float, default=20000, help='Radar range in metres')
+    parser.add_argument('--pd', type=float, default=0.9, help='Detection probability')
+    parser.add_argument('--noise', type=float, default=10.0, help='Position noise in metres')
+    parser.add_argument('--clutter', type=float, default=5.0, help='Mean false detections per sweep')
+    parser.add_argument('--stationary', type=float, default=0.3, help='Fraction of anchored ships')
+    args = parser.parse_args()
+
+    print(f"{args.sweeps} sweeps of {args.sweep_s} s, Pd {args.pd}, noise {args.noise} m, "
+          f"{args.clutter} clutter detections per sweep, {args.stationary:.0%} of ships stationary")
+    print(f"{'ships':>6} {'ms/sweep':>9} {'p99 ms':>7} {'tracks':>7} {'ID switches':>12} "
+          f"{'raw rows/sweep':>15} {'tracked rows/sweep':>19} {'reduction':>10}")
+
+    for n_ships in args.ships:
+        rng = np.random.default_rng(0)
+        tracker = MultiTargetTracker(measurement_std=args.noise)
+        seconds, raw_rows, tracked_rows = [], 0, 0
+        previous = None
+        last_track = {}
+        switches = 0
+        for timestamp, truth, detected, detections in simulate(
+                n_ships, args.sweeps, args.sweep_s, args.range, args.pd, args.noise,
+                args.clutter, args.stationary, rng):
+            start = time.perf_counter()
+            births, updates, deaths = tracker.update(detections, timestamp)
+            seconds.append(time.perf_counter() - start)
+
+            # Raw replace: delete the previous sweep's rows, insert this sweep's
+            raw_rows += (0 if previous is None else previous) + len(detections)
+            previous = len(detections)
+            tracked_rows += len(births) + len(updates) + len(deaths)
+
+            # ID switches: a ship associated with a different confirmed track than before
+            confirmed = tracker.status == CONFIRMED
+            if confirmed.any() and len(truth):
+                track_pos = tracker.x[confirmed, :2]
+                track_ids = tracker.ids[confirmed]
+                distance = np.hypot(*(truth[:, None] - track_pos[None]).transpose(2, 0, 1))
+                nearest = distance.argmin(axis=1)
+                for ship in np.flatnonzero(distance.min(axis=1) < 3 * args.noise):
+                    track_id = int(track_ids[nearest[ship]])
+                    if last_track.get(ship, track_id) != track_id:
+                        switches += 1
+                    last_track[ship] = track_id
+
+        # The first sweeps only create tentative tracks
+        warm = seconds[5:]
+        sweeps = args.sweeps
+        print(f"{n_ships:>6} {np.mean(warm) * 1000:>9.3f} {np.percentile(warm, 99) * 1000:>7.3f} "
+              f"{int((tracker.status == CONFIRMED).sum()):>7} {switches:>12} {raw_rows / sweeps:>15.0f} "
+              f"{tracked_rows / sweeps:>19.0f} {raw_rows / max(tracked_rows, 1):>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
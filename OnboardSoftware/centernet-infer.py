@@ -1,13 +1,21 @@
 import websocket
-import json
 import numpy as np
 import threading
 import argparse
 import time
 import torch
-from radar import create_radar_with_id, update_radar_location, process_radar_detections 
+from radar import (create_radar_with_id, update_radar_location, process_radar_detections, process_radar_tracks,
+                   predictions_to_local)
 from locations import getLatLong
-from centernetresnet import CenterNetBackbone, detect_points
+from ppi_codec import (decode_message, negotiation_message, FrameDecodeError, FORMAT_BINARY, FORMAT_JSON,
+                       STREAM_FRAMES, STREAM_SECTORS)
+from api_client import DetectionPublisher
+from pipeline import FramePipeline, POLICY_ALL, POLICY_LATEST
+from inference_server import BatchedInferenceServer, load_model
+from centernetresnet import CenterNetBackbone
+from tiled_inference import TiledModel
+from frame_assembler import FrameAssembler, SectorDetections, sector_rows
+from tracker import MultiTargetTracker
 
 # Only import matplotlib-related code if plotting is enabled
 def setup_plotting():
@@ -17,17 +25,42 @@ def setup_plotting():
     return fig, ax, plt, FuncAnimation
 
 class RadarProcessor:
-    def __init__(self, radar_id, model_path, enable_color=False, clip_value=None, enable_plot=False):
+    def __init__(self, radar_id, inference_server, enable_color=False, clip_value=None, enable_plot=False,
+                 frame_format=FORMAT_BINARY, drop_policy=POLICY_LATEST, queue_size=4,
+                 stream=STREAM_FRAMES, sector_rows=40, sector_margin=16, track=False):
         self.radar_id = radar_id
+        self.frame_format = frame_format
+        self.stream = stream
         self.color = enable_color
         self.clip = clip_value
         self.enable_plot = enable_plot
         self.reconnect_delay = 5
-        
-        # Setup device and model
-        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        self.model = self.load_model(model_path)
-        print(f"Loaded CenterNet model from {model_path}")
+
+        # API calls run on a background thread so they do not stall frame processing
+        self.publisher = DetectionPublisher().start()
+
+        # With tracking only track births, updates and deaths are sent to the API
+        self.tracker = MultiTargetTracker() if track else None
+
+        # Model is owned by the inference server, which may be shared with other radars
+        self.inference_server = inference_server
+
+        # Sector updates are assembled on the websocket thread so none of them is dropped,
+        # the pipeline then only sees the live PPI snapshots
+        self.assembler = None
+        if stream == STREAM_SECTORS:
+            self.assembler = FrameAssembler(cadence_rows=sector_rows)
+            self.sector_detections = SectorDetections()
+            self.sector_margin = sector_margin
+
+        # Decoding, inference and publishing run off the websocket thread
+        self.pipeline = FramePipeline(
+            decode=decode_message if self.assembler is None else (lambda snapshot: snapshot),
+            infer=self.infer_frame,
+            publish=self.publish_frame,
+            policy=drop_policy,
+            queue_size=queue_size
+        ).start()
         
         # Data storage
         self.latest_data = None
@@ -45,31 +78,11 @@ class RadarProcessor:
             self.scatter_gt = None
             self.legend = None
 
-    def load_model(self, model_path):
-        model = CenterNetBackbone(in_channels=1).to(self.device)
-        checkpoint = torch.load(model_path, map_location=self.device)
-        
-        if 'model_state_dict' in checkpoint:
-            model.load_state_dict(checkpoint['model_state_dict'])
-        else:
-            model.load_state_dict(checkpoint)
-            
-        model.eval()
-        return model
-
-    def run_model(self, ppi_data):
-        """Run CenterNet inference on PPI data"""
+    def run_model(self, ppi_data, rows=None):
+        """Run CenterNet inference on PPI data, or only on `rows` of it"""
         try:
-            # Prepare input tensor
-            image = torch.from_numpy(ppi_data).float().unsqueeze(0).unsqueeze(0)
-            image = image.to(self.device)
-            
-            # Get predictions
-            with torch.no_grad():
-                pred_heatmap = self.model(image)[0, 0]
-            
-            # Detect points from heatmap
-            return detect_points(pred_heatmap, threshold=0.3)
+            # Batched with frames from other radars sharing the server
+            return self.inference_server.infer(self.radar_id, ppi_data, rows=rows)
         except Exception as e:
             print(f"Error in model inference: {e}")
             return []
@@ -129,35 +142,72 @@ class RadarProcessor:
         return self.im, self.scatter, self.scatter_gt
 
     def on_message(self, ws, message):
+        if self.assembler is None:
+            self.pipeline.submit(self.radar_id, message)
+            return
+
         try:
-            data = json.loads(message)
-            ppi = data.get('PPI', 'NA')
-            radar_loc_unity = data.get('radarLocation', 'NA')
-            ground_truth = data.get('ships', [])
-            r_range = data.get('range', 5000)
-            
-            if ppi == "NA":
-                return
-                
-            ppi = np.array(ppi, dtype=np.float32)
-            ships = self.run_model(ppi)
-            print(f"PPI shape: {ppi.shape}")
-            
-            lat, long = getLatLong(radar_loc_unity['x'], radar_loc_unity['z'])
-            try:
-                update_radar_location(self.radar_id, lat, long, r_range//1000, ppi.shape[0])
-                process_radar_detections(self.radar_id, lat, long, ships, r_range, ppi.shape[1], 360.0/ppi.shape[0])
-            except Exception as e:
-                print(f"Error reaching server: {e}")
+            snapshot = self.assembler.update(decode_message(message))
+        except FrameDecodeError as e:
+            print(f"Error decoding sector: {e}")
+            return
+        if snapshot is not None:
+            self.pipeline.submit(self.radar_id, snapshot)
 
-            with self.data_lock:
-                self.latest_data = ppi
-                self.latest_ships = ships
-                self.latest_gt = ground_truth
-                self.radar_range = r_range
-                
-        except Exception as e:
-            print(f"Error processing message: {e}")
+    def infer_frame(self, data):
+        if self.assembler is None:
+            return data, self.run_model(data['PPI'])
+
+        # Only the rows swept since the last inferred snapshot go through the model
+        ppi = data['PPI']
+        row_start, row_count = self.sector_detections.pending(data)
+        rows = sector_rows(ppi.shape[0], row_start, row_count, self.sector_margin)
+        ships = self.sector_detections.update(self.run_model(ppi, rows), row_start, row_count, ppi.shape[0])
+        return data, ships
+
+    def publish_frame(self, result):
+        data, ships = result
+        ppi = data['PPI']
+        radar_loc_unity = data.get('radarLocation', 'NA')
+        ground_truth = data.get('ships', [])
+        r_range = data.get('range', 5000)
+
+        lat, long = getLatLong(radar_loc_unity['x'], radar_loc_unity['z'])
+        self.publisher.submit(('location', self.radar_id), update_radar_location,
+                              self.radar_id, lat, long, r_range//1000, ppi.shape[0])
+        if self.tracker is None:
+            self.publisher.submit(('detections', self.radar_id), process_radar_detections,
+                                  self.radar_id, lat, long, ships, r_range, ppi.shape[1], 360.0/ppi.shape[0])
+        else:
+            positions = predictions_to_local(ships, r_range, ppi.shape[1], 360.0/ppi.shape[0])
+            self.tracker.update(positions, data.get('timestamp') or time.time())
+            self.publisher.submit(('detections', self.radar_id), self.send_tracks, lat, long)
+
+        with self.data_lock:
+            self.latest_data = ppi
+            self.latest_ships = ships
+            self.latest_gt = ground_truth
+            self.radar_range = r_range
+
+        self.print_stats(ppi.shape)
+
+    def send_tracks(self, lat, long):
+        """Publisher job: sends every track change since the last send"""
+        # The delta is taken when the job runs, so a job replaced in the publish queue loses nothing
+        result = process_radar_tracks(self.radar_id, lat, long, self.tracker.pop_delta())
+        if result is None:
+            self.tracker.request_resync()
+        return result
+
+    def print_stats(self, shape):
+        stats = self.pipeline.stats()
+        publish_stats = self.publisher.stats()
+        frame_age = stats['frame_age'].get(self.radar_id, {})
+        dropped_frames = sum(stage['dropped'] for stage in stats['stages'].values())
+        print(f"PPI shape: {shape}, frame age: {frame_age.get('last_ms', 0.0):.0f} ms "
+              f"(p95 {frame_age.get('p95_ms', 0.0):.0f} ms), "
+              f"infer: {stats['stages']['infer']['mean_ms']:.0f} ms, dropped frames: {dropped_frames}, "
+              f"publish queue: {publish_stats['queue_depth']}, dropped updates: {publish_stats['dropped']}")
 
     def update_plot(self, frame):
         if not self.enable_plot:
@@ -180,6 +230,8 @@ class RadarProcessor:
 
         def on_open(ws):
             print("WebSocket connection opened")
+            # Servers without binary support ignore this and keep sending JSON
+            ws.send(negotiation_message(self.frame_format, self.stream))
 
         while True:
             try:
@@ -199,33 +251,82 @@ class RadarProcessor:
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument('-r', type=int, default=0, help='Radar ID')
+    parser.add_argument('-r', type=int, nargs='+', default=[0], help='Radar ID(s) served by this process')
     parser.add_argument('-c', '--color', action='store_true', help='Enable color output')
     parser.add_argument('--clip', type=int, default=0, help='Clip standard deviations')
     parser.add_argument('--model', type=str, default='best_model.pth', help='Path to model weights')
-    parser.add_argument('-v', '--plot_ppi', action='store_true', help='Plot PPI Image')
+    parser.add_argument('--artifact', type=str, default=None,
+                        help='Exported model from export_model.py, falls back to --model if it cannot be loaded')
+    parser.add_argument('--stream', choices=[STREAM_FRAMES, STREAM_SECTORS], default=STREAM_FRAMES,
+                        help='Receive full sweeps, or only newly swept azimuth rows assembled into a live PPI')
+    parser.add_argument('--sector-rows', type=int, default=40,
+                        help='Newly swept rows that trigger inference in sector mode')
+    parser.add_argument('--sector-margin', type=int, default=16,
+                        help='Context rows around a sector passed to the model')
+    parser.add_argument('--tiled', action='store_true', help='Only run the model on PPI tiles with returns')
+    parser.add_argument('--tile-size', type=int, nargs=2, default=[128, 256], help='Azimuth and range size of a tile')
+    parser.add_argument('--tile-overlap', type=int, default=16, help='Context pixels around each tile')
+    parser.add_argument('--track', action='store_true',
+                        help='Track detections across sweeps and only publish track births, updates and deaths')
+    parser.add_argument('-v', '--plot_ppi', action='store_true', help='Plot PPI Image (first radar only)')
+    parser.add_argument('--batch-window', type=float, default=10,
+                        help='Milliseconds to wait for frames from other radars before a forward pass')
+    parser.add_argument('--max-batch', type=int, default=16, help='Maximum frames per forward pass')
+    parser.add_argument('--frame-format', choices=[FORMAT_BINARY, FORMAT_JSON], default=FORMAT_BINARY,
+                        help='PPI frame format to request from the simulation')
+    parser.add_argument('--drop-policy', choices=[POLICY_LATEST, POLICY_ALL], default=POLICY_LATEST,
+                        help='Keep only the newest frame per radar, or process every frame')
+    parser.add_argument('--queue-size', type=int, default=4, help='Frames buffered between pipeline stages')
     args = parser.parse_args()
 
-    if not isinstance(args.r, int):
+    if not all(isinstance(radar_id, int) for radar_id in args.r):
         print("Invalid Radar ID")
         return
 
-    # Create radar with ID
-    create_radar_with_id(radar_id=args.r)
+    # One model shared by every radar in this process
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    start = time.perf_counter()
+    model = load_model(args.model, device, artifact_path=args.artifact)
+    source = args.model if isinstance(model, CenterNetBackbone) else args.artifact
+    print(f"Loaded CenterNet model from {source} in {time.perf_counter() - start:.2f} s")
+
+    if args.tiled:
+        model = TiledModel(model, tile_shape=tuple(args.tile_size), overlap=args.tile_overlap)
+
+    inference_server = BatchedInferenceServer(
+        model, device,
+        batch_window=args.batch_window / 1000,
+        max_batch_size=args.max_batch
+    ).start()
+
+    processors = []
+    for i, radar_id in enumerate(args.r):
+        # Create radar with ID
+        create_radar_with_id(radar_id=radar_id)
+
+        # Initialize radar processor
+        processor = RadarProcessor(
+            radar_id=radar_id,
+            inference_server=inference_server,
+            enable_color=args.color,
+            clip_value=args.clip if args.clip != 0 else None,
+            enable_plot=args.plot_ppi and i == 0,
+            frame_format=args.frame_format,
+            drop_policy=args.drop_policy,
+            queue_size=args.queue_size,
+            stream=args.stream,
+            sector_rows=args.sector_rows,
+            sector_margin=args.sector_margin,
+            track=args.track
+        )
+        processors.append(processor)
 
-    # Initialize radar processor
-    processor = RadarProcessor(
-        radar_id=args.r,
-        model_path=args.model,
-        enable_color=args.color,
-        clip_value=args.clip if args.clip != 0 else None,
-        enable_plot=args.plot_ppi
-    )
+        # Start WebSocket connection in a separate thread
+        websocket_thread = threading.Thread(target=processor.run)
+        websocket_thread.daemon = True
+        websocket_thread.start()
 
-    # Start WebSocket connection in a separate thread
-    websocket_thread = threading.Thread(target=processor.run)
-    websocket_thread.daemon = True
-    websocket_thread.start()
+    processor = processors[0]
 
     # Set up the animation if plotting is enabled
     if args.plot_ppi:
@@ -238,6 +339,7 @@ def main():
                 time.sleep(1)
         except KeyboardInterrupt:
             print("Shutting down...")
+            inference_server.stop()
 
 if __name__ == "__main__":
     main()
@@ -3,7 +3,6 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 import numpy as np
-from sklearn.cluster import DBSCAN
 from math import sqrt, atan2, pi
 
 
@@ -27,70 +26,190 @@ def convert_to_polar(point, image_size):
     return np.array([azimuth, distance])
 
 
-def detect_points(heatmap, threshold=0.3, nms_kernel_size=3, eps=20, min_samples=2):
+def convert_to_polar_batched(points, image_size):
+    """Vectorized convert_to_polar for an [N, 2] tensor of (x, y) points, returns [N, 2] (azimuth, distance)"""
+    center = torch.tensor([image_size[1] / 2, image_size[0] / 2],
+                          dtype=torch.float64, device=points.device)
+    offsets = points.to(torch.float64) - center
+
+    distance = torch.hypot(offsets[:, 0], offsets[:, 1])
+    azimuth = torch.atan2(offsets[:, 1], offsets[:, 0]) * 180 / pi
+    azimuth = torch.where(azimuth < 0, azimuth + 360, azimuth)
+
+    return torch.stack([azimuth, distance], dim=1)
+
+
+def _expand_ranges(starts, counts):
+    """Indices starts[i] .. starts[i] + counts[i] - 1 for every i, plus the owning i"""
+    owner = torch.repeat_interleave(torch.arange(len(counts), device=counts.device), counts)
+    offsets = torch.arange(int(counts.sum()), device=counts.device) - \
+        torch.repeat_interleave(torch.cumsum(counts, 0) - counts, counts)
+    return owner, starts[owner] + offsets
+
+
+def _radius_neighbors(coords, groups, eps):
+    """
+    All (i, j) pairs with |coords[i] - coords[j]| <= eps inside the same group,
+    found by bucketing points into an eps-sized grid and only comparing the 3x3 neighbouring cells
+    """
+    cells = torch.floor(coords / eps).long()
+    cells -= cells.min(dim=0).values
+    # One empty border cell on each side keeps neighbouring keys from wrapping into another row or group
+    grid_w = int(cells[:, 0].max()) + 3
+    grid_h = int(cells[:, 1].max()) + 3
+    keys = (groups * grid_h + cells[:, 1] + 1) * grid_w + cells[:, 0] + 1
+
+    order = torch.argsort(keys)
+    sorted_keys = keys[order]
+
+    src, dst = [], []
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            target = keys + dy * grid_w + dx
+            start = torch.searchsorted(sorted_keys, target, right=False)
+            end = torch.searchsorted(sorted_keys, target, right=True)
+            owner, positions = _expand_ranges(start, end - start)
+            src.append(owner)
+            dst.append(order[positions])
+
+    src = torch.cat(src)
+    dst = torch.cat(dst)
+    within = torch.linalg.norm(coords[src] - coords[dst], dim=1) <= eps
+    return src[within], dst[within]
+
+
+def _cluster_labels(coords, groups, eps, min_samples):
+    """
+    DBSCAN labels computed with tensor ops: core points are linked into connected
+    components, border points join the lowest labelled neighbouring cluster and
+    everything else is noise (-1). Cluster labels are the lowest member index.
+    """
+    n = len(coords)
+    src, dst = _radius_neighbors(coords, groups, eps)
+
+    # Neighbour counts include the point itself, as in sklearn
+    core = torch.bincount(src, minlength=n) >= min_samples
+
+    # Connected components over core-core edges by min-label propagation with pointer jumping
+    labels = torch.arange(n, device=coords.device)
+    core_edges = core[src] & core[dst]
+    core_src, core_dst = src[core_edges], dst[core_edges]
+    while True:
+        new_labels = labels.scatter_reduce(0, core_src, labels[core_dst], reduce='amin')
+        new_labels = new_labels[new_labels]
+        if torch.equal(new_labels, labels):
+            break
+        labels = new_labels
+
+    # Border points take the smallest cluster label among their core neighbours
+    border_edges = ~core[src] & core[dst]
+    border_labels = torch.full((n,), n, device=coords.device, dtype=torch.long)
+    border_labels = border_labels.scatter_reduce(0, src[border_edges], labels[dst[border_edges]], reduce='amin')
+
+    result = torch.full((n,), -1, device=coords.device, dtype=torch.long)
+    result = torch.where(core, labels, result)
+    result = torch.where(~core & (border_labels < n), border_labels, result)
+    return result
+
+
+def detect_points_batched(heatmaps, threshold=0.3, nms_kernel_size=3, eps=20, min_samples=2, max_peaks=1024):
     """
-    Extract points from a heatmap using non-maximum suppression and DBSCAN clustering
+    Vectorized peak extraction and clustering for a batch of heatmaps
+
+    Matches the former sklearn DBSCAN implementation (same points, same order) for
+    min_samples <= 2 as long as an image has at most `max_peaks` peaks. The only
+    tolerance is for two peaks exactly `eps` apart, where float rounding of the polar
+    transform decides whether they are neighbours. Above `max_peaks` only the strongest
+    peaks are clustered, and for min_samples > 2 a border point touching two clusters
+    may be assigned to the other one.
 
     Args:
-        heatmap: The prediction heatmap
+        heatmaps: Prediction heatmaps of shape [B, 1, H, W] or [B, H, W]
         threshold: Detection threshold for the heatmap
         nms_kernel_size: Kernel size for non-maximum suppression
-        eps: The maximum distance between two samples for DBSCAN clustering
-        min_samples: The minimum number of samples in a neighborhood for a point to be considered a core point
+        eps: The maximum distance between two points of the same cluster
+        min_samples: The minimum number of points in a neighborhood for a point to be considered a core point
+        max_peaks: Maximum number of peaks kept per image, None keeps all of them
+
+    Returns:
+        List with a list of (x, y) points for every heatmap in the batch
     """
     with torch.no_grad():
+        if heatmaps.dim() == 3:
+            heatmaps = heatmaps.unsqueeze(1)
+        batch_size, _, height, width = heatmaps.shape
+
         # Apply NMS
         pad = (nms_kernel_size - 1) // 2
-        hmax = F.max_pool2d(heatmap.unsqueeze(0).unsqueeze(0),
-                            kernel_size=nms_kernel_size,
-                            stride=1,
-                            padding=pad)
-        hmax = hmax[0, 0]
+        hmax = F.max_pool2d(heatmaps, kernel_size=nms_kernel_size, stride=1, padding=pad)
 
         # Find peaks
-        keep = (heatmap == hmax) & (heatmap > threshold)
-        ys, xs = torch.where(keep)
+        flat_heatmaps = heatmaps.flatten(1)
+        keep = ((heatmaps == hmax) & (heatmaps > threshold)).flatten(1)
 
-        points = np.array([(x.item(), y.item()) for x, y in zip(xs, ys)])
+        # Keep only the strongest peaks of very noisy heatmaps
+        if max_peaks is not None and int(keep.sum(dim=1).max()) > max_peaks:
+            scores = flat_heatmaps.masked_fill(~keep, float('-inf'))
+            top = scores.topk(min(max_peaks, scores.shape[1]), dim=1).indices
+            keep &= torch.zeros_like(keep).scatter_(1, top, True)
 
-        if len(points) == 0:
-            return []
+        # Row-major within each image, like torch.where on a single heatmap
+        batch_idx, flat_idx = torch.nonzero(keep, as_tuple=True)
+        results = [[] for _ in range(batch_size)]
+        if len(flat_idx) == 0:
+            return results
 
-        # Convert points to polar coordinates for clustering
-        image_size = heatmap.shape
-        polar_points = np.array([convert_to_polar(p, image_size) for p in points])
+        xs = flat_idx % width
+        ys = flat_idx // width
+        values = flat_heatmaps[batch_idx, flat_idx]
 
-        # Scale the coordinates to handle the circular nature of azimuth
-        # This ensures that points at 359° and 1° are considered close
-        X = np.column_stack(
-            [
-                np.sin(polar_points[:, 0] * pi / 180) * polar_points[:, 1],
-                np.cos(polar_points[:, 0] * pi / 180) * polar_points[:, 1],
-            ]
-        )
+        # Cluster in the cartesian plane of the polar transform so that 359 and 1 degrees are close
+        polar = convert_to_polar_batched(torch.stack([xs, ys], dim=1), (height, width))
+        azimuth = torch.deg2rad(polar[:, 0])
+        coords = torch.stack([torch.sin(azimuth) * polar[:, 1], torch.cos(azimuth) * polar[:, 1]], dim=1)
+        labels = _cluster_labels(coords, batch_idx, eps, min_samples)
+
+        # Representative of every cluster is its first point with the highest heatmap value
+        n = len(values)
+        index = torch.arange(n, device=values.device)
+        clustered = labels >= 0
+        safe_labels = torch.where(clustered, labels, index)
+        cluster_max = torch.full((n,), float('-inf'), device=values.device, dtype=values.dtype)
+        cluster_max = cluster_max.scatter_reduce(0, safe_labels, values, reduce='amax')
+        candidates = clustered & (values == cluster_max[safe_labels])
+        best = torch.full((n,), n, device=values.device, dtype=torch.long)
+        best = best.scatter_reduce(0, safe_labels[candidates], index[candidates], reduce='amin')
+        representatives = best[best < n]
+
+        # Noise points come first, then one point per cluster in label order
+        noise = index[~clustered]
+        selected = torch.cat([noise, representatives])
+        order_key = torch.cat([noise, n + labels[representatives]]) + batch_idx[selected] * 2 * n
+        selected = selected[torch.argsort(order_key)]
+
+        for b, x, y in zip(batch_idx[selected].tolist(), xs[selected].tolist(), ys[selected].tolist()):
+            results[b].append((x, y))
+
+        return results
+
+
+def detect_points(heatmap, threshold=0.3, nms_kernel_size=3, eps=20, min_samples=2, max_peaks=1024):
+    """
+    Extract points from a heatmap using non-maximum suppression and DBSCAN-style clustering
+
+    Args:
+        heatmap: The prediction heatmap [H, W], or a batch [B, 1, H, W] (returns one list per heatmap)
+        threshold: Detection threshold for the heatmap
+        nms_kernel_size: Kernel size for non-maximum suppression
+        eps: The maximum distance between two samples for DBSCAN clustering
+        min_samples: The minimum number of samples in a neighborhood for a point to be considered a core point
+        max_peaks: Maximum number of peaks clustered, see detect_points_batched
+    """
+    if heatmap.dim() == 4:
+        return detect_points_batched(heatmap, threshold, nms_kernel_size, eps, min_samples, max_peaks)
 
-        # Apply DBSCAN clustering
-        db = DBSCAN(eps=eps, min_samples=min_samples).fit(X)
-        labels = db.labels_
-
-        # Calculate cluster centers
-        final_points = []
-        unique_labels = np.unique(labels)
-        for label in unique_labels:
-            if label == -1:  # Noise points
-                noise_points = points[labels == label]
-                final_points.extend([(x, y) for x, y in noise_points])
-            else:
-                # Get all points in the cluster
-                cluster_points = points[labels == label]
-                # Take the point with highest heatmap value as the representative
-                heatmap_values = [
-                    heatmap[int(y), int(x)].item() for x, y in cluster_points
-                ]
-                best_point = cluster_points[np.argmax(heatmap_values)]
-                final_points.append((best_point[0], best_point[1]))
-
-        return final_points
+    return detect_points_batched(heatmap.unsqueeze(0).unsqueeze(0), threshold,
+                                 nms_kernel_size, eps, min_samples, max_peaks)[0]
 
 
 class ResNetBlock(nn.Module):
@@ -0,0 +1,235 @@
+# export_model.py
+#
+# Turns a CenterNet training checkpoint into an inference artifact for the onboard computer:
+#   python export_model.py --model best_model.pth --variant torchscript --output centernet.ts.pt
+#   python export_model.py --model best_model.pth --variant int8 --calibration-dir ../data --output centernet.int8.pt
+#   python export_model.py --model best_model.pth --variant onnx --output centernet.onnx
+import os
+import json
+import time
+import argparse
+import warnings
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.nn.utils.fusion import fuse_conv_bn_eval
+from centernetresnet import CenterNetBackbone, ResNetBlock
+
+VARIANT_EAGER = 'eager'
+VARIANT_TORCHSCRIPT = 'torchscript'
+VARIANT_INT8 = 'int8'
+VARIANT_ONNX = 'onnx'
+VARIANTS = (VARIANT_EAGER, VARIANT_TORCHSCRIPT, VARIANT_INT8, VARIANT_ONNX)
+
+# Stored next to the TorchScript graph so the loader knows what it is running
+METADATA_FILE = 'export.json'
+
+# Kept in fp32 by the int8 export. The quantized transposed convolutions and sigmoid were
+# measured to wreck the heatmap (mean error > 0.2), the encoder alone quantizes cleanly
+FP32_MODULES = ('deconv1', 'deconv2', 'head')
+
+# Frame size used for tracing and calibration when no real frames are given
+DEFAULT_FRAME_SHAPE = (360, 500)
+
+
+def fold_batchnorm(model):
+    """
+    Fold every BatchNorm2d that directly follows a Conv2d or ConvTranspose2d into the
+    convolution's weights and bias. Returns a new eval-mode model, `model` is left untouched.
+    """
+    model = _copy_eval(model)
+
+    for module in model.modules():
+        if isinstance(module, ResNetBlock):
+            module.conv1 = fuse_conv_bn_eval(module.conv1, module.bn1)
+            module.bn1 = nn.Identity()
+            module.conv2 = fuse_conv_bn_eval(module.conv2, module.bn2)
+            module.bn2 = nn.Identity()
+        elif isinstance(module, nn.Sequential):
+            layers = list(module)
+            for i in range(len(layers) - 1):
+                conv, bn = layers[i], layers[i + 1]
+                if isinstance(bn, nn.BatchNorm2d) and isinstance(conv, (nn.Conv2d, nn.ConvTranspose2d)):
+                    module[i] = fuse_conv_bn_eval(conv, bn, transpose=isinstance(conv, nn.ConvTranspose2d))
+                    module[i + 1] = nn.Identity()
+
+    return model
+
+
+def _copy_eval(model):
+    copy = CenterNetBackbone(in_channels=model.initial[0].in_channels)
+    copy.load_state_dict(model.state_dict())
+    return copy.eval()
+
+
+def example_input(frame_shape=DEFAULT_FRAME_SHAPE, batch_size=1):
+    return torch.rand(batch_size, 1, *frame_shape)
+
+
+def to_torchscript(model, frame_shape=DEFAULT_FRAME_SHAPE):
+    """Trace and freeze a (folded) model. The trace stays valid for other frame sizes and batch sizes"""
+    with torch.no_grad(), warnings.catch_warnings():
+        warnings.simplefilter('ignore', FutureWarning)
+        traced = torch.jit.trace(model, example_input(frame_shape))
+        return torch.jit.freeze(traced)
+
+
+def quantize_static(model, calibration_frames):
+    """
+    Post-training static int8 quantization (FX graph mode, fbgemm/x86 kernels).
+
+    Weights and activations of the encoder (everything outside FP32_MODULES) are int8,
+    BatchNorms are folded first; activation ranges come from running
+    `calibration_frames` ([N, rows, cols] float32 PPIs, as the onboard script feeds
+    them) through the model once.
+
+    Dynamic quantization is not offered: it only covers Linear and recurrent layers,
+    and CenterNet has none, so it would return the fp32 model unchanged.
+    """
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+    qconfig_mapping = get_default_qconfig_mapping('x86').set_object_type(torch.sigmoid, None)
+    for name in FP32_MODULES:
+        qconfig_mapping.set_module_name(name, None)
+
+    model = fold_batchnorm(model)
+    frames = torch.as_tensor(np.asarray(calibration_frames, dtype=np.float32))
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        prepared = prepare_fx(model, qconfig_mapping, (frames[:1].unsqueeze(1),))
+        with torch.no_grad():
+            for frame in frames:
+                prepared(frame[None, None])
+        return convert_fx(prepared)
+
+
+def export_onnx(model, output_path, frame_shape=DEFAULT_FRAME_SHAPE, opset=17):
+    """Export a (folded) model to ONNX with dynamic batch and frame size"""
+    with torch.no_grad():
+        torch.onnx.export(
+            model, example_input(frame_shape), output_path,
+            input_names=['ppi'], output_names=['heatmap'], opset_version=opset,
+            dynamic_axes={'ppi': {0: 'batch', 2: 'azimuth', 3: 'range'},
+                          'heatmap': {0: 'batch', 2: 'azimuth', 3: 'range'}},
+            dynamo=False,
+        )
+
+
+def load_calibration_frames(json_dir, limit=32):
+    """
+    PPI frames for int8 calibration from recorded per-frame JSON files (run.py output, or
+    shards converted with `frame_shards export`). Frames are used exactly as decoded, the
+    way centernet-infer.py feeds them to the model.
+    """
+    frames = []
+    for name in sorted(os.listdir(json_dir)):
+        if not name.endswith('.json'):
+            continue
+        with open(os.path.join(json_dir, name), 'r') as f:
+            frames.append(np.array(json.load(f)['PPI'], dtype=np.float32))
+        if len(frames) >= limit:
+            break
+
+    if not frames:
+        raise ValueError(f"No calibration frames found in {json_dir}")
+    return np.stack(frames)
+
+
+def export(model, variant, output_path, calibration_frames=None, frame_shape=DEFAULT_FRAME_SHAPE):
+    """
+    Write an inference artifact for `model`
+
+    Args:
+        model: CenterNetBackbone with trained weights
+        variant: VARIANT_TORCHSCRIPT, VARIANT_INT8 or VARIANT_ONNX
+        output_path: Artifact path
+        calibration_frames: [N, rows, cols] PPIs, required for VARIANT_INT8
+        frame_shape: Frame size used for tracing when no calibration frames are given
+    """
+    if variant == VARIANT_ONNX:
+        export_onnx(fold_batchnorm(model), output_path, frame_shape)
+        return
+
+    if variant == VARIANT_TORCHSCRIPT:
+        exported = to_torchscript(fold_batchnorm(model), frame_shape)
+    elif variant == VARIANT_INT8:
+        if calibration_frames is None or len(calibration_frames) == 0:
+            raise ValueError("int8 export needs calibration frames")
+        frame_shape = tuple(np.shape(calibration_frames)[1:])
+        exported = to_torchscript(quantize_static(model, calibration_frames), frame_shape)
+    else:
+        raise ValueError(f"Unknown export variant: {variant}")
+
+    metadata = {'variant': variant, 'frame_shape': list(frame_shape), 'created': time.time()}
+    torch.jit.save(exported, output_path, _extra_files={METADATA_FILE: json.dumps(metadata)})
+
+
+class OnnxModel:
+    """Runs an ONNX artifact with onnxruntime behind the same tensor-in, tensor-out call as the torch models"""
+
+    def __init__(self, path, num_threads=None):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads is not None:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, images):
+        heatmaps = self.session.run(None, {self.input_name: images.detach().cpu().numpy()})[0]
+        return torch.from_numpy(heatmaps)
+
+    def eval(self):
+        return self
+
+
+def load_artifact(path, device):
+    """
+    Load an artifact written by `export`. Raises if the file cannot be used on `device`,
+    so callers can fall back to the eager model.
+    """
+    if path.endswith('.onnx'):
+        if device.type != 'cpu':
+            raise RuntimeError("ONNX artifacts run on the CPU only")
+        return OnnxModel(path)
+
+    extra_files = {METADATA_FILE: ''}
+    model = torch.jit.load(path, map_location=device, _extra_files=extra_files)
+    metadata = json.loads(extra_files[METADATA_FILE] or '{}')
+    if metadata.get('variant') == VARIANT_INT8 and device.type != 'cpu':
+        raise RuntimeError("int8 artifacts run on the CPU only")
+    return model.eval()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export an optimized CenterNet inference artifact')
+    parser.add_argument('--model', type=str, default='best_model.pth', help='Path to model weights')
+    parser.add_argument('--variant', choices=VARIANTS[1:], default=VARIANT_TORCHSCRIPT)
+    parser.add_argument('--output', type=str, required=True, help='Artifact path')
+    parser.add_argument('--calibration-dir', type=str, default=None,
+                        help='Directory of recorded JSON frames for int8 calibration')
+    parser.add_argument('--calibration-frames', type=int, default=32)
+    parser.add_argument('--frame-shape', type=int, nargs=2, default=list(DEFAULT_FRAME_SHAPE),
+                        help='Azimuth and range size used for tracing')
+    args = parser.parse_args()
+
+    from inference_server import load_model
+    model = load_model(args.model, torch.device('cpu'))
+
+    calibration = None
+    if args.variant == VARIANT_INT8:
+        if args.calibration_dir is None:
+            parser.error("--calibration-dir is required for the int8 variant")
+        calibration = load_calibration_frames(args.calibration_dir, args.calibration_frames)
+
+    start = time.perf_counter()
+    export(model, args.variant, args.output, calibration, tuple(args.frame_shape))
+    print(f"Wrote {args.variant} artifact to {args.output} "
+          f"({os.path.getsize(args.output) / 1e6:.1f} MB, {time.perf_counter() - start:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
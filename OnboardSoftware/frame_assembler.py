@@ -0,0 +1,200 @@
+# frame_assembler.py
+"""
+Live PPI assembly from per-sector updates.
+
+In sector streaming mode the simulation sends only the azimuth rows swept since its
+last message, tagged with `rowStart` and `sweepRows`. FrameAssembler writes them into
+a ring buffer holding the live PPI and emits a snapshot for inference every
+`cadence_rows` new rows. Full frames (servers without sector support) replace the
+live PPI and are emitted as they are.
+
+With sector inference the model only sees the freshly swept rows plus some context
+(`sector_rows`, passed to BatchedInferenceServer.submit), and SectorDetections keeps
+the detections of the rest of the sweep. A snapshot waiting for inference can be
+replaced by a newer one (POLICY_LATEST), so the rows to infer are not the snapshot's
+own sector but everything swept since the last snapshot that was inferred: snapshots
+carry a running count of swept rows and SectorDetections.pending() turns it into the
+row range not inferred yet.
+"""
+import numpy as np
+
+# Rows the backbone needs to map heatmap rows 1:1 onto input rows
+BAND_MULTIPLE = 8
+
+
+class FrameAssembler:
+    """Ring buffer of azimuth rows, fed from a single thread"""
+
+    def __init__(self, cadence_rows=40, dtype=np.float32):
+        """
+        Args:
+            cadence_rows: New rows after which a snapshot is emitted
+            dtype: dtype of the live PPI
+        """
+        self.cadence_rows = cadence_rows
+        self.dtype = dtype
+        self.ppi = None
+        self.rows_seen = None
+        self.metadata = {}
+
+        self.pending_start = None
+        self.pending_rows = 0
+        # Row after the last one received and rows swept since the start, see pending()
+        self.row_end = None
+        self.rows_swept = 0
+        self.sectors = 0
+        self.snapshots = 0
+
+    @property
+    def complete(self):
+        """True once every azimuth row has been received at least once"""
+        return self.rows_seen is not None and bool(self.rows_seen.all())
+
+    def reset(self, rows, cols):
+        self.ppi = np.zeros((rows, cols), dtype=self.dtype)
+        self.rows_seen = np.zeros(rows, dtype=bool)
+        self.pending_start = None
+        self.pending_rows = 0
+        self.row_end = None
+
+    def update(self, data):
+        """
+        Add a decoded message (see ppi_codec.decode_message)
+
+        Returns:
+            dict: A frame dict whose 'PPI' is a copy of the live PPI, whose 'sector'
+                  is (first row, row count) of the rows new since the previous
+                  snapshot and whose 'swept' is (row after the last one received,
+                  rows swept so far), or None while fewer than `cadence_rows` new
+                  rows arrived
+        """
+        if data is None:
+            return None
+
+        rows = np.asarray(data['PPI'], dtype=self.dtype)
+        if 'rowStart' not in data:
+            # Full sweep
+            self.reset(*rows.shape)
+            self.metadata = {}
+            self.ppi[:] = rows
+            self.rows_seen[:] = True
+            self.row_end = 0
+            self.rows_swept += rows.shape[0]
+            self.snapshots += 1
+            data['PPI'] = self.ppi.copy()
+            data['sector'] = (0, rows.shape[0])
+            data['swept'] = (self.row_end, self.rows_swept)
+            return data
+
+        sweep_rows = int(data.pop('sweepRows'))
+        row_start = int(data.pop('rowStart'))
+        if self.ppi is None or self.ppi.shape != (sweep_rows, rows.shape[1]):
+            self.reset(sweep_rows, rows.shape[1])
+
+        index = (row_start + np.arange(len(rows))) % sweep_rows
+        self.ppi[index] = rows
+        self.rows_seen[index] = True
+        self.sectors += 1
+
+        if self.pending_start is None:
+            self.pending_start = row_start
+        self.pending_rows = min(self.pending_rows + len(rows), sweep_rows)
+
+        # Rows skipped by the simulation since the previous sector count as swept, so the
+        # range from the last inferred row to `row_end` always covers every new row
+        row_end = (row_start + len(rows)) % sweep_rows
+        advance = len(rows) if self.row_end is None else max(len(rows), (row_end - self.row_end) % sweep_rows)
+        self.rows_swept += advance
+        self.row_end = row_end
+
+        # Sector messages carry the ships inside the sector, the rest are kept
+        fresh = np.zeros(sweep_rows, dtype=bool)
+        fresh[index] = True
+        ships = [ship for ship in self.metadata.get('ships', [])
+                 if not fresh[int(round(ship.get('Azimuth', 0) / 360 * sweep_rows)) % sweep_rows]]
+        data['ships'] = ships + data.get('ships', [])
+
+        # Latest header fields and ground truth travel with the snapshot
+        del data['PPI']
+        self.metadata = data
+
+        if self.pending_rows < self.cadence_rows:
+            return None
+
+        snapshot = dict(self.metadata)
+        snapshot['PPI'] = self.ppi.copy()
+        snapshot['sector'] = (self.pending_start, self.pending_rows)
+        snapshot['swept'] = (self.row_end, self.rows_swept)
+        self.pending_start = None
+        self.pending_rows = 0
+        self.snapshots += 1
+        return snapshot
+
+    def stats(self):
+        return {
+            'sectors': self.sectors,
+            'snapshots': self.snapshots,
+            'complete': self.complete,
+        }
+
+
+def sector_rows(sweep_rows, row_start, row_count, margin=16):
+    """
+    PPI row indices of a sector plus `margin` context rows on both sides, wrapping
+    around 360 degrees, padded to a height the backbone maps 1:1. None when the band
+    would cover the whole sweep.
+    """
+    height = row_count + 2 * margin
+    height = -(-height // BAND_MULTIPLE) * BAND_MULTIPLE
+    if height >= sweep_rows:
+        return None
+
+    offset = row_start - (height - row_count) // 2
+    return (offset + np.arange(height)) % sweep_rows
+
+
+class SectorDetections:
+    """Detections of a whole sweep, replaced sector by sector"""
+
+    def __init__(self):
+        self.points = []
+        # FrameAssembler.rows_swept of the last snapshot passed to pending()
+        self.inferred_swept = None
+
+    def pending(self, snapshot):
+        """
+        Rows to infer for a snapshot, called once per snapshot that is actually inferred
+
+        Covers every row swept since the previous inferred snapshot, also the sectors of
+        snapshots the pipeline dropped in between, and the whole sweep on the first call.
+
+        Returns:
+            tuple: (first row, row count)
+        """
+        rows = snapshot['PPI'].shape[0]
+        row_end, rows_swept = snapshot['swept']
+        if self.inferred_swept is None:
+            row_count = rows
+        else:
+            row_count = min(rows_swept - self.inferred_swept, rows)
+        self.inferred_swept = rows_swept
+        return (row_end - row_count) % rows, row_count
+
+    def update(self, points, row_start, row_count, rows):
+        """
+        Args:
+            points: (x, y) detections of the sector band in PPI coordinates
+            row_start: First row of the fresh sector
+            row_count: Number of fresh rows
+            rows: Azimuth rows in a full sweep
+
+        Returns:
+            list: (x, y) detections of the whole sweep in PPI coordinates
+        """
+        def fresh(y):
+            return (y - row_start) % rows < row_count
+
+        self.points = ([p for p in self.points if not fresh(p[1])] +
+                       [p for p in points if fresh(p[1])])
+        self.points.sort(key=lambda p: p[1])
+        return list(self.points)
@@ -0,0 +1,268 @@
+# frame_shards.py
+"""
+Streaming sink for collected PPI frames.
+
+Frames are appended as ppi_codec binary records, optionally zlib-compressed, to
+rolling shard files. Every shard `<name>.bin` has an append-only `<name>.idx`
+holding one INDEX_ENTRY per record, so frames can be located without scanning.
+Records are written before their index entry, so after a crash the index never
+points past the end of the data file.
+
+Export to the JSON layout the training scripts read with:
+    python -m OnboardSoftware.frame_shards export <shard_dir> <json_dir>
+"""
+import os
+import json
+import time
+import zlib
+import queue
+import struct
+import argparse
+import threading
+import numpy as np
+from OnboardSoftware.ppi_codec import encode_frame, decode_frame
+
+# offset, stored length, raw length, radar id, receive time, flags
+INDEX_ENTRY = struct.Struct('<QIIidI')
+
+FLAG_ZLIB = 1
+
+# Fields carried in the frame header rather than the metadata JSON
+HEADER_FIELDS = ('PPI', 'id', 'timestamp', 'range', 'radarLocation', 'ships')
+
+
+class ShardWriter:
+    """
+    Appends frames to rolling shards on a background thread.
+
+    `write` only queues the frame. When `max_pending` frames are waiting it blocks
+    the caller instead of dropping frames, and the wait is counted as backlog.
+    """
+
+    def __init__(self, output_dir, max_shard_bytes=256 * 1024 * 1024, compress=False,
+                 compression_level=1, max_pending=64, transform=None, prefix=None):
+        """
+        Args:
+            output_dir: Directory the shards are written to
+            max_shard_bytes: A new shard is started once the current one reaches this size
+            compress: zlib-compress every record
+            compression_level: zlib level, 1 is fastest
+            max_pending: Frames buffered before `write` blocks
+            transform: Optional fn(radar_id, data) -> data applied on the writer thread
+            prefix: Shard name prefix, defaults to the start time so sessions never overwrite
+        """
+        self.output_dir = output_dir
+        self.max_shard_bytes = max_shard_bytes
+        self.compress = compress
+        self.compression_level = compression_level
+        self.transform = transform
+        self.prefix = prefix or time.strftime('frames_%Y%m%d_%H%M%S')
+
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.worker = None
+        self.shard_index = -1
+        self.data_file = None
+        self.index_file = None
+        self.shard_bytes = 0
+
+        self.stats_lock = threading.Lock()
+        self.started_at = None
+        self.frames_written = 0
+        self.bytes_written = 0
+        self.raw_bytes = 0
+        self.blocked_writes = 0
+        self.max_backlog = 0
+        self.errors = 0
+
+        os.makedirs(output_dir, exist_ok=True)
+
+    def start(self):
+        if self.worker is None:
+            self.started_at = time.monotonic()
+            self.worker = threading.Thread(target=self._run, daemon=True)
+            self.worker.start()
+        return self
+
+    def stop(self):
+        """Write everything still queued, then close the current shard"""
+        if self.worker is not None:
+            self.pending.put(None)
+            self.worker.join()
+            self.worker = None
+        self._close_shard()
+
+    def write(self, radar_id, data):
+        """Queue a decoded frame dict (as returned by decode_message) for writing"""
+        item = (radar_id, time.time(), data)
+        try:
+            self.pending.put_nowait(item)
+        except queue.Full:
+            with self.stats_lock:
+                self.blocked_writes += 1
+            self.pending.put(item)
+
+        with self.stats_lock:
+            self.max_backlog = max(self.max_backlog, self.pending.qsize())
+
+    def stats(self):
+        with self.stats_lock:
+            elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+            return {
+                'frames': self.frames_written,
+                'bytes': self.bytes_written,
+                'bytes_per_s': self.bytes_written / elapsed if elapsed else 0.0,
+                'compression_ratio': self.raw_bytes / self.bytes_written if self.bytes_written else 1.0,
+                'backlog': self.pending.qsize(),
+                'max_backlog': self.max_backlog,
+                'blocked_writes': self.blocked_writes,
+                'shards': self.shard_index + 1,
+                'errors': self.errors,
+            }
+
+    def _open_shard(self):
+        self._close_shard()
+        self.shard_index += 1
+        name = os.path.join(self.output_dir, f'{self.prefix}_{self.shard_index:05d}')
+        self.data_file = open(f'{name}.bin', 'ab')
+        self.index_file = open(f'{name}.idx', 'ab')
+        self.shard_bytes = self.data_file.tell()
+
+    def _close_shard(self):
+        if self.data_file is not None:
+            self.data_file.close()
+            self.index_file.close()
+            self.data_file = None
+            self.index_file = None
+
+    def _encode(self, radar_id, data):
+        if self.transform is not None:
+            data = self.transform(radar_id, data)
+
+        record = encode_frame(
+            data['PPI'],
+            radar_id=data.get('id', radar_id),
+            timestamp=data.get('timestamp', 0.0),
+            radar_range=data.get('range', 0.0),
+            radar_location=data.get('radarLocation'),
+            ships=data.get('ships', []),
+            extra={key: value for key, value in data.items() if key not in HEADER_FIELDS}
+        )
+        raw_len = len(record)
+        flags = 0
+        if self.compress:
+            record = zlib.compress(record, self.compression_level)
+            flags |= FLAG_ZLIB
+        return record, raw_len, flags
+
+    def _append(self, radar_id, received_at, record, raw_len, flags):
+        if self.data_file is None or self.shard_bytes >= self.max_shard_bytes:
+            self._open_shard()
+
+        offset = self.shard_bytes
+        self.data_file.write(record)
+        self.data_file.flush()
+        self.index_file.write(INDEX_ENTRY.pack(offset, len(record), raw_len, radar_id, received_at, flags))
+        self.index_file.flush()
+        self.shard_bytes += len(record)
+
+        with self.stats_lock:
+            self.frames_written += 1
+            self.bytes_written += len(record)
+            self.raw_bytes += raw_len
+
+    def _run(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                return
+
+            radar_id, received_at, data = item
+            try:
+                record, raw_len, flags = self._encode(radar_id, data)
+                self._append(radar_id, received_at, record, raw_len, flags)
+            except Exception as e:
+                print(f"Error writing frame from radar {radar_id}: {e}")
+                with self.stats_lock:
+                    self.errors += 1
+
+
+class ShardReader:
+    """Random access to the frames of every shard in a directory"""
+
+    def __init__(self, shard_dir, dtype=np.float32):
+        """
+        Args:
+            shard_dir: Directory written by ShardWriter
+            dtype: dtype of the returned PPI arrays, see decode_frame
+        """
+        self.shard_dir = shard_dir
+        self.dtype = dtype
+        self.entries = []
+
+        for name in sorted(file[:-len('.idx')] for file in os.listdir(shard_dir) if file.endswith('.idx')):
+            data_path = os.path.join(shard_dir, f'{name}.bin')
+            data_size = os.path.getsize(data_path)
+            with open(os.path.join(shard_dir, f'{name}.idx'), 'rb') as f:
+                index_bytes = f.read()
+
+            usable = len(index_bytes) - len(index_bytes) % INDEX_ENTRY.size
+            for offset, stored_len, raw_len, radar_id, received_at, flags in INDEX_ENTRY.iter_unpack(index_bytes[:usable]):
+                # Skip entries of a record that was not fully written
+                if offset + stored_len <= data_size:
+                    self.entries.append((data_path, offset, stored_len, radar_id, received_at, flags))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, idx):
+        data_path, offset, stored_len, _, _, flags = self.entries[idx]
+        with open(data_path, 'rb') as f:
+            f.seek(offset)
+            record = f.read(stored_len)
+        if flags & FLAG_ZLIB:
+            record = zlib.decompress(record)
+        return decode_frame(record, dtype=self.dtype)
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+
+def export_json(shard_dir, json_dir):
+    """Write every frame as radar_<id>_<n>.json in the layout PPIDataset reads"""
+    os.makedirs(json_dir, exist_ok=True)
+    reader = ShardReader(shard_dir)
+    for n, data in enumerate(reader):
+        data['PPI'] = data['PPI'].tolist()
+        with open(os.path.join(json_dir, f"radar_{data['id']}_{n:07d}.json"), 'w') as f:
+            json.dump(data, f)
+    return len(reader)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect or export PPI frame shards')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    stats_parser = subparsers.add_parser('stats', help='Print frame counts per radar')
+    stats_parser.add_argument('shard_dir')
+
+    export_parser = subparsers.add_parser('export', help='Export frames as training JSON files')
+    export_parser.add_argument('shard_dir')
+    export_parser.add_argument('json_dir')
+    args = parser.parse_args()
+
+    if args.command == 'stats':
+        reader = ShardReader(args.shard_dir)
+        counts = {}
+        for entry in reader.entries:
+            counts[entry[3]] = counts.get(entry[3], 0) + 1
+        print(f"{len(reader)} frames")
+        for radar_id, count in sorted(counts.items()):
+            print(f"  radar {radar_id}: {count}")
+    else:
+        count = export_json(args.shard_dir, args.json_dir)
+        print(f"Exported {count} frames to {args.json_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+# inference_server.py
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+import torch
+from centernetresnet import CenterNetBackbone, detect_points_batched
+
+
+def load_model(model_path, device, artifact_path=None):
+    """
+    Build CenterNetBackbone and load its weights from a checkpoint.
+
+    With `artifact_path`, the exported model from export_model.py is loaded instead;
+    if that fails (missing file, onnxruntime not installed, int8 artifact on a GPU)
+    the eager checkpoint is used.
+    """
+    if artifact_path is not None:
+        from export_model import load_artifact
+        try:
+            return load_artifact(artifact_path, device)
+        except Exception as e:
+            print(f"Could not load inference artifact {artifact_path} ({e}), using eager model")
+
+    model = CenterNetBackbone(in_channels=1).to(device)
+    checkpoint = torch.load(model_path, map_location=device)
+
+    if 'model_state_dict' in checkpoint:
+        model.load_state_dict(checkpoint['model_state_dict'])
+    else:
+        model.load_state_dict(checkpoint)
+
+    model.eval()
+    return model
+
+
+class BatchedInferenceServer:
+    """
+    Shares one CenterNet model between several radar feeds.
+
+    Frames submitted within `batch_window` seconds of the first waiting frame are
+    stacked into a single forward pass (up to `max_batch_size` frames). Each caller
+    gets back the detections of its own frame through a Future.
+    """
+
+    def __init__(self, model, device, batch_window=0.01, max_batch_size=16, threshold=0.3):
+        """
+        Args:
+            model: CenterNetBackbone in eval mode
+            device: torch.device the model lives on
+            batch_window: Seconds to wait for more frames after the first one arrives
+            max_batch_size: Maximum number of frames in one forward pass
+            threshold: Heatmap threshold passed to detect_points_batched
+        """
+        self.model = model
+        self.device = device
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.threshold = threshold
+
+        self.requests = queue.Queue()
+        self.stop_event = threading.Event()
+        self.worker = None
+
+        self.stats_lock = threading.Lock()
+        self.frames_processed = 0
+        self.batches_processed = 0
+
+    def start(self):
+        if self.worker is None:
+            self.stop_event.clear()
+            self.worker = threading.Thread(target=self._run, daemon=True)
+            self.worker.start()
+        return self
+
+    def stop(self):
+        """Stop the worker after its current batch; frames still queued fail with RuntimeError"""
+        self.stop_event.set()
+        if self.worker is not None:
+            self.worker.join()
+            self.worker = None
+        self._fail_pending()
+
+    def _fail_pending(self):
+        while True:
+            try:
+                _, _, _, future = self.requests.get_nowait()
+            except queue.Empty:
+                return
+            if not future.done():
+                future.set_exception(RuntimeError('Inference server stopped'))
+
+    def submit(self, radar_id, ppi, rows=None):
+        """
+        Queue a [azimuth, range] PPI frame, returns a Future resolving to its detections
+
+        With `rows` (an array of row indices) only those rows go through the model. Their
+        heatmap rows are put back in place of a zero heatmap of the whole frame, so the
+        detections are in frame coordinates and cluster exactly as in a full frame.
+        """
+        future = Future()
+        ppi = np.asarray(ppi, dtype=np.float32)
+        self.requests.put((radar_id, ppi, rows, future))
+        # Submitted while or after stopping, no worker will take it
+        if self.stop_event.is_set() and self.worker is None:
+            self._fail_pending()
+        return future
+
+    def infer(self, radar_id, ppi, timeout=None, rows=None):
+        """Blocking version of `submit`"""
+        return self.submit(radar_id, ppi, rows).result(timeout=timeout)
+
+    def stats(self):
+        with self.stats_lock:
+            return {
+                'frames': self.frames_processed,
+                'batches': self.batches_processed,
+                'mean_batch_size': self.frames_processed / self.batches_processed if self.batches_processed else 0.0,
+                'queue_depth': self.requests.qsize(),
+            }
+
+    def _collect_batch(self):
+        """Wait for one frame, then gather more until the window closes or the batch is full"""
+        try:
+            batch = [self.requests.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self.requests.get(timeout=remaining) if remaining > 0
+                             else self.requests.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            batch = self._collect_batch()
+            if not batch:
+                continue
+
+            # Frames of different sizes cannot share a forward pass
+            by_shape = {}
+            for request in batch:
+                _, ppi, rows, _ = request
+                key = (ppi.shape, None if rows is None else len(rows))
+                by_shape.setdefault(key, []).append(request)
+
+            for requests in by_shape.values():
+                self._process(requests)
+
+    def _process(self, requests):
+        futures = [future for _, _, _, future in requests]
+        try:
+            images = np.stack([ppi if rows is None else ppi[rows] for _, ppi, rows, _ in requests])
+            images = torch.from_numpy(images).unsqueeze(1).to(self.device)
+
+            with torch.no_grad():
+                heatmaps = self.model(images)
+
+            if requests[0][2] is not None:
+                bands = heatmaps
+                heatmaps = bands.new_zeros((len(requests), 1) + requests[0][1].shape)
+                for i, (_, _, rows, _) in enumerate(requests):
+                    heatmaps[i, :, torch.as_tensor(rows, device=bands.device)] = bands[i]
+
+            results = detect_points_batched(heatmaps, threshold=self.threshold)
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+
+        for future, result in zip(futures, results):
+            future.set_result(result)
+
+        with self.stats_lock:
+            self.frames_processed += len(requests)
+            self.batches_processed += 1
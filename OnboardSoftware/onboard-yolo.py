@@ -1,5 +1,4 @@
 import websocket
-import json
 import numpy as np
 import threading
 import argparse
@@ -8,6 +7,9 @@ from ultralytics import YOLO
 from yolo_infer import run_model
 from radar import create_radar_with_id, update_radar_location, process_radar_detections 
 from locations import getLatLong
+from ppi_codec import decode_message, negotiation_message, FORMAT_BINARY, FORMAT_JSON
+from api_client import DetectionPublisher
+from pipeline import FramePipeline, POLICY_ALL, POLICY_LATEST
 
 # Only import matplotlib-related code if plotting is enabled
 def setup_plotting():
@@ -17,13 +19,27 @@ def setup_plotting():
     return fig, ax, plt, FuncAnimation
 
 class RadarProcessor:
-    def __init__(self, radar_id, model_path, enable_color=False, clip_value=None, enable_plot=False):
+    def __init__(self, radar_id, model_path, enable_color=False, clip_value=None, enable_plot=False,
+                 frame_format=FORMAT_BINARY, drop_policy=POLICY_LATEST, queue_size=4):
         self.radar_id = radar_id
+        self.frame_format = frame_format
         self.model = YOLO(model_path)
         self.color = enable_color
         self.clip = clip_value
         self.enable_plot = enable_plot
         self.reconnect_delay = 5
+
+        # API calls run on a background thread so they do not stall frame processing
+        self.publisher = DetectionPublisher().start()
+
+        # Decoding, inference and publishing run off the websocket thread
+        self.pipeline = FramePipeline(
+            decode=decode_message,
+            infer=self.infer_frame,
+            publish=self.publish_frame,
+            policy=drop_policy,
+            queue_size=queue_size
+        ).start()
         
         # Data storage
         self.latest_data = None
@@ -96,38 +112,43 @@ class RadarProcessor:
         return self.im, self.scatter, self.scatter_gt
 
     def on_message(self, ws, message):
-        try:
-            data = json.loads(message)
-            ppi = data.get('PPI', 'NA')
-            radar_loc_unity = data.get('radarLocation', 'NA')
-            ground_truth = data.get('ships', [])
-            r_range = data.get('range', 5000)
-            
-            if ppi == "NA":
-                return
-                
-            ppi = np.array(ppi, dtype=np.float32)
-            print(f"Max value location: {np.unravel_index(ppi.argmax(), ppi.shape)}")
-            
-            ships = run_model(ppi, self.model)
-            
-            lat, long = getLatLong(radar_loc_unity['x'], radar_loc_unity['z'])
-            print(f"PPI shape: {ppi.shape}")
-            
-            try:
-                update_radar_location(self.radar_id, lat, long, r_range//1000, ppi.shape[0])
-                process_radar_detections(self.radar_id, lat, long, ships, r_range, ppi.shape[1], 360.0/ppi.shape[0])
-            except Exception as e:
-                print(f"Error reaching server: {e}")
+        self.pipeline.submit(self.radar_id, message)
+
+    def infer_frame(self, data):
+        ppi = data['PPI']
+        print(f"Max value location: {np.unravel_index(ppi.argmax(), ppi.shape)}")
+        return data, run_model(ppi, self.model)
+
+    def publish_frame(self, result):
+        data, ships = result
+        ppi = data['PPI']
+        radar_loc_unity = data.get('radarLocation', 'NA')
+        ground_truth = data.get('ships', [])
+        r_range = data.get('range', 5000)
+
+        lat, long = getLatLong(radar_loc_unity['x'], radar_loc_unity['z'])
+        self.publisher.submit(('location', self.radar_id), update_radar_location,
+                              self.radar_id, lat, long, r_range//1000, ppi.shape[0])
+        self.publisher.submit(('detections', self.radar_id), process_radar_detections,
+                              self.radar_id, lat, long, ships, r_range, ppi.shape[1], 360.0/ppi.shape[0])
 
-            with self.data_lock:
-                self.latest_data = ppi
-                self.latest_ships = ships
-                self.latest_gt = ground_truth
-                self.radar_range = r_range
-                
-        except Exception as e:
-            print(f"Error processing message: {e}")
+        with self.data_lock:
+            self.latest_data = ppi
+            self.latest_ships = ships
+            self.latest_gt = ground_truth
+            self.radar_range = r_range
+
+        self.print_stats(ppi.shape)
+
+    def print_stats(self, shape):
+        stats = self.pipeline.stats()
+        publish_stats = self.publisher.stats()
+        frame_age = stats['frame_age'].get(self.radar_id, {})
+        dropped_frames = sum(stage['dropped'] for stage in stats['stages'].values())
+        print(f"PPI shape: {shape}, frame age: {frame_age.get('last_ms', 0.0):.0f} ms "
+              f"(p95 {frame_age.get('p95_ms', 0.0):.0f} ms), "
+              f"infer: {stats['stages']['infer']['mean_ms']:.0f} ms, dropped frames: {dropped_frames}, "
+              f"publish queue: {publish_stats['queue_depth']}, dropped updates: {publish_stats['dropped']}")
 
     def update_plot(self, frame):
         if not self.enable_plot:
@@ -150,6 +171,8 @@ class RadarProcessor:
 
         def on_open(ws):
             print("WebSocket connection opened")
+            # Servers without binary support ignore this and keep sending JSON
+            ws.send(negotiation_message(self.frame_format))
 
         while True:
             try:
@@ -172,6 +195,11 @@ def main():
     parser.add_argument('-r', type=int, default=0, help='Radar ID')
     parser.add_argument('-c', '--color', action='store_true', help='Enable color output')
     parser.add_argument('-v', '--plot_ppi', action='store_true', help='Plot PPI Image')
+    parser.add_argument('--frame-format', choices=[FORMAT_BINARY, FORMAT_JSON], default=FORMAT_BINARY,
+                        help='PPI frame format to request from the simulation')
+    parser.add_argument('--drop-policy', choices=[POLICY_LATEST, POLICY_ALL], default=POLICY_LATEST,
+                        help='Keep only the newest frame per radar, or process every frame')
+    parser.add_argument('--queue-size', type=int, default=4, help='Frames buffered between pipeline stages')
     parser.add_argument('--model', type=str, default='best_model.pth', help='Path to model weights')
     parser.add_argument('--clip', type=int, default=0, help='Clip standard deviations')
     args = parser.parse_args()
@@ -189,7 +217,8 @@ def main():
         model_path=args.model,
         enable_color=args.color,
         clip_value=args.clip if args.clip != 0 else None,
-        enable_plot=args.plot_ppi
+        enable_plot=args.plot_ppi,
+        frame_format=args.frame_format
     )
 
     # Start WebSocket connection in a separate thread
@@ -0,0 +1,175 @@
+# pipeline.py
+import time
+import threading
+from collections import OrderedDict, deque
+import numpy as np
+
+POLICY_ALL = 'all'
+POLICY_LATEST = 'latest'
+
+STAGES = ('decode', 'infer', 'publish')
+
+
+class StageQueue:
+    """
+    Bounded queue between two pipeline stages.
+
+    With POLICY_ALL every frame is kept and `put` blocks while the queue is full.
+    With POLICY_LATEST each radar has a single slot, a newer frame replaces the
+    waiting one and `put` never blocks.
+    """
+
+    def __init__(self, policy=POLICY_LATEST, maxsize=4):
+        if policy not in (POLICY_ALL, POLICY_LATEST):
+            raise ValueError(f"Unknown drop policy: {policy}")
+
+        self.policy = policy
+        self.maxsize = maxsize
+        self.items = OrderedDict() if policy == POLICY_LATEST else deque()
+        self.condition = threading.Condition()
+        self.dropped = 0
+
+    def __len__(self):
+        with self.condition:
+            return len(self.items)
+
+    def put(self, radar_id, frame):
+        with self.condition:
+            if self.policy == POLICY_LATEST:
+                if radar_id in self.items:
+                    # Replacing in place keeps the radar's turn, so busy radars cannot starve others
+                    self.dropped += 1
+                elif len(self.items) >= self.maxsize:
+                    self.items.popitem(last=False)
+                    self.dropped += 1
+                self.items[radar_id] = frame
+            else:
+                while len(self.items) >= self.maxsize:
+                    self.condition.wait()
+                self.items.append(frame)
+            self.condition.notify_all()
+
+    def get(self, timeout=None):
+        """Oldest waiting frame, or None if nothing arrived within `timeout` seconds"""
+        with self.condition:
+            if not self.items and not self.condition.wait_for(lambda: self.items, timeout):
+                return None
+            if self.policy == POLICY_LATEST:
+                _, frame = self.items.popitem(last=False)
+            else:
+                frame = self.items.popleft()
+            self.condition.notify_all()
+            return frame
+
+
+class FramePipeline:
+    """
+    Staged receive -> decode -> infer -> publish pipeline, one thread per stage.
+
+    `submit` is the receive stage. It only timestamps the raw message and queues it,
+    so the websocket callback returns immediately. Each stage function takes the
+    output of the previous one, and returning None drops the frame (e.g. messages
+    without a PPI).
+    """
+
+    def __init__(self, decode, infer, publish, policy=POLICY_LATEST, queue_size=4, window=200):
+        """
+        Args:
+            decode: fn(message) -> decoded frame or None
+            infer: fn(decoded) -> inference result or None
+            publish: fn(result) -> anything, called for every frame that reaches the end
+            policy: POLICY_ALL to process every frame, POLICY_LATEST to keep only the newest per radar
+            queue_size: Capacity of each queue between stages
+            window: Number of recent samples kept for latency statistics
+        """
+        self.stage_fns = {'decode': decode, 'infer': infer, 'publish': publish}
+        self.policy = policy
+        self.queues = {stage: StageQueue(policy, queue_size) for stage in STAGES}
+        self.stop_event = threading.Event()
+        self.workers = []
+
+        self.stats_lock = threading.Lock()
+        self.stage_latency = {stage: deque(maxlen=window) for stage in STAGES}
+        self.frame_age = {}
+        self.window = window
+        self.received = {}
+        self.completed = {}
+
+    def start(self):
+        if not self.workers:
+            self.stop_event.clear()
+            for i, stage in enumerate(STAGES):
+                next_stage = STAGES[i + 1] if i + 1 < len(STAGES) else None
+                worker = threading.Thread(target=self._run_stage, args=(stage, next_stage), daemon=True)
+                worker.start()
+                self.workers.append(worker)
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
+
+    def submit(self, radar_id, message):
+        """Receive stage, called from the websocket callback"""
+        with self.stats_lock:
+            self.received[radar_id] = self.received.get(radar_id, 0) + 1
+        self.queues['decode'].put(radar_id, (radar_id, time.monotonic(), message))
+
+    def _run_stage(self, stage, next_stage):
+        stage_fn = self.stage_fns[stage]
+        stage_queue = self.queues[stage]
+
+        while not self.stop_event.is_set():
+            frame = stage_queue.get(timeout=0.1)
+            if frame is None:
+                continue
+
+            radar_id, received_at, payload = frame
+            start = time.monotonic()
+            try:
+                result = stage_fn(payload)
+            except Exception as e:
+                print(f"Error in {stage} stage for radar {radar_id}: {e}")
+                continue
+            finished = time.monotonic()
+
+            with self.stats_lock:
+                self.stage_latency[stage].append(finished - start)
+                if next_stage is None:
+                    self.frame_age.setdefault(radar_id, deque(maxlen=self.window)).append(finished - received_at)
+                    self.completed[radar_id] = self.completed.get(radar_id, 0) + 1
+
+            if next_stage is not None and result is not None:
+                self.queues[next_stage].put(radar_id, (radar_id, received_at, result))
+
+    def stats(self):
+        """Per-stage latency, per-radar frame age (receive to publish) and drop counters, in ms"""
+        def summarize(samples):
+            if not samples:
+                return {'mean_ms': 0.0, 'p95_ms': 0.0}
+            samples = np.asarray(samples) * 1000
+            return {'mean_ms': float(samples.mean()), 'p95_ms': float(np.percentile(samples, 95))}
+
+        with self.stats_lock:
+            return {
+                'policy': self.policy,
+                'stages': {
+                    stage: {
+                        **summarize(self.stage_latency[stage]),
+                        'queue_depth': len(self.queues[stage]),
+                        'dropped': self.queues[stage].dropped,
+                    }
+                    for stage in STAGES
+                },
+                'frame_age': {
+                    radar_id: {
+                        **summarize(ages),
+                        'last_ms': ages[-1] * 1000,
+                        'received': self.received.get(radar_id, 0),
+                        'published': self.completed.get(radar_id, 0),
+                    }
+                    for radar_id, ages in self.frame_age.items()
+                },
+            }
@@ -0,0 +1,182 @@
+# ppi_codec.py
+"""
+Binary PPI frame codec shared by the simulation server and the Python receivers.
+
+A binary frame is laid out as:
+
+    header   fixed little-endian struct (see HEADER below)
+    PPI      rows * cols raw little-endian values of the header's dtype
+    metadata UTF-8 JSON object holding the ships list and any extra fields
+
+Decoding only wraps the PPI bytes with np.frombuffer, so no Python lists are
+built for the 720x1000 matrix. Text (JSON) messages are still accepted, which
+lets a receiver fall back to the old format when a server does not answer the
+format negotiation sent in `negotiation_message`.
+
+Sessions that negotiate the sector stream receive the same messages holding only
+the azimuth rows swept since the previous one, flagged with FLAG_SECTOR and with
+`rowStart` and `sweepRows` in their metadata (see frame_assembler.py).
+"""
+import json
+import struct
+import numpy as np
+
+MAGIC = b'PPIF'
+VERSION = 1
+
+# magic, version, dtype code, flags, radar id, timestamp, range,
+# radar location (x, y, z), rows, cols, metadata length
+HEADER = struct.Struct('<4sBBHidf3fIII')
+
+DTYPES = {
+    1: np.dtype('<i4'),
+    2: np.dtype('<f4'),
+    3: np.dtype('<u2'),
+}
+DTYPE_CODES = {dtype: code for code, dtype in DTYPES.items()}
+
+FORMAT_JSON = 'json'
+FORMAT_BINARY = 'binary'
+
+# Full sweeps, or only the azimuth rows swept since the previous message
+STREAM_FRAMES = 'frames'
+STREAM_SECTORS = 'sectors'
+
+# Header flag of sector messages, their metadata holds rowStart and sweepRows
+FLAG_SECTOR = 1
+
+
+class FrameDecodeError(ValueError):
+    """Raised when a message is neither a valid binary frame nor PPI JSON"""
+
+
+def negotiation_message(frame_format=FORMAT_BINARY, stream=STREAM_FRAMES):
+    """Message a client sends on connect to select the frame format and stream mode for its session"""
+    message = {"format": frame_format}
+    if stream != STREAM_FRAMES:
+        message["stream"] = stream
+    return json.dumps(message)
+
+
+def encode_frame(ppi, radar_id=0, timestamp=0.0, radar_range=0.0,
+                 radar_location=None, ships=None, extra=None, flags=0):
+    """
+    Encode a PPI frame into the binary format
+
+    Args:
+        ppi: 2D array-like [azimuth, range]. int32, float32 and uint16 are sent as is,
+             anything else is converted to int32 like the simulation output
+        radar_id: ID of the radar that produced the frame
+        timestamp: Unix timestamp of the sweep
+        radar_range: Radar range in meters
+        radar_location: Dict with 'x', 'y', 'z' Unity coordinates
+        ships: Ground truth ships list as sent by the simulation
+        extra: Optional dict of additional metadata fields
+        flags: Header flags, e.g. FLAG_SECTOR
+    """
+    ppi = np.asarray(ppi)
+    if ppi.ndim != 2:
+        raise ValueError(f"PPI must be 2D, got shape {ppi.shape}")
+
+    dtype = ppi.dtype.newbyteorder('<')
+    if dtype not in DTYPE_CODES:
+        dtype = np.dtype('<i4')
+    ppi = np.ascontiguousarray(ppi, dtype=dtype)
+
+    location = radar_location or {}
+    metadata = dict(extra or {})
+    metadata['ships'] = ships or []
+    meta_bytes = json.dumps(metadata).encode('utf-8')
+
+    header = HEADER.pack(
+        MAGIC, VERSION, DTYPE_CODES[dtype], flags,
+        int(radar_id), float(timestamp), float(radar_range),
+        float(location.get('x', 0.0)), float(location.get('y', 0.0)), float(location.get('z', 0.0)),
+        ppi.shape[0], ppi.shape[1], len(meta_bytes)
+    )
+    return b''.join((header, ppi.tobytes(), meta_bytes))
+
+
+def encode_sector(rows, row_start, sweep_rows, extra=None, **kwargs):
+    """
+    Encode the azimuth rows [row_start, row_start + len(rows)) of a sweep of
+    `sweep_rows` rows. Remaining arguments are passed on to `encode_frame`.
+    """
+    extra = dict(extra or {})
+    extra.update(rowStart=int(row_start), sweepRows=int(sweep_rows))
+    return encode_frame(rows, extra=extra, flags=FLAG_SECTOR, **kwargs)
+
+
+def decode_frame(buffer, dtype=np.float32):
+    """
+    Decode a binary frame into the same dict layout as the JSON messages
+
+    Args:
+        buffer: bytes-like binary frame
+        dtype: dtype of the returned PPI array. None keeps the wire dtype as a
+               read-only zero-copy view of the buffer
+    """
+    view = memoryview(buffer)
+    if len(view) < HEADER.size:
+        raise FrameDecodeError("Frame is shorter than the header")
+
+    (magic, version, dtype_code, flags, radar_id, timestamp, radar_range,
+     loc_x, loc_y, loc_z, rows, cols, meta_len) = HEADER.unpack_from(view)
+
+    if magic != MAGIC:
+        raise FrameDecodeError("Bad frame magic")
+    if version != VERSION:
+        raise FrameDecodeError(f"Unsupported frame version {version}")
+    if dtype_code not in DTYPES:
+        raise FrameDecodeError(f"Unknown PPI dtype code {dtype_code}")
+
+    wire_dtype = DTYPES[dtype_code]
+    ppi_len = rows * cols * wire_dtype.itemsize
+    if len(view) != HEADER.size + ppi_len + meta_len:
+        raise FrameDecodeError("Frame length does not match its header")
+
+    ppi = np.frombuffer(view, dtype=wire_dtype, count=rows * cols,
+                        offset=HEADER.size).reshape(rows, cols)
+    if dtype is not None:
+        ppi = ppi.astype(dtype)
+
+    meta_start = HEADER.size + ppi_len
+    metadata = json.loads(bytes(view[meta_start:meta_start + meta_len])) if meta_len else {}
+
+    data = metadata
+    data.setdefault('ships', [])
+    data.update({
+        'id': radar_id,
+        'timestamp': timestamp,
+        'range': radar_range,
+        'radarLocation': {'x': loc_x, 'y': loc_y, 'z': loc_z},
+        'PPI': ppi,
+    })
+    return data
+
+
+def decode_message(message, dtype=np.float32):
+    """
+    Decode a WebSocket message of either format
+
+    Binary frames are decoded with `decode_frame`. Text messages are parsed as
+    the legacy JSON payload and their PPI converted to an array of `dtype`.
+    Returns None for messages without a PPI (e.g. negotiation acknowledgements).
+    """
+    if isinstance(message, (bytes, bytearray, memoryview)):
+        if bytes(message[:len(MAGIC)]) == MAGIC:
+            return decode_frame(message, dtype=dtype)
+        message = bytes(message).decode('utf-8')
+
+    try:
+        data = json.loads(message)
+    except ValueError as e:
+        raise FrameDecodeError(f"Message is not a PPI frame: {e}")
+
+    if not isinstance(data, dict):
+        raise FrameDecodeError("Message is not a PPI frame")
+
+    if data.get('PPI', 'NA') == 'NA':
+        return None
+    data['PPI'] = np.array(data['PPI'], dtype=dtype)
+    return data
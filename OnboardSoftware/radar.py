@@ -1,6 +1,33 @@
+import threading
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Optional
 
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session(pool_size: int = 10) -> requests.Session:
+    """
+    Shared HTTP session used by the API helpers below. Connections to the API are kept
+    alive and reused from a pool instead of opening a new TCP connection per call.
+    
+    Args:
+        pool_size (int, optional): Connections kept per host, only used on first call. Defaults to 10
+    
+    Returns:
+        requests.Session: The process-wide session
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
 
 def create_radar_with_id(
     radar_id: int,
@@ -37,7 +64,7 @@ def create_radar_with_id(
             "azimuth_resolution": azimuth_resolution
         }
         
-        response = requests.post(f"{base_url}/radars/", json=payload)
+        response = get_session().post(f"{base_url}/radars/", json=payload)
         response.raise_for_status()  # Raises an HTTPError if the status is 4xx, 5xx
         
         return response.json()
@@ -85,7 +112,7 @@ def update_radar_location(
             "azimuth_resolution": azimuth_resolution
         }
         
-        response = requests.patch(
+        response = get_session().patch(
             f"{base_url}/radars/{radar_id}/location",
             json=payload
         )
@@ -97,6 +124,7 @@ def update_radar_location(
         print(f"Error updating radar location: {str(e)}")
         return None
 import math
+import numpy as np
 from typing import List, Tuple, Optional
 import sys
 from OnboardSoftware.locations import getLatLong
@@ -113,7 +141,7 @@ def clearall(base_url: str = "http://localhost:7777") -> bool:
     """
     try:
         # Get all radars
-        del_detections = requests.delete(f"{base_url}/radars")
+        del_detections = get_session().delete(f"{base_url}/radars")
         
         del_detections.raise_for_status()
             
@@ -123,6 +151,157 @@ def clearall(base_url: str = "http://localhost:7777") -> bool:
         print(f"Error clearing database: {str(e)}")
         return False
 
+def predictions_to_detections(
+    radar_lat: float,
+    radar_long: float,
+    predictions: List[Tuple[float, float]],  # List of (scaled_distance, azimuth) tuples
+    radar_range: float,
+    ppi_max_distance: float,
+    azimuth_resolution: float,
+    confidence: float = 0.9,
+    vessel_type: str = "UNKNOWN"
+) -> List[dict]:
+    """
+    Convert (scaled_distance, azimuth index) predictions into detection payloads with
+    geographic coordinates.
+    
+    Args:
+        radar_lat (float): Latitude of the radar
+        radar_long (float): Longitude of the radar
+        predictions (List[Tuple[float, float]]): List of (scaled_distance, azimuth) tuples
+        radar_range (float): Actual radar range in kilometers
+        ppi_max_distance (float): Maximum distance in the PPI display units
+        azimuth_resolution (float): Angular resolution of the radar in degrees
+        confidence (float, optional): Confidence score for detections. Defaults to 0.9
+        vessel_type (str, optional): Type of vessel detected. Defaults to "UNKNOWN"
+    
+    Returns:
+        List[dict]: One payload with latitude, longitude, confidence and vessel_type per prediction
+    """
+    detections = []
+    for scaled_distance, azimuth_idx in predictions:
+        # Scale azimuth by resolution to get actual angle in degrees
+        azimuth = azimuth_idx * azimuth_resolution
+        
+        # Convert scaled distance to actual distance in meters
+        actual_distance = (scaled_distance / ppi_max_distance) * (radar_range )  # Convert km to meters
+        
+        # Convert polar coordinates (distance, azimuth) to cartesian coordinates (x, y)
+        # Azimuth is in degrees, convert to radians for math functions
+        # Azimuth 0° is North, increases clockwise
+        azimuth_rad = math.radians(90 - azimuth)  # Convert to mathematical angle (0° = East, CCW)
+        
+        x = actual_distance * math.cos(azimuth_rad)  # East-West distance
+        y = actual_distance * math.sin(azimuth_rad)  # North-South distance
+        
+        # Convert to latitude/longitude using the radar position as center
+        lat, long = getLatLong(x, y, radar_lat, radar_long)
+        
+        detections.append({
+            "latitude": lat,
+            "longitude": long,
+            "confidence": confidence,
+            "vessel_type": vessel_type
+        })
+    
+    return detections
+
+def predictions_to_local(
+    predictions: List[Tuple[float, float]],
+    radar_range: float,
+    ppi_max_distance: float,
+    azimuth_resolution: float
+) -> np.ndarray:
+    """
+    Vectorized polar to cartesian conversion of predictions_to_detections, without the
+    lat/long step. This is the frame MultiTargetTracker works in.
+    
+    Args:
+        predictions (List[Tuple[float, float]]): List of (scaled_distance, azimuth) tuples
+        radar_range (float): Actual radar range
+        ppi_max_distance (float): Maximum distance in the PPI display units
+        azimuth_resolution (float): Angular resolution of the radar in degrees
+    
+    Returns:
+        np.ndarray: [N, 2] (x, y) positions relative to the radar
+    """
+    predictions = np.asarray(predictions, dtype=np.float64).reshape(-1, 2)
+    distance = predictions[:, 0] / ppi_max_distance * radar_range
+    azimuth_rad = np.radians(90 - predictions[:, 1] * azimuth_resolution)
+    return np.stack([distance * np.cos(azimuth_rad), distance * np.sin(azimuth_rad)], axis=1)
+
+def tracks_to_detections(
+    radar_lat: float,
+    radar_long: float,
+    tracks: List[dict],
+    confidence: float = 0.9,
+    vessel_type: str = "UNKNOWN"
+) -> List[dict]:
+    """
+    Convert tracker states (track_id, x, y, vx, vy) into detection payloads with
+    geographic coordinates, speed in m/s and heading in degrees clockwise from North.
+    """
+    detections = []
+    for track in tracks:
+        lat, long = getLatLong(track["x"], track["y"], radar_lat, radar_long)
+        detections.append({
+            "track_id": track["track_id"],
+            "latitude": lat,
+            "longitude": long,
+            "speed": math.hypot(track["vx"], track["vy"]),
+            # getLatLong maps -x to north and y to east
+            "heading": math.degrees(math.atan2(track["vy"], -track["vx"])) % 360,
+            "confidence": confidence,
+            "vessel_type": vessel_type
+        })
+    return detections
+
+def process_radar_tracks(
+    radar_id: int,
+    radar_lat: float,
+    radar_long: float,
+    delta: dict,
+    base_url: str = "http://localhost:7777",
+    confidence: float = 0.9,
+    vessel_type: str = "UNKNOWN"
+) -> Optional[dict]:
+    """
+    Apply a track delta (see tracker.MultiTargetTracker.pop_delta) to the radar's detections in the
+    database: births are inserted, updates move the existing rows and deaths delete
+    them. With `full` set the births replace all of the radar's detections.
+    
+    Args:
+        radar_id (int): ID of the radar making the detections
+        radar_lat (float): Latitude of the radar
+        radar_long (float): Longitude of the radar
+        delta (dict): births, updates, deaths and full from MultiTargetTracker.pop_delta
+        base_url (str, optional): Base URL of the API. Defaults to "http://localhost:7777"
+        confidence (float, optional): Confidence score for detections. Defaults to 0.9
+        vessel_type (str, optional): Type of vessel detected. Defaults to "UNKNOWN"
+    
+    Returns:
+        Optional[dict]: API response with the inserted, updated and deleted counts, None if failed
+    """
+    try:
+        payload = {
+            "births": tracks_to_detections(radar_lat, radar_long, delta["births"], confidence, vessel_type),
+            "updates": tracks_to_detections(radar_lat, radar_long, delta["updates"], confidence, vessel_type),
+            "deaths": delta["deaths"],
+            "full": delta["full"]
+        }
+        
+        response = get_session().patch(f"{base_url}/detections/by_radar/{radar_id}/tracks", json=payload)
+        response.raise_for_status()
+        
+        return response.json()
+        
+    except requests.exceptions.RequestException as e:
+        print(f"Error updating tracks: {str(e)}")
+        return None
+    except Exception as e:
+        print(f"Error processing tracks: {str(e)}")
+        return None
+
 def process_radar_detections(
     radar_id: int,
     radar_lat: float,
@@ -134,10 +313,11 @@ def process_radar_detections(
     base_url: str = "http://localhost:7777",
     confidence: float = 0.9,
     vessel_type: str = "UNKNOWN"
-) -> List[Optional[dict]]:
+) -> Optional[dict]:
     """
     Process radar detections by converting scaled distances and azimuths to geographic
-    coordinates and adding them to the database.
+    coordinates and replacing the radar's detections in the database with them.
+    The replacement is a single request and a single transaction on the API side.
     
     Args:
         radar_id (int): ID of the radar making the detections
@@ -152,49 +332,22 @@ def process_radar_detections(
         vessel_type (str, optional): Type of vessel detected. Defaults to "UNKNOWN"
     
     Returns:
-        List[Optional[dict]]: List of API responses for each detection, None for failed detections
+        Optional[dict]: API response with the deleted and inserted counts, None if failed
     """
-    results = []
-    del_req = requests.delete(f"{base_url}/detections/by_radar/{radar_id}")
-    del_req.raise_for_status()
-
-    for scaled_distance, azimuth_idx in predictions:
-        try:
-            # Scale azimuth by resolution to get actual angle in degrees
-            azimuth = azimuth_idx * azimuth_resolution
-            
-            # Convert scaled distance to actual distance in meters
-            actual_distance = (scaled_distance / ppi_max_distance) * (radar_range )  # Convert km to meters
-            
-            # Convert polar coordinates (distance, azimuth) to cartesian coordinates (x, y)
-            # Azimuth is in degrees, convert to radians for math functions
-            # Azimuth 0° is North, increases clockwise
-            azimuth_rad = math.radians(90 - azimuth)  # Convert to mathematical angle (0° = East, CCW)
-            
-            x = actual_distance * math.cos(azimuth_rad)  # East-West distance
-            y = actual_distance * math.sin(azimuth_rad)  # North-South distance
-            
-            # Convert to latitude/longitude using the radar position as center
-            lat, long = getLatLong(x, y, radar_lat, radar_long)
-            
-            # Create detection in database
-            payload = {
-                "radar_id": radar_id,
-                "latitude": lat,
-                "longitude": long,
-                "confidence": confidence,
-                "vessel_type": vessel_type
-            }
-            
-            response = requests.post(f"{base_url}/detections/", json=payload)
-            response.raise_for_status()
-            results.append(response.json())
-            
-        except requests.exceptions.RequestException as e:
-            print(f"Error creating detection: {str(e)}")
-            results.append(None)
-        except Exception as e:
-            print(f"Error processing detection: {str(e)}")
-            results.append(None)
-    
-    return results
+    try:
+        detections = predictions_to_detections(
+            radar_lat, radar_long, predictions, radar_range, ppi_max_distance,
+            azimuth_resolution, confidence, vessel_type
+        )
+        
+        response = get_session().put(f"{base_url}/detections/by_radar/{radar_id}", json=detections)
+        response.raise_for_status()
+        
+        return response.json()
+        
+    except requests.exceptions.RequestException as e:
+        print(f"Error replacing detections: {str(e)}")
+        return None
+    except Exception as e:
+        print(f"Error processing detections: {str(e)}")
+        return None
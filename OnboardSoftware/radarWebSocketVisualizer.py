@@ -1,12 +1,12 @@
 # This file is only used when running a scene in Unity to visualize the PPI images
 import websocket
-import json
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
 import threading
 import argparse
 import time
+from ppi_codec import decode_message, negotiation_message, FORMAT_BINARY, FORMAT_JSON
 
 fig, ax = plt.subplots(figsize=(10, 10), subplot_kw=dict(projection='polar'))
 im = None
@@ -18,6 +18,7 @@ reconnect_delay = 5  # Delay in seconds before attempting to reconnect
 
 color = False
 clip = None
+frame_format = FORMAT_BINARY
 
 
 def create_ppi_plot(data, azimuth, range_bins, ships, radar_range):
@@ -77,13 +78,12 @@ radar_range = None
 
 def on_message(ws, message):
     global latest_data, latest_ships, radar_range
-    data = json.loads(message)
-    ppi = data.get('PPI', 'NA')
+    data = decode_message(message, dtype=None)
+    if data is None:
+        return
+    ppi = data['PPI']
     ships = data.get('ships', [])
     r_range = data.get('range', 5000)
-    if ppi == "NA":
-        return
-    ppi = np.array(ppi)
     print(np.unravel_index(ppi.argmax(), ppi.shape))
 
     with data_lock:
@@ -102,6 +102,7 @@ def on_close(ws, close_status_code, close_msg):
 
 def on_open(ws):
     print("Connection opened")
+    ws.send(negotiation_message(frame_format))
 
 
 def run_websocket():
@@ -140,6 +141,9 @@ if __name__ == "__main__":
                         help='Enable color output')
     parser.add_argument('--clip', type=int, default=0,
                         help='Clip standard deviations')
+    parser.add_argument('--frame-format', choices=[FORMAT_BINARY, FORMAT_JSON],
+                        default=FORMAT_BINARY,
+                        help='PPI frame format to request from the simulation')
     args = parser.parse_args()
 
     if isinstance(args.r, int):
@@ -154,6 +158,8 @@ if __name__ == "__main__":
     if args.color:
         color = True
 
+    frame_format = args.frame_format
+
     # Start WebSocket connection in a separate thread
     websocket_thread = threading.Thread(target=run_websocket)
     websocket_thread.daemon = True
@@ -0,0 +1,116 @@
+# tiled_inference.py
+import threading
+import torch
+import torch.nn.functional as F
+
+# The backbone downsamples by 8 and upsamples back, so tiles of a multiple of 8 pixels
+# produce a heatmap of exactly the tile size
+TILE_MULTIPLE = 8
+
+
+class TiledModel:
+    """
+    Runs CenterNet only on the parts of a PPI that contain returns.
+
+    The [azimuth, range] frame is cut into a grid of core cells of
+    `tile_shape - 2 * overlap` pixels. A cell is active when at least `min_pixels` of
+    its pixels are brighter than mean + k_std * std of the 3x3 mean filtered frame.
+    Every active cell is inferred as a tile extended by `overlap` pixels on each side,
+    so ships on a cell border see their full surroundings, and only the core of the
+    tile heatmap is written back. Inactive cells get a zero heatmap.
+
+    Takes and returns the same [B, 1, H, W] tensors as the model, so it can be used
+    anywhere the model is (BatchedInferenceServer, detect_points_batched).
+    """
+
+    def __init__(self, model, tile_shape=(128, 256), overlap=16, k_std=3.0, min_pixels=4, max_tiles_per_pass=8):
+        """
+        Args:
+            model: CenterNetBackbone (or exported artifact) in eval mode
+            tile_shape: (azimuth, range) size of the tiles fed to the model, multiples of 8
+            overlap: Context pixels added around each core cell, at most a quarter of the tile
+            k_std: Brightness threshold in standard deviations above the frame mean
+            min_pixels: Bright pixels needed for a cell to be inferred
+            max_tiles_per_pass: Maximum number of tiles in one forward pass
+        """
+        tile_h, tile_w = tile_shape
+        if tile_h % TILE_MULTIPLE or tile_w % TILE_MULTIPLE:
+            raise ValueError(f"Tile size must be a multiple of {TILE_MULTIPLE}, got {tile_shape}")
+        if 4 * overlap > min(tile_h, tile_w):
+            raise ValueError(f"Overlap {overlap} is too large for tiles of {tile_shape}")
+
+        self.model = model
+        self.tile_shape = (tile_h, tile_w)
+        self.core_shape = (tile_h - 2 * overlap, tile_w - 2 * overlap)
+        self.overlap = overlap
+        self.k_std = k_std
+        self.min_pixels = min_pixels
+        self.max_tiles_per_pass = max_tiles_per_pass
+
+        self.stats_lock = threading.Lock()
+        self.frames = 0
+        self.cells_total = 0
+        self.cells_inferred = 0
+
+    def eval(self):
+        return self
+
+    def stats(self):
+        with self.stats_lock:
+            return {
+                'frames': self.frames,
+                'cells': self.cells_total,
+                'inferred': self.cells_inferred,
+                'active_fraction': self.cells_inferred / self.cells_total if self.cells_total else 0.0,
+            }
+
+    def grid_shape(self, height, width):
+        core_h, core_w = self.core_shape
+        return -(-height // core_h), -(-width // core_w)
+
+    def active_cells(self, images):
+        """[B, rows, cols] bool grid of the cells worth inferring"""
+        batch_size, _, height, width = images.shape
+        core_h, core_w = self.core_shape
+        rows, cols = self.grid_shape(height, width)
+
+        # A 3x3 mean keeps ship returns and suppresses isolated noise pixels
+        smoothed = F.avg_pool2d(images, kernel_size=3, stride=1, padding=1)
+        flat = smoothed.flatten(1)
+        level = flat.mean(dim=1) + self.k_std * flat.std(dim=1)
+        bright = (smoothed > level.view(-1, 1, 1, 1)).float()
+        bright = F.pad(bright, (0, cols * core_w - width, 0, rows * core_h - height))
+        counts = bright.view(batch_size, rows, core_h, cols, core_w).sum(dim=(2, 4))
+        return counts >= self.min_pixels
+
+    def __call__(self, images):
+        batch_size, channels, height, width = images.shape
+        core_h, core_w = self.core_shape
+        tile_h, tile_w = self.tile_shape
+        rows, cols = self.grid_shape(height, width)
+        overlap = self.overlap
+
+        active = self.active_cells(images)
+        cells = torch.nonzero(active).tolist()
+
+        # Zero padding around the frame, like the backbone's own convolution padding
+        padded = F.pad(images, (overlap, cols * core_w - width + overlap, overlap, rows * core_h - height + overlap))
+        heatmaps = images.new_zeros((batch_size, 1, rows * core_h, cols * core_w))
+
+        for start in range(0, len(cells), self.max_tiles_per_pass):
+            chunk = cells[start:start + self.max_tiles_per_pass]
+            tiles = torch.stack([
+                padded[b, :, r * core_h:r * core_h + tile_h, c * core_w:c * core_w + tile_w]
+                for b, r, c in chunk
+            ])
+            outputs = self.model(tiles)
+            cores = outputs[:, :, overlap:overlap + core_h, overlap:overlap + core_w]
+            for (b, r, c), core in zip(chunk, cores):
+                heatmaps[b, :, r * core_h:(r + 1) * core_h, c * core_w:(c + 1) * core_w] = core
+
+        with self.stats_lock:
+            self.frames += batch_size
+            self.cells_total += active.numel()
+            self.cells_inferred += len(cells)
+
+        return heatmaps[:, :, :height, :width]
@@ -0,0 +1,290 @@
+# tracker.py
+"""
+Cross-sweep multi-target tracking between the detector and the API.
+
+Every track is a constant-velocity Kalman filter over [x, y, vx, vy] in metres in the
+radar's local frame (the x/y of radar.predictions_to_local). All tracks live in stacked
+arrays, so prediction and update are a handful of numpy operations per sweep.
+Detections are associated with tracks through cKDTrees over both: only pairs
+within the gate radius are scored (squared Mahalanobis distance), and the
+cheapest pairs are assigned first.
+
+The tracker reports what changed as a TrackDelta (births, updates, deaths), which is
+all the API needs to keep the radar's rows in sync.
+"""
+import threading
+import numpy as np
+
+# Track status
+TENTATIVE = 0
+CONFIRMED = 1
+
+# Chi-square 99.9% quantile for 2 degrees of freedom
+GATE_CHI2 = 13.82
+
+_H = np.array([[1.0, 0.0, 0.0, 0.0],
+               [0.0, 1.0, 0.0, 0.0]])
+
+
+def inv2x2(m):
+    """Inverse of a stack of 2x2 matrices, cheaper than np.linalg.inv for small stacks"""
+    a, b, c, d = m[:, 0, 0], m[:, 0, 1], m[:, 1, 0], m[:, 1, 1]
+    inverse = np.stack([np.stack([d, -b], axis=1), np.stack([-c, a], axis=1)], axis=1)
+    return inverse / (a * d - b * c)[:, None, None]
+
+
+class TrackDelta:
+    """
+    IDs of the tracks born, updated and deleted since the last send. Later sweeps are
+    merged into earlier ones, so the delta can be sent at any time and still leaves the
+    API consistent. States are only looked up when the delta is sent.
+    """
+
+    def __init__(self):
+        self.births = set()
+        self.updates = set()
+        self.deaths = set()
+
+    def merge(self, births, updates, deaths):
+        """Fold in one sweep of track IDs"""
+        self.births.update(births)
+        self.updates.update(updates)
+        self.updates -= self.births
+        deaths = set(deaths)
+        # Tracks that die before they were sent never reach the API
+        self.deaths |= deaths - self.births
+        self.births -= deaths
+        self.updates -= deaths
+
+    def clear(self):
+        self.births.clear()
+        self.updates.clear()
+        self.deaths.clear()
+
+    def __len__(self):
+        return len(self.births) + len(self.updates) + len(self.deaths)
+
+
+class MultiTargetTracker:
+    """Constant-velocity Kalman tracks with gated nearest-neighbour association"""
+
+    def __init__(self, measurement_std=15.0, acceleration_std=0.1, initial_speed_std=10.0,
+                 gate_radius=150.0, min_hits=3, max_misses=3, min_move=5.0):
+        """
+        Args:
+            measurement_std: Position noise of a detection in metres
+            acceleration_std: Process noise of the constant-velocity model in m/s^2
+            initial_speed_std: Velocity uncertainty of a new track in m/s
+            gate_radius: Upper bound in metres on the distance of a detection to a predicted track
+            min_hits: Associated sweeps before a tentative track is confirmed (born)
+            max_misses: Consecutive missed sweeps after which a track is deleted
+            min_move: Confirmed tracks that moved less than this many metres since their
+                      last published state are not reported as updates
+        """
+        self.measurement_std = measurement_std
+        self.acceleration_std = acceleration_std
+        self.initial_speed_std = initial_speed_std
+        self.gate_radius = gate_radius
+        self.min_hits = min_hits
+        self.max_misses = max_misses
+        self.min_move = min_move
+
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.x = np.zeros((0, 4))
+        self.P = np.zeros((0, 4, 4))
+        self.hits = np.zeros(0, dtype=np.int64)
+        self.misses = np.zeros(0, dtype=np.int64)
+        self.status = np.zeros(0, dtype=np.int8)
+        self.published = np.zeros((0, 2))
+        self.next_id = 1
+        self.last_time = None
+
+        # update() runs on the inference side, pop_delta() on the publisher thread
+        self.lock = threading.Lock()
+        self.delta = TrackDelta()
+        # Set while the API may be out of sync (start-up, failed send)
+        self.resync_requested = True
+        self.sweeps = 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def predict(self, dt):
+        if len(self.ids) == 0 or dt <= 0:
+            return
+        F = np.eye(4)
+        F[0, 2] = F[1, 3] = dt
+        q = self.acceleration_std ** 2
+        G = np.array([[dt * dt / 2, 0], [0, dt * dt / 2], [dt, 0], [0, dt]])
+        Q = q * G @ G.T
+
+        self.x = self.x @ F.T
+        self.P = F @ self.P @ F.T + Q
+
+    def associate(self, detections):
+        """
+        Returns:
+            (track_idx, det_idx): Indices of the matched tracks and detections
+        """
+        n_tracks, n_dets = len(self.ids), len(detections)
+        if n_tracks == 0 or n_dets == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        # Only needed when there is something to associate
+        from scipy.spatial import cKDTree
+
+        pairs = cKDTree(self.x[:, :2]).sparse_distance_matrix(
+            cKDTree(detections), self.gate_radius, output_type='ndarray')
+        if len(pairs) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        track_idx = pairs['i'].astype(np.int64)
+        det_idx = pairs['j'].astype(np.int64)
+
+        # Squared Mahalanobis distance of every candidate pair
+        S_inv = inv2x2(self.P[track_idx, :2, :2] + np.eye(2) * self.measurement_std ** 2)
+        residual = detections[det_idx] - self.x[track_idx, :2]
+        cost = np.einsum('ni,nij,nj->n', residual, S_inv, residual)
+        gated = cost <= GATE_CHI2
+        track_idx, det_idx, cost = track_idx[gated], det_idx[gated], cost[gated]
+
+        # Pairs whose track and detection appear in no other pair need no arbitration,
+        # which is nearly all of them for well separated targets
+        unique = ((np.bincount(track_idx, minlength=n_tracks)[track_idx] == 1) &
+                  (np.bincount(det_idx, minlength=n_dets)[det_idx] == 1))
+
+        # Greedy global nearest neighbour over the rest: cheapest pairs first, each side used once
+        contested = np.flatnonzero(~unique)
+        order = contested[np.argsort(cost[contested], kind='stable')]
+        track_used = np.zeros(n_tracks, dtype=bool)
+        det_used = np.zeros(n_dets, dtype=bool)
+        keep = np.flatnonzero(unique).tolist()
+        for i, t, d in zip(order.tolist(), track_idx[order].tolist(), det_idx[order].tolist()):
+            if not track_used[t] and not det_used[d]:
+                track_used[t] = det_used[d] = True
+                keep.append(i)
+        keep = np.asarray(keep, dtype=np.int64)
+        return track_idx[keep], det_idx[keep]
+
+    def correct(self, track_idx, measurements):
+        P = self.P[track_idx]
+        S = P[:, :2, :2] + np.eye(2) * self.measurement_std ** 2
+        K = P[:, :, :2] @ inv2x2(S)
+        residual = measurements - self.x[track_idx, :2]
+        self.x[track_idx] += np.einsum('nij,nj->ni', K, residual)
+        self.P[track_idx] = P - K @ (_H @ P)
+
+    def spawn(self, positions):
+        n = len(positions)
+        if n == 0:
+            return
+        x = np.zeros((n, 4))
+        x[:, :2] = positions
+        P = np.zeros((n, 4, 4))
+        P[:, 0, 0] = P[:, 1, 1] = self.measurement_std ** 2
+        P[:, 2, 2] = P[:, 3, 3] = self.initial_speed_std ** 2
+
+        self.ids = np.concatenate([self.ids, np.arange(self.next_id, self.next_id + n)])
+        self.next_id += n
+        self.x = np.concatenate([self.x, x])
+        self.P = np.concatenate([self.P, P])
+        self.hits = np.concatenate([self.hits, np.ones(n, dtype=np.int64)])
+        self.misses = np.concatenate([self.misses, np.zeros(n, dtype=np.int64)])
+        self.status = np.concatenate([self.status, np.full(n, TENTATIVE, dtype=np.int8)])
+        self.published = np.concatenate([self.published, positions])
+
+    def update(self, detections, timestamp):
+        """
+        Advance all tracks to `timestamp` and fold in one sweep of detections
+
+        Args:
+            detections: [M, 2] detection positions in metres
+            timestamp: Sweep time in seconds
+
+        Returns:
+            (births, updates, deaths): Track IDs changed by this sweep, also merged into
+                                       the delta returned by pop_delta
+        """
+        detections = np.asarray(detections, dtype=np.float64).reshape(-1, 2)
+        with self.lock:
+            dt = 0.0 if self.last_time is None else timestamp - self.last_time
+            self.last_time = timestamp
+            self.sweeps += 1
+
+            self.predict(dt)
+            track_idx, det_idx = self.associate(detections)
+            if len(track_idx):
+                self.correct(track_idx, detections[det_idx])
+
+            matched = np.zeros(len(self.ids), dtype=bool)
+            matched[track_idx] = True
+            self.hits[matched] += 1
+            self.misses[matched] = 0
+            self.misses[~matched] += 1
+
+            # Births: tentative tracks with enough hits
+            born = (self.status == TENTATIVE) & (self.hits >= self.min_hits)
+            self.status[born] = CONFIRMED
+
+            # Updates: confirmed, matched and moved enough since the last published state
+            moved = np.hypot(*(self.x[:, :2] - self.published).T) >= self.min_move
+            updated = matched & moved & (self.status == CONFIRMED) & ~born
+            self.published[born | updated] = self.x[born | updated, :2]
+
+            # Deaths: too many misses; tentative tracks die silently after one miss
+            dead = (self.misses > self.max_misses) | ((self.status == TENTATIVE) & (self.misses > 0))
+            births = self.ids[born].tolist()
+            updates = self.ids[updated].tolist()
+            deaths = self.ids[dead & (self.status == CONFIRMED)].tolist()
+            self.keep(~dead)
+
+            # Unmatched detections start tentative tracks
+            unmatched = np.ones(len(detections), dtype=bool)
+            unmatched[det_idx] = False
+            self.spawn(detections[unmatched])
+
+            self.delta.merge(births, updates, deaths)
+            return births, updates, deaths
+
+    def keep(self, mask):
+        self.ids = self.ids[mask]
+        self.x = self.x[mask]
+        self.P = self.P[mask]
+        self.hits = self.hits[mask]
+        self.misses = self.misses[mask]
+        self.status = self.status[mask]
+        self.published = self.published[mask]
+
+    def states(self, track_ids):
+        """Current {'track_id', 'x', 'y', 'vx', 'vy'} of live tracks"""
+        # IDs are handed out in increasing order and tracks are never reordered
+        index = np.searchsorted(self.ids, np.fromiter(track_ids, dtype=np.int64, count=len(track_ids)))
+        return [
+            {'track_id': track_id, 'x': x, 'y': y, 'vx': vx, 'vy': vy}
+            for track_id, (x, y, vx, vy) in zip(self.ids[index].tolist(), self.x[index].tolist())
+        ]
+
+    def request_resync(self):
+        """Make the next pop_delta a full snapshot, e.g. after a failed send"""
+        self.resync_requested = True
+
+    def pop_delta(self):
+        """
+        Take the track changes since the previous call
+
+        Returns:
+            dict: births and updates (lists of track states), deaths (list of track IDs)
+                  and full. With full set the births are every confirmed track and replace
+                  all of the radar's rows
+        """
+        with self.lock:
+            full = self.resync_requested
+            if full:
+                births = self.states(self.ids[self.status == CONFIRMED].tolist())
+                updates, deaths = [], []
+            else:
+                births = self.states(sorted(self.delta.births))
+                updates = self.states(sorted(self.delta.updates))
+                deaths = sorted(self.delta.deaths)
+            self.delta.clear()
+            self.resync_requested = False
+            return {'births': births, 'updates': updates, 'deaths': deaths, 'full': full}
@@ -7,6 +7,7 @@ using System.IO;
 using System.Threading.Tasks;
 using System.Collections;
 using System.Collections.Generic;
+using System.Text;
 
 public class RadarScript : MonoBehaviour
 {
@@ -72,6 +73,18 @@ public class RadarScript : MonoBehaviour
     private ComputeShader copyShader;
     private bool isInitialized = false;
 
+    // Binary frame layout, must match OnboardSoftware/ppi_codec.py
+    private static readonly byte[] FrameMagic = Encoding.ASCII.GetBytes("PPIF");
+    private const byte FrameVersion = 1;
+    private const byte FrameDtypeInt32 = 1;
+    private const int FrameHeaderSize = 48;
+    private const ushort FrameFlagSector = 1;
+
+    [Header("Sector Streaming")]
+    [Tooltip("Azimuth rows per message for clients that negotiated the sector stream")]
+    [Range(1, 180)] public int sectorRows = 20;
+    private int sectorStartRow = 0;
+
     void Awake()
     {
         scenario = FindObjectOfType<ScenarioController>();
@@ -205,7 +218,22 @@ public class RadarScript : MonoBehaviour
         {
             if (currentRotation == 0)
             {
-                var task = CollectData();
+                var sessions = server.WebSocketServices[$"/{path}"].Sessions;
+
+                // Only build the formats that connected clients negotiated
+                bool sendBinary = false;
+                bool sendJson = false;
+                foreach (var session in sessions.Sessions)
+                {
+                    if (session is DataService sectorService && sectorService.SectorStream)
+                        continue;
+                    if (session is DataService service && service.BinaryFrames)
+                        sendBinary = true;
+                    else
+                        sendJson = true;
+                }
+
+                var task = CollectData(sendJson, sendBinary);
 
                 yield return new WaitUntil(() => task.IsCompleted);
 
@@ -215,8 +243,22 @@ public class RadarScript : MonoBehaviour
                     continue;
                 }
 
-                server.WebSocketServices[$"/{path}"].Sessions.Broadcast(task.Result);
-                //Debug.Log($"Sent Data: {task.Result}");
+                var (json, binary) = task.Result;
+                foreach (var session in sessions.Sessions)
+                {
+                    if (session is DataService sectorService && sectorService.SectorStream)
+                        continue;
+                    if (session is DataService service && service.BinaryFrames)
+                    {
+                        if (binary != null)
+                            sessions.SendTo(binary, session.ID);
+                    }
+                    else if (json != null)
+                    {
+                        sessions.SendTo(json, session.ID);
+                    }
+                }
+                //Debug.Log($"Sent Data: {json}");
 
                 detectedShips.Clear();
             }
@@ -226,6 +268,7 @@ public class RadarScript : MonoBehaviour
             GenerateRainGPU(rainKernelIndex);
             CombineRadarAndRain();
             DetectShipsInView();
+            SendSector();
 
             RotateCamera();
 
@@ -300,7 +343,7 @@ public class RadarScript : MonoBehaviour
         }
     }
 
-    async Task<string> CollectData()
+    async Task<(string json, byte[] binary)> CollectData(bool json, bool binary)
     {
         Vector3 radarPosition = Vector3.zero;
         radarPosition = cameraObject.transform.position;
@@ -308,14 +351,108 @@ public class RadarScript : MonoBehaviour
         // Wait for a frame to ensure the queued action is processed
         await Task.Yield();
 
+        // Seconds with millisecond resolution, like the sector messages: the onboard tracker
+        // derives its time step and the published speeds from consecutive timestamps
+        double timestamp = DateTimeOffset.UtcNow.ToUnixTimeMilliseconds() / 1000.0;
+        var ships = detectedShips.Values.ToList();
+
+        string jsonFrame = null;
+        byte[] binaryFrame = null;
+
+        if (json)
+        {
+            var dataObject = new
+            {
+                id = radarID,
+                timestamp,
+                range = MaxDistance,
+                PPI = radarPPI,
+                ships,
+                radarLocation = radarPosition
+            };
+
+            JsonSerializer serializer = new JsonSerializer();
+            serializer.Converters.Add(new Vector3Converter());
+
+            using StringWriter sw = new StringWriter();
+            using (JsonWriter writer = new JsonTextWriter(sw))
+            {
+                await Task.Run(() => serializer.Serialize(writer, dataObject));
+            }
+            jsonFrame = sw.ToString();
+        }
+
+        if (binary)
+        {
+            binaryFrame = await Task.Run(() => EncodeBinaryFrame(timestamp, ships, radarPosition));
+        }
+
+        return (jsonFrame, binaryFrame);
+    }
+
+    // Sends the rows swept since the previous sector message to sessions in sector stream mode
+    private void SendSector()
+    {
+        int rows = radarPPI.GetLength(0);
+        int rotationIndex = Mathf.RoundToInt(currentRotation / resolution) % rows;
+        int rowCount = rotationIndex - sectorStartRow + 1;
+
+        // Sectors end at the last row so they never wrap around 360 degrees
+        if (rowCount < sectorRows && rotationIndex != rows - 1)
+            return;
+
+        int rowStart = sectorStartRow;
+        sectorStartRow = (rotationIndex + 1) % rows;
+        if (rowCount <= 0 || !server.IsListening)
+            return;
+
+        var sessions = server.WebSocketServices[$"/{path}"].Sessions;
+        double timestamp = DateTimeOffset.UtcNow.ToUnixTimeMilliseconds() / 1000.0;
+        Vector3 radarPosition = cameraObject.transform.position;
+        List<ShipData> ships = null;
+        byte[] binary = null;
+        string json = null;
+
+        foreach (var session in sessions.Sessions)
+        {
+            if (!(session is DataService service) || !service.SectorStream)
+                continue;
+
+            // Only the ships seen in this sector, the client keeps the rest of the sweep
+            ships ??= detectedShips.Values
+                .Where(ship => Mathf.RoundToInt(ship.Azimuth / resolution) >= rowStart &&
+                               Mathf.RoundToInt(ship.Azimuth / resolution) < rowStart + rowCount)
+                .ToList();
+            if (service.BinaryFrames)
+            {
+                binary ??= EncodeBinaryRows(timestamp, ships, radarPosition, rowStart, rowCount, FrameFlagSector);
+                sessions.SendTo(binary, session.ID);
+            }
+            else
+            {
+                json ??= EncodeJsonSector(timestamp, ships, radarPosition, rowStart, rowCount);
+                sessions.SendTo(json, session.ID);
+            }
+        }
+    }
+
+    string EncodeJsonSector(double timestamp, List<ShipData> ships, Vector3 radarPosition, int rowStart, int rowCount)
+    {
+        int rows = radarPPI.GetLength(0);
+        int cols = radarPPI.GetLength(1);
+        int[,] sector = new int[rowCount, cols];
+        Buffer.BlockCopy(radarPPI, rowStart * cols * sizeof(int), sector, 0, rowCount * cols * sizeof(int));
+
         var dataObject = new
         {
             id = radarID,
-            timestamp = DateTimeOffset.UtcNow.ToUnixTimeSeconds(),
+            timestamp,
             range = MaxDistance,
-            PPI = radarPPI,
-            ships = detectedShips.Values.ToList(),
-            radarLocation = radarPosition
+            PPI = sector,
+            ships,
+            radarLocation = radarPosition,
+            rowStart,
+            sweepRows = rows
         };
 
         JsonSerializer serializer = new JsonSerializer();
@@ -324,12 +461,56 @@ public class RadarScript : MonoBehaviour
         using StringWriter sw = new StringWriter();
         using (JsonWriter writer = new JsonTextWriter(sw))
         {
-            await Task.Run(() => serializer.Serialize(writer, dataObject));
+            serializer.Serialize(writer, dataObject);
         }
-
         return sw.ToString();
     }
 
+    // Header, raw little-endian int32 PPI rows, then the ships as a JSON block
+    byte[] EncodeBinaryFrame(double timestamp, List<ShipData> ships, Vector3 radarPosition)
+    {
+        return EncodeBinaryRows(timestamp, ships, radarPosition, 0, radarPPI.GetLength(0), 0);
+    }
+
+    // Rows [rowStart, rowStart + rowCount) of the PPI. Sector messages also carry their position in the sweep
+    byte[] EncodeBinaryRows(double timestamp, List<ShipData> ships, Vector3 radarPosition, int rowStart, int rowCount, ushort flags)
+    {
+        int sweepRows = radarPPI.GetLength(0);
+        object meta = (flags & FrameFlagSector) != 0
+            ? new { ships, rowStart, sweepRows }
+            : (object)new { ships };
+        byte[] metadata = Encoding.UTF8.GetBytes(JsonConvert.SerializeObject(meta));
+        int rows = rowCount;
+        int cols = radarPPI.GetLength(1);
+        int ppiBytes = rows * cols * sizeof(int);
+
+        using MemoryStream stream = new MemoryStream(FrameHeaderSize + ppiBytes + metadata.Length);
+        using BinaryWriter writer = new BinaryWriter(stream);
+
+        // BinaryWriter always writes little-endian
+        writer.Write(FrameMagic);
+        writer.Write(FrameVersion);
+        writer.Write(FrameDtypeInt32);
+        writer.Write(flags);
+        writer.Write(radarID);
+        writer.Write(timestamp);
+        writer.Write(MaxDistance);
+        writer.Write(radarPosition.x);
+        writer.Write(radarPosition.y);
+        writer.Write(radarPosition.z);
+        writer.Write((uint)rows);
+        writer.Write((uint)cols);
+        writer.Write((uint)metadata.Length);
+
+        // Row-major copy of the rows, Unity targets are little-endian
+        byte[] ppi = new byte[ppiBytes];
+        Buffer.BlockCopy(radarPPI, rowStart * cols * sizeof(int), ppi, 0, ppiBytes);
+        writer.Write(ppi);
+        writer.Write(metadata);
+
+        return stream.ToArray();
+    }
+
     private GameObject SpawnCameras(string name, int Width, int Height, float verticalAngle, float beamWidth, RenderTextureFormat format)
     {
         GameObject CameraObject = new()
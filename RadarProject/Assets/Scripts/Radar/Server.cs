@@ -1,4 +1,6 @@
 using UnityEngine;
+using Newtonsoft.Json;
+using Newtonsoft.Json.Linq;
 using WebSocketSharp;
 using WebSocketSharp.Server;
 
@@ -39,10 +41,37 @@ public class Server : MonoBehaviour
 
 public class DataService : WebSocketBehavior
 {
+    // Frame format negotiated by the client. Sessions get JSON frames unless they ask for binary
+    public bool BinaryFrames { get; private set; } = false;
+
+    // Sessions that ask for {"stream": "sectors"} get the newly swept rows instead of full sweeps
+    public bool SectorStream { get; private set; } = false;
+
     protected override void OnMessage(MessageEventArgs e)
     {
         // Handle incoming messages if needed
         Debug.Log($"Received message: {e.Data}");
+
+        // Clients select the frame format with {"format": "binary"} or {"format": "json"}
+        try
+        {
+            JObject message = JObject.Parse(e.Data);
+            string format = (string)message["format"];
+            if (format != null)
+            {
+                BinaryFrames = format == "binary";
+                SectorStream = (string)message["stream"] == "sectors";
+                Send(JsonConvert.SerializeObject(new
+                {
+                    format = BinaryFrames ? "binary" : "json",
+                    stream = SectorStream ? "sectors" : "frames"
+                }));
+            }
+        }
+        catch (JsonException)
+        {
+            Debug.LogWarning($"Ignoring malformed client message: {e.Data}");
+        }
     }
 
     protected override void OnOpen()
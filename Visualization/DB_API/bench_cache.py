@@ -0,0 +1,158 @@
+# Throughput and latency of the polled list endpoints with and without the response cache
+#
+# Starts the API with uvicorn on a fresh database (SQLite by default), registers --radars
+# radars and replaces one radar's --detections detections --rate times per second, like
+# sweeps arriving from the onboard instances. Meanwhile --clients map tabs request
+# GET /radars/, GET /detections/recent/ and GET /fused_tracks/ back to back. Modes:
+#   before the API of --baseline-dir, e.g. a checkout from before the cache
+#   off    CACHE_TTL_S=0 and CACHE_RADARS_TTL_S=0, only concurrent requests of a URL share a read
+#   cache  default TTLs
+#   etag   default TTLs, clients send the last ETag of a URL in If-None-Match like a browser
+# Bytes are response bodies as received by the clients, headers excluded. Client latency
+# includes queueing in this one client process; server latency is the handling time the
+# API reports in /cache/stats.
+# python bench_cache.py --clients 10 50
+import os
+import sys
+import time
+import asyncio
+import argparse
+import subprocess
+import numpy as np
+import httpx
+
+parser = argparse.ArgumentParser(description='Response cache benchmark')
+parser.add_argument('--database-url', default='sqlite:////tmp/bench_cache.db')
+parser.add_argument('--port', type=int, default=7792)
+parser.add_argument('--clients', type=int, nargs='+', default=[10, 50])
+parser.add_argument('--modes', nargs='+', default=['off', 'cache', 'etag'])
+parser.add_argument('--baseline-dir', default=None, help='DB_API checkout run by the before mode')
+parser.add_argument('--radars', type=int, default=20)
+parser.add_argument('--detections', type=int, default=50, help='Detections per radar sweep')
+parser.add_argument('--rate', type=float, default=2.0, help='Sweeps ingested per second')
+parser.add_argument('--duration', type=float, default=20.0, help='Seconds measured per run')
+parser.add_argument('--warmup', type=float, default=3.0)
+args = parser.parse_args()
+
+BASE_URL = f'http://127.0.0.1:{args.port}'
+CENTER_LAT = 25.326
+CENTER_LONG = 56.3818
+ENDPOINTS = {
+    'radars': '/radars/',
+    'recent': '/detections/recent/',
+    'fused': '/fused_tracks/',
+}
+MODE_ENV = {
+    'before': {},
+    'off': {'CACHE_TTL_S': '0', 'CACHE_RADARS_TTL_S': '0'},
+    'cache': {},
+    'etag': {},
+}
+
+
+def start_server(mode):
+    if args.database_url.startswith('sqlite:///') and os.path.exists(args.database_url[len('sqlite:///'):]):
+        os.remove(args.database_url[len('sqlite:///'):])
+    server = subprocess.Popen(
+        [sys.executable, '-c', 'import main, uvicorn; main.init_db(); '
+         f'uvicorn.run(main.app, host="127.0.0.1", port={args.port}, log_level="warning")'],
+        cwd=args.baseline_dir if mode == 'before' else os.path.dirname(os.path.abspath(__file__)),
+        env=dict(os.environ, DATABASE_URL=args.database_url, **MODE_ENV[mode]),
+        stderr=subprocess.DEVNULL
+    )
+    for _ in range(100):
+        try:
+            httpx.get(f'{BASE_URL}/radars/')
+            return server
+        except httpx.TransportError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError('API did not start')
+
+
+def sweep(rng):
+    latitude = CENTER_LAT + rng.uniform(-0.05, 0.05, args.detections)
+    longitude = CENTER_LONG + rng.uniform(-0.05, 0.05, args.detections)
+    return [{'latitude': lat, 'longitude': long, 'confidence': 0.9}
+            for lat, long in zip(latitude.tolist(), longitude.tolist())]
+
+
+async def ingest(client, stop):
+    rng = np.random.default_rng(0)
+    radar_id = 0
+    while not stop.is_set():
+        await client.put(f'/detections/by_radar/{radar_id}', json=sweep(rng))
+        radar_id = (radar_id + 1) % args.radars
+        await asyncio.sleep(1 / args.rate)
+
+
+async def tab(client, conditional, results, stop):
+    etags = {}
+    while not stop.is_set():
+        for name, url in ENDPOINTS.items():
+            headers = {'If-None-Match': etags[url]} if conditional and url in etags else {}
+            start = time.perf_counter()
+            response = await client.get(url, headers=headers)
+            if 'etag' in response.headers:
+                etags[url] = response.headers['etag']
+            if results['measuring']:
+                results[name].append((time.perf_counter() - start, response.status_code, len(response.content)))
+
+
+async def run(mode, n_clients):
+    rng = np.random.default_rng(1)
+    limits = httpx.Limits(max_connections=n_clients + 1, max_keepalive_connections=n_clients + 1)
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=120, limits=limits) as client:
+        for radar_id in range(args.radars):
+            await client.post('/radars/', json={'radar_id': radar_id, 'latitude': CENTER_LAT, 'longitude': CENTER_LONG,
+                                                'range_km': 5, 'azimuth_resolution': 0.5})
+            await client.put(f'/detections/by_radar/{radar_id}', json=sweep(rng))
+
+        results = {name: [] for name in ENDPOINTS}
+        results['measuring'] = False
+        stop = asyncio.Event()
+        tasks = [asyncio.create_task(ingest(client, stop))]
+        tasks += [asyncio.create_task(tab(client, mode == 'etag', results, stop)) for _ in range(n_clients)]
+        await asyncio.sleep(args.warmup)
+        results['measuring'] = True
+        start = time.perf_counter()
+        await asyncio.sleep(args.duration)
+        results['measuring'] = False
+        elapsed = time.perf_counter() - start
+        response = await client.get('/cache/stats')
+        stats = response.json() if response.status_code == 200 else {'endpoints': {}}
+        stop.set()
+        await asyncio.gather(*tasks)
+    return results, elapsed, stats
+
+
+def main():
+    print(f"{args.database_url}, {args.radars} radars x {args.detections} detections, "
+          f"{args.rate:g} sweeps/s, {args.duration:g} s per run")
+    print(f"{'clients':>8} {'mode':>6} {'req/s':>8} {'KB/s':>8}  "
+          + ' '.join(f"{name + ' p50 client/server ms (hit%, 304%)':>44}" for name in ENDPOINTS))
+    keys = {'radars': 'radars', 'recent': 'detections_recent', 'fused': 'fused_tracks'}
+    for n_clients in args.clients:
+        for mode in args.modes:
+            server = start_server(mode)
+            try:
+                results, elapsed, stats = asyncio.run(run(mode, n_clients))
+            finally:
+                server.terminate()
+                server.wait()
+            total = sum(len(results[name]) for name in ENDPOINTS)
+            kilobytes = sum(size for name in ENDPOINTS for _, _, size in results[name]) / 1024
+            columns = []
+            for name in ENDPOINTS:
+                seconds = np.array([latency for latency, _, _ in results[name]]) * 1000
+                p50 = np.percentile(seconds, 50) if len(seconds) else float('nan')
+                not_modified = np.mean([status == 304 for _, status, _ in results[name]]) * 100
+                reported = stats['endpoints'].get(keys[name], {})
+                columns.append(f"{p50:>10.1f}/{reported.get('p50_ms', float('nan')):<8.2f} "
+                               f"({reported.get('hit_rate', 0.0) * 100:>3.0f}%, {not_modified:>3.0f}%)")
+            print(f"{n_clients:>8} {mode:>6} {total / elapsed:>8.1f} {kilobytes / elapsed:>8.1f}  "
+                  + ' '.join(f"{column:>44}" for column in columns))
+
+
+if __name__ == "__main__":
+    main()
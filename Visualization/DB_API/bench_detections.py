@@ -0,0 +1,92 @@
+# Load test for publishing detection sweeps: per-detection requests vs the bulk replace endpoint
+#
+# Start the API first (e.g. DATABASE_URL=sqlite:///bench.db python main.py), then run
+# python bench_detections.py --radars 4 --detections 100 --sweeps 20
+import time
+import random
+import argparse
+import threading
+import numpy as np
+import requests
+
+
+def legacy_sweep(session, base_url, radar_id, detections):
+    """One DELETE plus one POST per detection, as process_radar_detections used to do"""
+    latencies = []
+    start = time.perf_counter()
+    session.delete(f"{base_url}/detections/by_radar/{radar_id}").raise_for_status()
+    latencies.append(time.perf_counter() - start)
+    for detection in detections:
+        start = time.perf_counter()
+        session.post(f"{base_url}/detections/", json={"radar_id": radar_id, **detection}).raise_for_status()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def bulk_sweep(session, base_url, radar_id, detections):
+    start = time.perf_counter()
+    session.put(f"{base_url}/detections/by_radar/{radar_id}", json=detections).raise_for_status()
+    return [time.perf_counter() - start]
+
+
+def run(mode, base_url, n_radars, n_detections, n_sweeps):
+    sweep_fn = legacy_sweep if mode == 'legacy' else bulk_sweep
+    request_latencies = []
+    sweep_latencies = []
+    lock = threading.Lock()
+
+    def radar_feed(radar_id):
+        session = requests.Session()
+        rng = random.Random(radar_id)
+        for _ in range(n_sweeps):
+            detections = [
+                {"latitude": 25.3 + rng.uniform(-0.1, 0.1), "longitude": 56.4 + rng.uniform(-0.1, 0.1),
+                 "confidence": 0.9, "vessel_type": "UNKNOWN"}
+                for _ in range(n_detections)
+            ]
+            start = time.perf_counter()
+            latencies = sweep_fn(session, base_url, radar_id, detections)
+            elapsed = time.perf_counter() - start
+            with lock:
+                request_latencies.extend(latencies)
+                sweep_latencies.append(elapsed)
+
+    threads = [threading.Thread(target=radar_feed, args=(i,)) for i in range(n_radars)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    return {
+        'requests/s': len(request_latencies) / elapsed,
+        'sweeps/s': len(sweep_latencies) / elapsed,
+        'request p99 ms': np.percentile(request_latencies, 99) * 1000,
+        'sweep p50 ms': np.percentile(sweep_latencies, 50) * 1000,
+        'sweep p99 ms': np.percentile(sweep_latencies, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Detection ingestion load test')
+    parser.add_argument('--base-url', default='http://localhost:7777')
+    parser.add_argument('--radars', type=int, default=4)
+    parser.add_argument('--detections', type=int, default=100, help='Detections per sweep')
+    parser.add_argument('--sweeps', type=int, default=20, help='Sweeps per radar')
+    args = parser.parse_args()
+
+    for radar_id in range(args.radars):
+        requests.post(f"{args.base_url}/radars/", json={
+            "radar_id": radar_id, "latitude": 25.3, "longitude": 56.4,
+            "range_km": 5, "azimuth_resolution": 720
+        }).raise_for_status()
+
+    print(f"{args.radars} radars, {args.detections} detections per sweep, {args.sweeps} sweeps each")
+    for mode in ('legacy', 'bulk'):
+        results = run(mode, args.base_url, args.radars, args.detections, args.sweeps)
+        print(f"{mode:>6}: " + ", ".join(f"{key} {value:.1f}" for key, value in results.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# DetectionFusion: ingest cost and fusion pass time as the number of radars grows
+#
+# Radars on a grid with overlapping coverage watch the same ships. Every radar reports
+# the ships within its range with position noise. Ingest is measured while the fusion
+# thread runs, against fusing inside every ingest call, which is what doing the
+# deduplication on the request path would cost. Fused tracks are compared with the
+# number of ships actually covered.
+import time
+import argparse
+import numpy as np
+from fusion import DetectionFusion
+
+CENTER_LAT = 25.326
+CENTER_LONG = 56.3818
+METRES_PER_DEGREE = np.pi / 180 * 6371000
+
+
+def make_sweeps(n_radars, n_ships, spacing, radar_range, noise, rng):
+    side = int(np.ceil(np.sqrt(n_radars)))
+    radars = np.array([(i // side, i % side) for i in range(n_radars)], dtype=np.float64) * spacing
+    ships = rng.uniform(radars.min(axis=0) - radar_range / 2, radars.max(axis=0) + radar_range / 2, (n_ships, 2))
+
+    def latlong(positions):
+        # North/east metres to lat/long, the geometry to_local inverts
+        latitude = CENTER_LAT + positions[:, 0] / METRES_PER_DEGREE
+        longitude = CENTER_LONG + positions[:, 1] / (METRES_PER_DEGREE * np.cos(np.radians(CENTER_LAT)))
+        return latitude, longitude
+
+    sweeps = []
+    covered = np.zeros(n_ships, dtype=bool)
+    for radar in radars:
+        seen = np.hypot(*(ships - radar).T) <= radar_range
+        covered |= seen
+        latitude, longitude = latlong(ships[seen] + rng.normal(0, noise, (seen.sum(), 2)))
+        sweeps.append([{'latitude': lat, 'longitude': long, 'confidence': 0.9, 'vessel_type': 'UNKNOWN'}
+                       for lat, long in zip(latitude.tolist(), longitude.tolist())])
+    return sweeps, int(covered.sum())
+
+
+def ingest(fusion, sweeps, rounds, fuse_inline):
+    seconds = []
+    for _ in range(rounds):
+        for radar_id, detections in enumerate(sweeps):
+            start = time.perf_counter()
+            fusion.replace(radar_id, detections)
+            if fuse_inline:
+                fusion.fuse()
+            seconds.append(time.perf_counter() - start)
+    return np.mean(seconds) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Detection fusion benchmark')
+    parser.add_argument('--radars', type=int, nargs='+', default=[1, 4, 16, 48])
+    parser.add_argument('--ships-per-radar', type=int, default=50)
+    parser.add_argument('--spacing', type=float, default=6000, help='Metres between neighbouring radars')
+    parser.add_argument('--range', type=float, default=5000, help='Radar range in metres')
+    parser.add_argument('--noise', type=float, default=15.0, help='Position noise in metres')
+    parser.add_argument('--radius', type=float, default=50.0, help='Merge radius in metres')
+    parser.add_argument('--rounds', type=int, default=5, help='Sweeps per radar')
+    args = parser.parse_args()
+
+    print(f"{args.ships_per_radar} ships per radar, radars {args.spacing:.0f} m apart with {args.range:.0f} m range, "
+          f"{args.noise} m noise, merge radius {args.radius} m")
+    print(f"{'radars':>7} {'detections':>11} {'ships':>6} {'fused':>6} {'ingest ms':>10} "
+          f"{'inline ingest ms':>17} {'fuse pass ms':>13}")
+    # Loads scipy
+    DetectionFusion().fuse()
+    for n_radars in args.radars:
+        rng = np.random.default_rng(0)
+        sweeps, covered = make_sweeps(n_radars, args.ships_per_radar * n_radars, args.spacing,
+                                      args.range, args.noise, rng)
+
+        fusion = DetectionFusion(merge_radius=args.radius, interval=0.05).start()
+        ingest_ms = ingest(fusion, sweeps, args.rounds, fuse_inline=False)
+        fusion.stop()
+
+        fusion = DetectionFusion(merge_radius=args.radius)
+        inline_ms = ingest(fusion, sweeps, 1, fuse_inline=True)
+        start = time.perf_counter()
+        fused = fusion.fuse()
+        fuse_ms = (time.perf_counter() - start) * 1000
+
+        print(f"{n_radars:>7} {sum(map(len, sweeps)):>11} {covered:>6} {len(fused):>6} {ingest_ms:>10.3f} "
+              f"{inline_ms:>17.1f} {fuse_ms:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
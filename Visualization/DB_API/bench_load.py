@@ -0,0 +1,179 @@
+# Load test of the API with a mix of ingest and query requests: throughput and latency per
+# endpoint as the number of concurrent clients grows
+#
+# Starts the API with uvicorn on a fresh database (SQLite by default, pass --database-url for
+# PostgreSQL; the DB_POOL_* variables are passed through) and keeps --concurrency requests in
+# flight, each drawn from the --mix weights:
+#   create   POST /detections/ with one detection
+#   replace  PUT /detections/by_radar/{radar_id} with a sweep of --detections detections
+#   patch    PATCH /detections/by_radar/{radar_id}/tracks moving the radar's tracks
+#   recent   GET /detections/recent/
+#   area     GET /detections/by_area/ over 2x2 km
+#   tile     GET /tiles/detections/{z}/{x}/{y} at the map's initial zoom
+# --app-dir runs another checkout of DB_API, e.g. to compare with an older version.
+# python bench_load.py --concurrency 8 32 128
+import os
+import sys
+import time
+import math
+import random
+import asyncio
+import argparse
+import subprocess
+import numpy as np
+import httpx
+
+parser = argparse.ArgumentParser(description='API load test')
+parser.add_argument('--database-url', default='sqlite:////tmp/bench_load.db')
+parser.add_argument('--app-dir', default=os.path.dirname(os.path.abspath(__file__)))
+parser.add_argument('--port', type=int, default=7791)
+parser.add_argument('--concurrency', type=int, nargs='+', default=[8, 32, 128])
+parser.add_argument('--mix', nargs='+', default=['create=2', 'replace=1', 'patch=4', 'recent=2', 'area=1'],
+                    help='Request weights as name=weight')
+parser.add_argument('--radars', type=int, default=8)
+parser.add_argument('--detections', type=int, default=50, help='Detections per sweep and tracks per radar')
+parser.add_argument('--duration', type=float, default=20.0, help='Seconds measured per concurrency')
+parser.add_argument('--warmup', type=float, default=2.0)
+args = parser.parse_args()
+
+BASE_URL = f'http://127.0.0.1:{args.port}'
+CENTER_LAT = 25.326
+CENTER_LONG = 56.3818
+TILE_ZOOM = 11
+
+
+def reset_database():
+    if args.database_url.startswith('sqlite:///'):
+        if os.path.exists(args.database_url[len('sqlite:///'):]):
+            os.remove(args.database_url[len('sqlite:///'):])
+        return
+    from sqlalchemy import create_engine, MetaData
+    engine = create_engine(args.database_url)
+    metadata = MetaData()
+    metadata.reflect(bind=engine)
+    metadata.drop_all(bind=engine)
+    engine.dispose()
+
+
+def start_server():
+    reset_database()
+    server = subprocess.Popen(
+        [sys.executable, '-c', 'import main, uvicorn; main.init_db(); '
+         f'uvicorn.run(main.app, host="127.0.0.1", port={args.port}, log_level="warning")'],
+        cwd=args.app_dir,
+        env=dict(os.environ, DATABASE_URL=args.database_url),
+        stderr=subprocess.DEVNULL
+    )
+    for _ in range(100):
+        try:
+            httpx.get(f'{BASE_URL}/radars/')
+            return server
+        except httpx.TransportError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError('API did not start')
+
+
+def position(rng):
+    return CENTER_LAT + rng.uniform(-0.02, 0.02), CENTER_LONG + rng.uniform(-0.02, 0.02)
+
+
+def detection(rng):
+    latitude, longitude = position(rng)
+    return {'latitude': latitude, 'longitude': longitude, 'confidence': 0.9, 'vessel_type': 'UNKNOWN'}
+
+
+def tracks(rng):
+    return [{**detection(rng), 'track_id': track_id, 'speed': 5.0, 'heading': 90.0}
+            for track_id in range(args.detections)]
+
+
+def tile():
+    n = 2 ** TILE_ZOOM
+    x = int((CENTER_LONG + 180) / 360 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(CENTER_LAT))) / math.pi) / 2 * n)
+    return f'/tiles/detections/{TILE_ZOOM}/{x}/{y}'
+
+
+REQUESTS = {
+    'create': lambda rng: ('POST', '/detections/',
+                           {'json': {'radar_id': rng.integers(args.radars).item(), **detection(rng)}}),
+    'replace': lambda rng: ('PUT', f'/detections/by_radar/{rng.integers(args.radars)}',
+                            {'json': [detection(rng) for _ in range(args.detections)]}),
+    'patch': lambda rng: ('PATCH', f'/detections/by_radar/{rng.integers(args.radars)}/tracks',
+                          {'json': {'updates': tracks(rng)}}),
+    'recent': lambda rng: ('GET', '/detections/recent/', {'params': {'minutes': 30}}),
+    'area': lambda rng: ('GET', '/detections/by_area/',
+                         {'params': {'min_lat': CENTER_LAT - 0.01, 'max_lat': CENTER_LAT + 0.01,
+                                     'min_lon': CENTER_LONG - 0.01, 'max_lon': CENTER_LONG + 0.01}}),
+    'tile': lambda rng: ('GET', tile(), {}),
+}
+
+
+async def worker(client, names, weights, results, stop, seed):
+    rng = np.random.default_rng(seed)
+    chooser = random.Random(seed)
+    while not stop.is_set():
+        name = chooser.choices(names, weights)[0]
+        method, url, kwargs = REQUESTS[name](rng)
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        if results['measuring']:
+            results[name].append((time.perf_counter() - start, ok))
+
+
+async def run(concurrency, names, weights):
+    rng = np.random.default_rng(0)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=120, limits=limits) as client:
+        for radar_id in range(args.radars):
+            await client.post('/radars/', json={'radar_id': radar_id, 'latitude': CENTER_LAT, 'longitude': CENTER_LONG,
+                                                'range_km': 5, 'azimuth_resolution': 0.5})
+            # The tracks the patch requests move
+            await client.patch(f'/detections/by_radar/{radar_id}/tracks', json={'births': tracks(rng), 'full': True})
+
+        results = {name: [] for name in names}
+        results['measuring'] = False
+        stop = asyncio.Event()
+        tasks = [asyncio.create_task(worker(client, names, weights, results, stop, seed))
+                 for seed in range(concurrency)]
+        await asyncio.sleep(args.warmup)
+        results['measuring'] = True
+        start = time.perf_counter()
+        await asyncio.sleep(args.duration)
+        results['measuring'] = False
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await asyncio.gather(*tasks)
+    return results, elapsed
+
+
+def main():
+    mix = dict(item.split('=') for item in args.mix)
+    names, weights = list(mix), [float(weight) for weight in mix.values()]
+    print(f"{args.app_dir}, {args.database_url}, {args.radars} radars, {args.detections} detections per sweep, "
+          f"mix {' '.join(args.mix)}")
+    print(f"{'clients':>8} {'req/s':>8} {'errors':>7}  " + ' '.join(f"{name + ' p50/p99 ms':>22}" for name in names))
+    for concurrency in args.concurrency:
+        server = start_server()
+        try:
+            results, elapsed = asyncio.run(run(concurrency, names, weights))
+        finally:
+            server.terminate()
+            server.wait()
+        total = sum(len(results[name]) for name in names)
+        errors = sum(not ok for name in names for _, ok in results[name])
+        columns = []
+        for name in names:
+            seconds = np.array([latency for latency, _ in results[name]]) * 1000
+            p50, p99 = np.percentile(seconds, [50, 99]) if len(seconds) else (float('nan'),) * 2
+            columns.append(f"{p50:>11.1f}/{p99:<10.1f}")
+        print(f"{concurrency:>8} {total / elapsed:>8.1f} {errors:>7}  " + ' '.join(columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# Query latency of the detection list endpoints at 1e5-1e7 seeded rows, before and after
+# the composite/grid-cell indexes, keyset pagination and row limit
+#
+# Seeds 24 hours of detections from 20 radars around Khorfakkan into a fresh database
+# (SQLite by default, pass --database-url for PostgreSQL) and times each query with the
+# indexes dropped and unbounded .all() (legacy) vs the current endpoint code.
+# python bench_queries.py --rows 100000 1000000
+import os
+import time
+import asyncio
+import argparse
+import numpy as np
+
+parser = argparse.ArgumentParser(description='Detection query benchmark')
+parser.add_argument('--database-url', default='sqlite:////tmp/bench_queries.db')
+parser.add_argument('--rows', type=int, nargs='+', default=[100000, 1000000])
+parser.add_argument('--repeat', type=int, default=5)
+parser.add_argument('--legacy-max-rows', type=int, default=1000000,
+                    help='Skip legacy queries returning more rows than this')
+args = parser.parse_args()
+
+# main.py reads the database URL on import
+os.environ['DATABASE_URL'] = args.database_url
+from datetime import datetime, timedelta
+from sqlalchemy import insert, text, event
+import main
+from main import Base, Detection, Radar, SessionLocal, AsyncSessionLocal, engine, async_engine, grid_cell
+
+CENTER_LAT = 25.326
+CENTER_LONG = 56.3818
+HISTORY_HOURS = 24
+CHUNK = 50000
+# The async endpoints run on one loop, the pooled connections belong to it
+loop = asyncio.new_event_loop()
+
+QUERIES = {
+    # name: endpoint keyword arguments
+    'recent 10 min': {'minutes': 10},
+    'recent 10 min, one radar': {'minutes': 10, 'radar_id': 3},
+    'area 2x2 km, 60 min': {'minutes': 60, 'min_lat': 25.32, 'max_lat': 25.34, 'min_lon': 56.38, 'max_lon': 56.40},
+    'area 2x2 km, 24 h': {'minutes': 1440, 'min_lat': 25.32, 'max_lat': 25.34, 'min_lon': 56.38, 'max_lon': 56.40},
+    'full history (map poll)': {'minutes': 10000},
+}
+
+
+def seed(n_rows, rng):
+    engine.dispose()
+    loop.run_until_complete(async_engine.dispose())
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    now = datetime.utcnow()
+    with SessionLocal() as db:
+        db.execute(insert(Radar), [{'radar_id': i, 'latitude': CENTER_LAT, 'longitude': CENTER_LONG,
+                                    'range_km': 5, 'azimuth_resolution': 0.5} for i in range(20)])
+        for start in range(0, n_rows, CHUNK):
+            n = min(CHUNK, n_rows - start)
+            latitude = CENTER_LAT + rng.uniform(-0.2, 0.2, n)
+            longitude = CENTER_LONG + rng.uniform(-0.2, 0.2, n)
+            # Rows arrive in time order, like live sweeps
+            seconds = np.sort(rng.uniform(start, start + n, n)) / n_rows * HISTORY_HOURS * 3600
+            db.execute(insert(Detection), [
+                {'radar_id': radar_id, 'latitude': lat, 'longitude': long, 'confidence': 0.9,
+                 'vessel_type': 'UNKNOWN', 'grid_cell': grid_cell(lat, long),
+                 'detection_time': now - timedelta(seconds=HISTORY_HOURS * 3600 - offset)}
+                for radar_id, lat, long, offset in zip(rng.integers(0, 20, n).tolist(), latitude.tolist(),
+                                                       longitude.tolist(), seconds.tolist())
+            ])
+        db.commit()
+    with engine.connect() as connection:
+        connection.execute(text('ANALYZE'))
+        connection.commit()
+
+
+def legacy(db, minutes, radar_id=None, min_lat=None, max_lat=None, min_lon=None, max_lon=None):
+    """The queries as they were: no limit, no ordering"""
+    cutoff_time = datetime.utcnow() - timedelta(minutes=minutes)
+    query = db.query(Detection)
+    if radar_id:
+        query = query.filter(Detection.radar_id == radar_id)
+    if min_lat is not None:
+        query = query.filter(Detection.latitude >= min_lat, Detection.latitude <= max_lat,
+                             Detection.longitude >= min_lon, Detection.longitude <= max_lon)
+    return query.filter(Detection.detection_time >= cutoff_time).all()
+
+
+async def current_async(**kwargs):
+    async with AsyncSessionLocal() as db:
+        if 'min_lat' in kwargs:
+            query = main.area_query(**kwargs)
+        else:
+            query, _ = main.recent_query(kwargs['minutes'], kwargs.get('radar_id'))
+        rows, _ = await main.paginate(db, query, main.DEFAULT_LIMIT, None)
+        return rows
+
+
+def current(db, **kwargs):
+    """The endpoint code, on its own async session"""
+    return loop.run_until_complete(current_async(**kwargs))
+
+
+def timed(fn, **kwargs):
+    seconds = []
+    for _ in range(args.repeat):
+        with SessionLocal() as db:
+            start = time.perf_counter()
+            rows = fn(db, **kwargs)
+            seconds.append(time.perf_counter() - start)
+    return np.median(seconds) * 1000, len(rows)
+
+
+def set_indexes(create):
+    for index in Detection.__table__.indexes:
+        if index.name.startswith('ix_detections_') and index.name != 'ix_detections_detection_id':
+            if create:
+                index.create(bind=engine, checkfirst=True)
+            else:
+                index.drop(bind=engine, checkfirst=True)
+
+
+def explain(kwargs):
+    """Query plan of the current query, as the database reports it"""
+    statements = []
+    with SessionLocal() as db:
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+        event.listen(async_engine.sync_engine, 'before_cursor_execute', capture)
+        try:
+            current(db, **kwargs)
+        finally:
+            event.remove(async_engine.sync_engine, 'before_cursor_execute', capture)
+        statement, parameters = statements[-1]
+        prefix = 'EXPLAIN QUERY PLAN ' if engine.dialect.name == 'sqlite' else 'EXPLAIN '
+        raw = db.connection().connection.cursor()
+        raw.execute(prefix + statement, parameters)
+        return [' '.join(str(column) for column in row[-1:]) for row in raw.fetchall()]
+
+
+def main_bench():
+    rng = np.random.default_rng(0)
+    print(f"{engine.dialect.name}, {HISTORY_HOURS} h of history, median of {args.repeat} runs, "
+          f"limit {main.DEFAULT_LIMIT}")
+    for n_rows in args.rows:
+        start = time.perf_counter()
+        seed(n_rows, rng)
+        print(f"\n{n_rows:,} rows (seeded in {time.perf_counter() - start:.0f} s)")
+        print(f"{'query':>26} {'legacy ms':>10} {'rows':>8} {'indexed ms':>11} {'rows':>6} {'speedup':>8}")
+
+        set_indexes(create=False)
+        legacy_results = {}
+        for name, kwargs in QUERIES.items():
+            expected = n_rows * kwargs['minutes'] / (HISTORY_HOURS * 60)
+            if expected > args.legacy_max_rows:
+                legacy_results[name] = (None, None)
+            else:
+                legacy_results[name] = timed(legacy, **kwargs)
+
+        set_indexes(create=True)
+        for name, kwargs in QUERIES.items():
+            ms, rows = timed(current, **kwargs)
+            legacy_ms, legacy_rows = legacy_results[name]
+            if legacy_ms is None:
+                print(f"{name:>26} {'skipped':>10} {'-':>8} {ms:>11.1f} {rows:>6} {'-':>8}")
+            else:
+                print(f"{name:>26} {legacy_ms:>10.1f} {legacy_rows:>8} {ms:>11.1f} {rows:>6} "
+                      f"{legacy_ms / ms:>7.1f}x")
+
+    print("\nQuery plans:")
+    for name, kwargs in QUERIES.items():
+        print(f"  {name}: " + '; '.join(explain(kwargs)))
+
+
+if __name__ == "__main__":
+    main_bench()
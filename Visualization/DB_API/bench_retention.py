@@ -0,0 +1,121 @@
+# Insert and query latency over a simulated 24 hour run, with and without retention
+#
+# Inserts one sweep of detections per radar every --sweep-seconds of simulated time into a
+# fresh database (SQLite by default, pass --database-url for PostgreSQL), runs the retention
+# pass once per simulated --interval-minutes and reports, per simulated hour, the insert
+# latency of a sweep, the latency of the recent-detections queries and the stored rows.
+# python bench_retention.py --retention-hours 6 --partition-hours 1 --archive-dir /tmp/archive
+import os
+import time
+import shutil
+import argparse
+import numpy as np
+
+parser = argparse.ArgumentParser(description='Detection retention benchmark')
+parser.add_argument('--database-url', default='sqlite:////tmp/bench_retention.db')
+parser.add_argument('--hours', type=int, default=24)
+parser.add_argument('--radars', type=int, default=20)
+parser.add_argument('--detections', type=int, default=20, help='Detections per radar and sweep')
+parser.add_argument('--sweep-seconds', type=float, default=30.0, help='Simulated time between sweeps')
+parser.add_argument('--retention-hours', type=float, default=6.0)
+parser.add_argument('--partition-hours', type=float, default=1.0)
+parser.add_argument('--interval-minutes', type=float, default=5.0, help='Simulated time between retention passes')
+parser.add_argument('--archive-dir', default=None)
+args = parser.parse_args()
+
+# main.py reads the database URL on import
+os.environ['DATABASE_URL'] = args.database_url
+from datetime import datetime, timedelta
+from sqlalchemy import insert, select, func
+from main import Base, Detection, Radar, SessionLocal, engine, grid_cell
+from retention import DetectionRetention
+
+CENTER_LAT = 25.326
+CENTER_LONG = 56.3818
+QUERIES = {
+    'recent 10 min': lambda cutoff: select(Detection).where(Detection.detection_time >= cutoff),
+    'recent 10 min, one radar': lambda cutoff: select(Detection).where(
+        Detection.radar_id == 3, Detection.detection_time >= cutoff),
+}
+
+
+def reset():
+    engine.dispose()
+    if args.database_url.startswith('sqlite:///'):
+        path = args.database_url[len('sqlite:///'):]
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    else:
+        Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        db.execute(insert(Radar), [{'radar_id': i, 'latitude': CENTER_LAT, 'longitude': CENTER_LONG,
+                                    'range_km': 5, 'azimuth_resolution': 0.5} for i in range(args.radars)])
+        db.commit()
+
+
+def run(retention_hours):
+    reset()
+    if args.archive_dir:
+        shutil.rmtree(args.archive_dir, ignore_errors=True)
+    retention = DetectionRetention(engine, Detection.__table__, retention_hours=retention_hours,
+                                   partition_hours=args.partition_hours,
+                                   archive_dir=args.archive_dir if retention_hours else None)
+    rng = np.random.default_rng(0)
+    # A window boundary, so partitions and the simulated clock line up
+    now = retention.window_start(datetime(2026, 1, 1))
+    retention.prepare(now)
+    sweep = timedelta(seconds=args.sweep_seconds)
+    sweeps_per_hour = int(3600 / args.sweep_seconds)
+    sweeps_per_pass = max(1, int(args.interval_minutes * 60 / args.sweep_seconds))
+
+    n = args.radars * args.detections
+    radar_ids = np.repeat(np.arange(args.radars), args.detections).tolist()
+    print(f"\nretention {'off' if not retention_hours else f'{retention_hours:g} h'}")
+    print(f"{'hour':>4} {'rows':>10} {'insert p50':>11} {'p99 ms':>7} "
+          + ' '.join(f'{name:>25}' for name in QUERIES) + f" {'retention ms':>13}")
+    for hour in range(args.hours):
+        insert_ms, retention_ms = [], []
+        for index in range(sweeps_per_hour):
+            now += sweep
+            latitude = (CENTER_LAT + rng.uniform(-0.2, 0.2, n)).tolist()
+            longitude = (CENTER_LONG + rng.uniform(-0.2, 0.2, n)).tolist()
+            rows = [{'radar_id': radar_id, 'latitude': lat, 'longitude': long, 'confidence': 0.9,
+                     'detection_time': now, 'grid_cell': grid_cell(lat, long)}
+                    for radar_id, lat, long in zip(radar_ids, latitude, longitude)]
+            start = time.perf_counter()
+            with SessionLocal() as db:
+                db.execute(insert(Detection), rows)
+                db.commit()
+            insert_ms.append((time.perf_counter() - start) * 1000)
+
+            if retention_hours and index % sweeps_per_pass == 0:
+                start = time.perf_counter()
+                retention.maintain(now)
+                retention_ms.append((time.perf_counter() - start) * 1000)
+
+        query_ms = []
+        cutoff = now - timedelta(minutes=10)
+        with SessionLocal() as db:
+            for query in QUERIES.values():
+                seconds = []
+                for _ in range(5):
+                    start = time.perf_counter()
+                    db.execute(query(cutoff).order_by(Detection.detection_time, Detection.detection_id)
+                               .limit(1000)).scalars().all()
+                    seconds.append(time.perf_counter() - start)
+                query_ms.append(np.median(seconds) * 1000)
+            stored = db.execute(select(func.count()).select_from(Detection)).scalar()
+        print(f"{hour + 1:>4} {stored:>10,} {np.median(insert_ms):>11.1f} {np.percentile(insert_ms, 99):>7.1f} "
+              + ' '.join(f'{ms:>25.2f}' for ms in query_ms)
+              + f" {max(retention_ms) if retention_ms else 0:>13.1f}")
+    if retention_hours:
+        print(retention.stats())
+
+
+if __name__ == "__main__":
+    print(f"{engine.dialect.name}, {args.radars} radars x {args.detections} detections every "
+          f"{args.sweep_seconds:g} s, {args.partition_hours:g} h windows")
+    run(0)
+    run(args.retention_hours)
@@ -0,0 +1,101 @@
+# Fetch and encode time of 10k-100k row detection responses: ORM objects through the
+# response model (what the list endpoints did) against plain rows and encoding.py
+#
+# Seeds --rows detections into a fresh database (SQLite by default, pass --database-url for
+# PostgreSQL), then reads the newest n rows with the async engine like the endpoints and
+# encodes them per format; each time is the median of --repeat runs. "stdlib" is the JSON
+# format without orjson.
+# python bench_serialization.py --sizes 10000 100000
+import os
+import time
+import asyncio
+import argparse
+import numpy as np
+
+parser = argparse.ArgumentParser(description='Response serialization benchmark')
+parser.add_argument('--database-url', default='sqlite:////tmp/bench_serialization.db')
+parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+parser.add_argument('--repeat', type=int, default=5)
+args = parser.parse_args()
+
+# main.py reads the database URL on import
+os.environ['DATABASE_URL'] = args.database_url
+from datetime import datetime, timedelta
+from sqlalchemy import insert, select
+import encoding
+from encoding import encode, JSON, COLUMNS, MSGPACK
+from main import (Base, Detection, Radar, DetectionResponse, DETECTION_COLUMNS, DETECTION_NAMES, SessionLocal,
+                  AsyncSessionLocal, engine, grid_cell, json_body)
+
+CENTER_LAT = 25.326
+CENTER_LONG = 56.3818
+loop = asyncio.new_event_loop()
+
+
+def seed(n_rows, rng):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    now = datetime.utcnow()
+    latitude = (CENTER_LAT + rng.uniform(-0.2, 0.2, n_rows)).tolist()
+    longitude = (CENTER_LONG + rng.uniform(-0.2, 0.2, n_rows)).tolist()
+    with SessionLocal() as db:
+        db.execute(insert(Radar), [{'radar_id': i, 'latitude': CENTER_LAT, 'longitude': CENTER_LONG,
+                                    'range_km': 5, 'azimuth_resolution': 0.5} for i in range(20)])
+        db.execute(insert(Detection), [
+            {'radar_id': i % 20, 'latitude': lat, 'longitude': long, 'confidence': 0.9,
+             'vessel_type': 'cargo' if i % 3 else None, 'track_id': i % 500, 'speed': 5.5, 'heading': 90.0,
+             'detection_time': now - timedelta(milliseconds=n_rows - i), 'grid_cell': grid_cell(lat, long)}
+            for i, (lat, long) in enumerate(zip(latitude, longitude))
+        ])
+        db.commit()
+
+
+async def fetch(orm, n):
+    async with AsyncSessionLocal() as db:
+        query = select(Detection) if orm else select(*DETECTION_COLUMNS)
+        result = await db.execute(query.order_by(Detection.detection_time, Detection.detection_id).limit(n))
+        return result.scalars().all() if orm else result.all()
+
+
+def timed(fn):
+    seconds, result = [], None
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        result = fn()
+        seconds.append(time.perf_counter() - start)
+    return np.median(seconds) * 1000, result
+
+
+def stdlib_json(rows):
+    orjson, encoding.orjson = encoding.orjson, None
+    try:
+        return encode(JSON, DETECTION_NAMES, rows)
+    finally:
+        encoding.orjson = orjson
+
+
+def main_bench():
+    rng = np.random.default_rng(0)
+    seed(max(args.sizes), rng)
+    print(f"{engine.dialect.name}, median of {args.repeat} runs, orjson {encoding.orjson is not None}, "
+          f"msgpack {encoding.msgpack is not None}")
+    print(f"{'rows':>8} {'path':>22} {'fetch ms':>9} {'encode ms':>10} {'total ms':>9} {'rows/s':>11} {'MB':>7}")
+    for n in args.sizes:
+        orm_fetch, orm_rows = timed(lambda: loop.run_until_complete(fetch(True, n)))
+        row_fetch, rows = timed(lambda: loop.run_until_complete(fetch(False, n)))
+        paths = {
+            'response model (before)': (orm_fetch, lambda: json_body(DetectionResponse, orm_rows)),
+            'rows, stdlib json': (row_fetch, lambda: stdlib_json(rows)),
+            'rows, json': (row_fetch, lambda: encode(JSON, DETECTION_NAMES, rows)),
+            'rows, columns+json': (row_fetch, lambda: encode(COLUMNS, DETECTION_NAMES, rows)),
+            'rows, msgpack': (row_fetch, lambda: encode(MSGPACK, DETECTION_NAMES, rows)),
+        }
+        for name, (fetch_ms, fn) in paths.items():
+            encode_ms, body = timed(fn)
+            total = fetch_ms + encode_ms
+            print(f"{n:>8} {name:>22} {fetch_ms:>9.1f} {encode_ms:>10.1f} {total:>9.1f} "
+                  f"{n / total * 1000:>11,.0f} {len(body) / 1e6:>7.2f}")
+
+
+if __name__ == "__main__":
+    main_bench()
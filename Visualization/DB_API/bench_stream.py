@@ -0,0 +1,202 @@
+# Server CPU, bytes received and detection-to-client latency of the map's detection feed:
+# polling GET /detections/recent/ (what App.jsx did) against the /stream/detections SSE push
+#
+# Starts the API with uvicorn on a fresh database (SQLite by default), registers --radars
+# radars and replaces one radar's --detections detections --rate times per second, like
+# sweeps arriving from the onboard instances. One detection of every sweep carries a marker
+# so clients can time when they first see it; a sweep counts as displayed once it or a
+# newer sweep of the same radar reached the client, polling clients skip sweeps replaced
+# between two polls. Server CPU is read from /proc (Linux), bytes
+# are response bodies as received by the clients, headers excluded.
+# python bench_stream.py --clients 10 100
+import os
+import sys
+import time
+import json
+import asyncio
+import argparse
+import subprocess
+import numpy as np
+import httpx
+
+parser = argparse.ArgumentParser(description='Detection streaming benchmark')
+parser.add_argument('--database-url', default='sqlite:////tmp/bench_stream.db')
+parser.add_argument('--port', type=int, default=7790)
+parser.add_argument('--clients', type=int, nargs='+', default=[10, 100])
+parser.add_argument('--radars', type=int, default=20)
+parser.add_argument('--detections', type=int, default=50, help='Detections per radar sweep')
+parser.add_argument('--rate', type=float, default=5.0, help='Sweeps ingested per second')
+parser.add_argument('--poll-interval', type=float, default=10.0, help='REFRESH_INTERVAL of App.jsx, seconds')
+parser.add_argument('--duration', type=float, default=30.0, help='Seconds measured per run')
+parser.add_argument('--warmup', type=float, default=3.0)
+args = parser.parse_args()
+
+BASE_URL = f'http://127.0.0.1:{args.port}'
+CENTER_LAT = 25.326
+CENTER_LONG = 56.3818
+TICKS = os.sysconf('SC_CLK_TCK')
+
+
+def start_server():
+    if args.database_url.startswith('sqlite:///') and os.path.exists(args.database_url[len('sqlite:///'):]):
+        os.remove(args.database_url[len('sqlite:///'):])
+    server = subprocess.Popen(
+        [sys.executable, '-c', 'import main, uvicorn; main.init_db(); '
+         f'uvicorn.run(main.app, host="127.0.0.1", port={args.port}, log_level="warning")'],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=dict(os.environ, DATABASE_URL=args.database_url),
+        stderr=subprocess.DEVNULL
+    )
+    for _ in range(100):
+        try:
+            httpx.get(f'{BASE_URL}/radars/')
+            return server
+        except httpx.TransportError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError('API did not start')
+
+
+def cpu_seconds(pid):
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rpartition(')')[2].split()
+    # utime and stime, fields 14 and 15 of proc(5)
+    return (int(fields[11]) + int(fields[12])) / TICKS
+
+
+class Clients:
+    """Marker send times and what the clients received"""
+
+    def __init__(self):
+        # Send time of sweep n, which went to radar n % radars
+        self.sent = []
+        self.latencies = []
+        self.bytes = 0
+        self.measuring = False
+
+    def seen(self, rows, latest):
+        """Record the sweeps newly displayed by a client, latest maps radar_id -> last sweep shown"""
+        now = time.perf_counter()
+        for row in rows:
+            marker = row.get('vessel_type') or ''
+            if not marker.startswith('bench-'):
+                continue
+            n = int(marker[len('bench-'):])
+            radar_id = n % args.radars
+            first = latest.get(radar_id, n - args.radars) + args.radars
+            if n >= first:
+                latest[radar_id] = n
+                if self.measuring:
+                    self.latencies.extend(now - self.sent[k] for k in range(first, n + 1, args.radars))
+
+    def received(self, n):
+        if self.measuring:
+            self.bytes += n
+
+
+def sweep(radar_id, marker, rng):
+    latitude = CENTER_LAT + rng.uniform(-0.05, 0.05, args.detections)
+    longitude = CENTER_LONG + rng.uniform(-0.05, 0.05, args.detections)
+    return [{'latitude': lat, 'longitude': long, 'confidence': 0.9,
+             'vessel_type': marker if i == 0 else 'UNKNOWN'}
+            for i, (lat, long) in enumerate(zip(latitude.tolist(), longitude.tolist()))]
+
+
+async def writer(clients, stop):
+    rng = np.random.default_rng(0)
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=30) as client:
+        n = 0
+        next_time = time.perf_counter()
+        while not stop.is_set():
+            marker = f'bench-{n}'
+            detections = sweep(n % args.radars, marker, rng)
+            clients.sent.append(time.perf_counter())
+            await client.put(f'/detections/by_radar/{n % args.radars}', json=detections)
+            n += 1
+            next_time += 1 / args.rate
+            await asyncio.sleep(max(0.0, next_time - time.perf_counter()))
+
+
+async def poller(clients, stop, offset):
+    latest = {}
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=60) as client:
+        # Browsers opened at different times poll out of phase
+        await asyncio.sleep(offset)
+        while not stop.is_set():
+            start = time.perf_counter()
+            response = await client.get('/detections/recent/', params={'minutes': 10000, 'limit': 10000})
+            clients.received(len(response.content))
+            clients.seen(response.json(), latest)
+            await asyncio.sleep(max(0.0, args.poll_interval - (time.perf_counter() - start)))
+
+
+async def subscriber(clients, stop):
+    latest = {}
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=None) as client:
+        async with client.stream('GET', '/stream/detections') as response:
+            async for line in response.aiter_lines():
+                clients.received(len(line) + 1)
+                if line.startswith('data: '):
+                    data = json.loads(line[6:])
+                    clients.seen(data.get('rows', []) + data.get('added', []) + data.get('updated', []),
+                                 latest)
+                if stop.is_set():
+                    return
+
+
+async def run(mode, n_clients):
+    rng = np.random.default_rng(1)
+    async with httpx.AsyncClient(base_url=BASE_URL) as client:
+        for radar_id in range(args.radars):
+            await client.post('/radars/', json={'radar_id': radar_id, 'latitude': CENTER_LAT, 'longitude': CENTER_LONG,
+                                                'range_km': 5, 'azimuth_resolution': 0.5})
+            await client.put(f'/detections/by_radar/{radar_id}', json=sweep(radar_id, 'seed', rng))
+
+    clients = Clients()
+    stop = asyncio.Event()
+    if mode == 'polling':
+        tasks = [asyncio.create_task(poller(clients, stop, i * args.poll_interval / n_clients))
+                 for i in range(n_clients)]
+    else:
+        tasks = [asyncio.create_task(subscriber(clients, stop)) for _ in range(n_clients)]
+    tasks.append(asyncio.create_task(writer(clients, stop)))
+
+    await asyncio.sleep(args.warmup)
+    clients.measuring = True
+    cpu_start, start = cpu_seconds(server.pid), time.perf_counter()
+    await asyncio.sleep(args.duration)
+    cpu = cpu_seconds(server.pid) - cpu_start
+    elapsed = time.perf_counter() - start
+    clients.measuring = False
+    stop.set()
+    # Subscribers blocked on an idle stream are cancelled
+    await asyncio.sleep(0.5)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    latencies = np.array(clients.latencies) * 1000
+    return cpu / elapsed, clients.bytes / elapsed, latencies
+
+
+def main():
+    global server
+    print(f"{args.radars} radars x {args.detections} detections, {args.rate} sweeps/s ingested, "
+          f"polling every {args.poll_interval} s, {args.duration} s measured per run")
+    print(f"{'clients':>8} {'mode':>8} {'server CPU':>11} {'KB/s':>9} {'latency p50 ms':>15} "
+          f"{'p99 ms':>8} {'deliveries':>11}")
+    for n_clients in args.clients:
+        for mode in ('polling', 'sse'):
+            server = start_server()
+            try:
+                cpu, throughput, latencies = asyncio.run(run(mode, n_clients))
+            finally:
+                server.terminate()
+                server.wait()
+            p50, p99 = (np.percentile(latencies, [50, 99]) if len(latencies) else (float('nan'),) * 2)
+            print(f"{n_clients:>8} {mode:>8} {cpu:>10.1%} {throughput / 1024:>9.1f} {p50:>15.1f} "
+                  f"{p99:>8.1f} {len(latencies):>11}")
+
+
+if __name__ == "__main__":
+    main()
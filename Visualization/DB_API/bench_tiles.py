@@ -0,0 +1,140 @@
+# Payload size and response time of the aggregated tile endpoints against downloading the
+# raw detections of the same time window through /detections/recent/
+#
+# Seeds hours of detections from 20 radars around Khorfakkan, a tenth of them tracked (one
+# row per track, as PATCH /detections/by_radar/{radar_id}/tracks leaves them),
+# into a fresh database (SQLite by default, pass --database-url for PostgreSQL) and loads
+# the map's view through the API in-process: the raw path pages through every detection of
+# the window, the tile paths fetch the tiles covering the seeded area at --zoom.
+# python bench_tiles.py --rows 100000 1000000
+import os
+import time
+import math
+import argparse
+import numpy as np
+
+parser = argparse.ArgumentParser(description='Detection tile benchmark')
+parser.add_argument('--database-url', default='sqlite:////tmp/bench_tiles.db')
+parser.add_argument('--rows', type=int, nargs='+', default=[100000, 1000000])
+parser.add_argument('--hours', type=float, default=6.0, help='History seeded')
+parser.add_argument('--windows', type=int, nargs='+', default=[10, 60, 360], help='Minutes shown on the map')
+parser.add_argument('--zoom', type=int, default=11, help='Initial zoom of App.jsx')
+args = parser.parse_args()
+
+# main.py reads the database URL on import
+os.environ['DATABASE_URL'] = args.database_url
+# Times the database reads, not the response cache
+os.environ['CACHE_TTL_S'] = '0'
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from sqlalchemy import insert, text
+import main
+from main import Base, Detection, Radar, SessionLocal, engine, grid_cell, MAX_LIMIT
+
+CENTER_LAT = 25.326
+CENTER_LONG = 56.3818
+SPREAD = 0.2
+CHUNK = 50000
+
+
+def seed(n_rows, rng):
+    engine.dispose()
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    now = datetime.utcnow()
+    history = args.hours * 3600
+    with SessionLocal() as db:
+        db.execute(insert(Radar), [{'radar_id': i, 'latitude': CENTER_LAT, 'longitude': CENTER_LONG,
+                                    'range_km': 5, 'azimuth_resolution': 0.5} for i in range(20)])
+        for start in range(0, n_rows, CHUNK):
+            n = min(CHUNK, n_rows - start)
+            latitude = CENTER_LAT + rng.uniform(-SPREAD, SPREAD, n)
+            longitude = CENTER_LONG + rng.uniform(-SPREAD, SPREAD, n)
+            seconds = np.sort(rng.uniform(start, start + n, n)) / n_rows * history
+            tracked = rng.random(n) < 0.1
+            # Unique, the tracks endpoint updates a track's row instead of adding one
+            track_ids = start + np.arange(n)
+            db.execute(insert(Detection), [
+                {'radar_id': radar_id, 'latitude': lat, 'longitude': long, 'confidence': 0.9,
+                 'vessel_type': 'UNKNOWN', 'grid_cell': grid_cell(lat, long),
+                 'track_id': track_id if is_tracked else None, 'speed': 5.0, 'heading': 90.0,
+                 'detection_time': now - timedelta(seconds=history - offset)}
+                for radar_id, lat, long, offset, is_tracked, track_id in zip(
+                    rng.integers(0, 20, n).tolist(), latitude.tolist(), longitude.tolist(), seconds.tolist(),
+                    tracked.tolist(), track_ids.tolist())
+            ])
+        db.commit()
+    with engine.connect() as connection:
+        connection.execute(text('ANALYZE'))
+        connection.commit()
+
+
+def view_tiles(zoom):
+    """Tiles covering the seeded area"""
+    n = 2 ** zoom
+
+    def tile_x(longitude):
+        return int((longitude + 180) / 360 * n)
+
+    def tile_y(latitude):
+        return int((1 - math.asinh(math.tan(math.radians(latitude))) / math.pi) / 2 * n)
+
+    return [(x, y)
+            for x in range(tile_x(CENTER_LONG - SPREAD), tile_x(CENTER_LONG + SPREAD) + 1)
+            for y in range(tile_y(CENTER_LAT + SPREAD), tile_y(CENTER_LAT - SPREAD) + 1)]
+
+
+def raw(client, minutes):
+    """All detections of the window, page by page"""
+    n_bytes, items, requests, cursor = 0, 0, 0, None
+    while True:
+        params = {'minutes': minutes, 'limit': MAX_LIMIT}
+        if cursor:
+            params['cursor'] = cursor
+        response = client.get('/detections/recent/', params=params)
+        n_bytes += len(response.content)
+        items += len(response.json())
+        requests += 1
+        cursor = response.headers.get('x-next-cursor')
+        if not cursor:
+            return n_bytes, items, requests
+
+
+def tiles(layer):
+    def fetch(client, minutes):
+        n_bytes, items, requests = 0, 0, 0
+        for x, y in view_tiles(args.zoom):
+            response = client.get(f'/tiles/{layer}/{args.zoom}/{x}/{y}', params={'minutes': minutes})
+            n_bytes += len(response.content)
+            body = response.json()
+            items += len(body['bins']) if layer == 'detections' else len(body)
+            requests += 1
+        return n_bytes, items, requests
+    return fetch
+
+
+def timed(fn, client, minutes):
+    # Second run, the first one warms the database cache
+    fn(client, minutes)
+    start = time.perf_counter()
+    result = fn(client, minutes)
+    return (time.perf_counter() - start) * 1000, *result
+
+
+def main_bench():
+    rng = np.random.default_rng(0)
+    paths = {'raw /detections/recent/': raw, 'detection tiles': tiles('detections'), 'track tiles': tiles('tracks')}
+    print(f"{engine.dialect.name}, {args.hours} h of history, {len(view_tiles(args.zoom))} tiles at zoom {args.zoom}")
+    with TestClient(main.app) as client:
+        for n_rows in args.rows:
+            seed(n_rows, rng)
+            print(f"\n{n_rows:,} rows")
+            print(f"{'window':>7} {'path':>24} {'requests':>9} {'items':>8} {'KB':>9} {'ms':>9}")
+            for minutes in args.windows:
+                for name, fetch in paths.items():
+                    ms, n_bytes, items, requests = timed(fetch, client, minutes)
+                    print(f"{minutes:>5} m {name:>24} {requests:>9} {items:>8} {n_bytes / 1024:>9.1f} {ms:>9.1f}")
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,196 @@
+# cache.py
+"""
+In-process cache of serialized responses of the read-heavy endpoints.
+
+Every open map tab polls the same few URLs, so the JSON body of a response is kept
+under its path and query string for `ttl` seconds and served without touching the
+database. Writes invalidate entries as soon as they are committed: an entry records
+the table it was read from (its scope), the radar it was filtered on, if any, and the
+earliest detection time it covers, and a write only drops the entries of its table
+and radar whose time range reaches back to the changed rows. New detections are
+always inside every window; old windows removed by retention are not.
+
+A response read before a write committed could otherwise be stored after the write
+invalidated its key, so a miss takes a token of its scope first and put() stores
+nothing when the scope was invalidated in between. Every write invalidates all open
+tabs' entry at once, so concurrent misses of one key on the event loop wait for the
+first one's read instead of all querying the database.
+
+Bodies carry a content hash ETag, so a client that sends it back in If-None-Match
+gets a 304 without a body as long as the content is the same, even after the entry
+expired and was read again.
+"""
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict, deque, defaultdict
+import numpy as np
+
+
+class CacheEntry:
+    __slots__ = ('body', 'etag', 'headers', 'expires', 'scope', 'radar_id', 'since')
+
+    def __init__(self, body, headers, expires, scope, radar_id, since):
+        self.body = body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        self.headers = headers
+        self.expires = expires
+        self.scope = scope
+        self.radar_id = radar_id
+        self.since = since
+
+
+class ResponseCache:
+    """Serialized responses by URL with TTLs, invalidated by table, radar and time"""
+
+    def __init__(self, max_entries=1024, latency_samples=1024):
+        """
+        Args:
+            max_entries: Least recently used entries beyond this are evicted
+            latency_samples: Response times kept per endpoint for the percentiles in stats()
+        """
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        # Invalidations per scope, see token()
+        self.generations = defaultdict(int)
+        # key -> future of the read in progress, only touched from the event loop
+        self.loading = {}
+
+        self.latency_samples = latency_samples
+        self.hits = defaultdict(int)
+        self.misses = defaultdict(int)
+        self.not_modified = defaultdict(int)
+        self.latencies = defaultdict(lambda: deque(maxlen=self.latency_samples))
+        self.invalidated = 0
+        self.evicted = 0
+
+    def token(self, scope):
+        """Taken before reading from the database, passed to put()"""
+        with self.lock:
+            return self.generations[scope]
+
+    def get(self, key):
+        """Live entry of a key, None when missing or expired"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, body, headers, ttl, token, scope, radar_id=None, since=None):
+        """
+        Store a serialized response
+
+        Args:
+            key: Path and query string of the request
+            body: Response body as bytes
+            headers: Extra response headers to replay with the body
+            ttl: Seconds the entry is served
+            token: token() taken before the rows were read
+            scope: Table the rows come from, the unit of invalidate()
+            radar_id: The radar the rows were filtered on, None for all radars
+            since: Earliest detection_time the rows can have, None for all times
+
+        Returns:
+            CacheEntry: The entry, also when it was not stored because of a newer write
+        """
+        entry = CacheEntry(body, headers, time.monotonic() + ttl, scope, radar_id, since)
+        with self.lock:
+            if token != self.generations[scope]:
+                return entry
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evicted += 1
+        return entry
+
+    async def get_or_load(self, key, load, ttl, scope, radar_id=None, since=None):
+        """
+        Entry of a key, read with `load` on a miss; see put() for the arguments
+
+        Args:
+            load: Coroutine function returning the body and the extra headers
+
+        Returns:
+            tuple: (CacheEntry, whether it came without a database read of this request)
+        """
+        entry = self.get(key)
+        if entry is not None:
+            return entry, True
+        pending = self.loading.get(key)
+        if pending is not None:
+            await asyncio.wait([pending])
+            if not pending.cancelled():
+                return pending.result(), True
+            # The first request failed or its client went away, read on our own
+            return await self.get_or_load(key, load, ttl, scope, radar_id, since)
+
+        future = asyncio.get_running_loop().create_future()
+        self.loading[key] = future
+        try:
+            token = self.token(scope)
+            body, headers = await load()
+            entry = self.put(key, body, headers, ttl, token, scope, radar_id, since)
+            future.set_result(entry)
+            return entry, False
+        finally:
+            del self.loading[key]
+            future.cancel()
+
+    def invalidate(self, scope, radar_id=None, until=None):
+        """
+        Drop the entries of `scope` that can contain rows a committed write changed
+
+        Args:
+            scope: Table that was written
+            radar_id: Radar whose rows changed, None when rows of any radar may have
+            until: Latest detection_time of the changed rows, None when unknown
+        """
+        with self.lock:
+            self.generations[scope] += 1
+            stale = [key for key, entry in self.entries.items()
+                     if entry.scope == scope
+                     and (radar_id is None or entry.radar_id is None or entry.radar_id == radar_id)
+                     and (until is None or entry.since is None or entry.since <= until)]
+            for key in stale:
+                del self.entries[key]
+            self.invalidated += len(stale)
+
+    def record(self, endpoint, hit, not_modified, seconds):
+        """Count one response of an endpoint and its handling time"""
+        with self.lock:
+            if hit:
+                self.hits[endpoint] += 1
+            else:
+                self.misses[endpoint] += 1
+            if not_modified:
+                self.not_modified[endpoint] += 1
+            self.latencies[endpoint].append(seconds)
+
+    def stats(self):
+        with self.lock:
+            endpoints = {}
+            for endpoint in set(self.hits) | set(self.misses):
+                hits, misses = self.hits[endpoint], self.misses[endpoint]
+                latencies = np.asarray(self.latencies[endpoint]) * 1000
+                endpoints[endpoint] = {
+                    'hits': hits,
+                    'misses': misses,
+                    'hit_rate': hits / (hits + misses),
+                    'not_modified': self.not_modified[endpoint],
+                    'p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+                    'p99_ms': float(np.percentile(latencies, 99)) if len(latencies) else 0.0,
+                }
+            return {
+                'entries': len(self.entries),
+                'invalidated': self.invalidated,
+                'evicted': self.evicted,
+                'endpoints': endpoints,
+            }
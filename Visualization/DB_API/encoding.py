@@ -0,0 +1,77 @@
+# encoding.py
+"""
+Encoding of query results for the list endpoints.
+
+The endpoints select plain column rows instead of ORM objects and encode them here,
+without building a Pydantic model per row. The format follows the Accept header:
+
+    application/json              List of objects, the same JSON as the response models
+    application/vnd.columns+json  {"count": n, "columns": {name: [values of all rows]}}
+    application/msgpack           The columnar layout in MessagePack
+
+Datetimes are ISO 8601 strings in every format, as in the response models. JSON is
+encoded with orjson when it is installed and with the standard library otherwise; the
+MessagePack format needs msgpack and is answered with JSON without it.
+"""
+import json
+from datetime import datetime
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = 'application/json'
+COLUMNS = 'application/vnd.columns+json'
+MSGPACK = 'application/msgpack'
+
+
+def negotiate(accept):
+    """Media type to answer a request's Accept header with, JSON unless a columnar format is listed"""
+    accept = accept or ''
+    if msgpack is not None and (MSGPACK in accept or 'application/x-msgpack' in accept):
+        return MSGPACK
+    if COLUMNS in accept:
+        return COLUMNS
+    return JSON
+
+
+def isoformat(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+
+def dumps(content):
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, default=isoformat, separators=(',', ':')).encode()
+
+
+def encode(media_type, names, rows):
+    """
+    Body of a list response
+
+    Args:
+        media_type: One of JSON, COLUMNS and MSGPACK, see negotiate()
+        names: Column names, the keys of the response model
+        rows: Result rows (tuples) in the order of `names`
+
+    Returns:
+        bytes: The encoded body
+    """
+    if media_type == JSON:
+        return dumps([dict(zip(names, row)) for row in rows])
+
+    columns = list(zip(*rows)) if rows else [()] * len(names)
+    if media_type == MSGPACK:
+        # Formatted per column, a default= callback per value is several times slower
+        columns = [[value.isoformat() for value in column] if column and isinstance(column[0], datetime)
+                   else column for column in columns]
+        return msgpack.packb({'count': len(rows), 'columns': dict(zip(names, columns))})
+    return dumps({'count': len(rows), 'columns': dict(zip(names, columns))})
@@ -0,0 +1,272 @@
+# fusion.py
+"""
+Fusion of the detections of all radars into one set of fused tracks.
+
+Onboard instances covering overlapping water each publish their own detections of the
+same ship. DetectionFusion keeps the latest detection set of every radar in memory,
+fed by the ingest endpoints, and a background thread periodically clusters them:
+detections of different radars closer than `merge_radius` metres become one fused
+track, with at most one detection of each radar in it, so two ships closer than the
+radius that are both seen by the same radars stay two tracks. Ingest only replaces
+the radar's entry under a lock, so its cost does not grow with the number of radars;
+the clustering runs once per interval over all of them.
+"""
+import math
+import time
+import threading
+import numpy as np
+
+# Same spherical Earth as OnboardSoftware/locations.getLatLong
+EARTH_RADIUS = 6371000
+
+
+def to_local(latitude, longitude, center_lat, center_long):
+    """Inverse of locations.getLatLong: [N, 2] (x, y) in metres that map back to latitude/longitude"""
+    lat_rad, long_rad = np.radians(latitude), np.radians(longitude)
+    center_lat_rad, center_long_rad = math.radians(center_lat), math.radians(center_long)
+    x = -(lat_rad - center_lat_rad) * EARTH_RADIUS
+    y = (long_rad - center_long_rad) * EARTH_RADIUS * math.cos(center_lat_rad)
+    return np.stack([x, y], axis=1)
+
+
+class DetectionFusion:
+    """Latest detections per radar, fused into one track table by a background thread"""
+
+    def __init__(self, write=None, merge_radius=50.0, interval=1.0, stale_after=60.0):
+        """
+        Args:
+            write: Called with the list of fused track dicts after every fusion pass
+            merge_radius: Detections of different radars closer than this (metres) are one ship
+            interval: Seconds between fusion passes
+            stale_after: Radars that sent nothing for this many seconds are left out
+        """
+        self.write = write
+        self.merge_radius = merge_radius
+        self.interval = interval
+        self.stale_after = stale_after
+
+        # radar_id -> (detections, received); detections maps a key (track id or index) to a dict
+        self.radars = {}
+        self.lock = threading.Lock()
+        self.dirty = threading.Event()
+        self.stop_event = threading.Event()
+        self.worker = None
+
+        # Fused ids are kept for clusters that stay within merge_radius of their last position
+        self.fused = np.zeros((0, 2))
+        self.fused_ids = np.zeros(0, dtype=np.int64)
+        self.next_id = 1
+
+        self.stats_lock = threading.Lock()
+        self.ingested = 0
+        self.passes = 0
+        self.last_fuse = 0.0
+        self.last_counts = (0, 0)
+
+    def start(self):
+        if self.worker is None:
+            self.stop_event.clear()
+            self.worker = threading.Thread(target=self._run, daemon=True)
+            self.worker.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        self.dirty.set()
+        if self.worker is not None:
+            self.worker.join()
+            self.worker = None
+
+    def replace(self, radar_id, detections):
+        """All detections of a radar, dicts with latitude, longitude, confidence and vessel_type"""
+        with self.lock:
+            self.radars[radar_id] = (dict(enumerate(detections)), time.monotonic())
+        self._ingested()
+
+    def apply_tracks(self, radar_id, births, updates, deaths, full=False):
+        """Track delta of a radar, see the PATCH /detections/by_radar/{radar_id}/tracks endpoint"""
+        with self.lock:
+            tracks = {} if full else self.radars.get(radar_id, ({}, 0))[0]
+            for track in births:
+                tracks[track['track_id']] = track
+            for track in updates:
+                tracks[track['track_id']] = track
+            for track_id in deaths:
+                tracks.pop(track_id, None)
+            self.radars[radar_id] = (tracks, time.monotonic())
+        self._ingested()
+
+    def remove(self, radar_id=None):
+        """Forget one radar, or all of them"""
+        with self.lock:
+            if radar_id is None:
+                self.radars.clear()
+            else:
+                self.radars.pop(radar_id, None)
+        self._ingested()
+
+    def _ingested(self):
+        with self.stats_lock:
+            self.ingested += 1
+        self.dirty.set()
+
+    def snapshot(self):
+        """Latest detections of all live radars as arrays"""
+        now = time.monotonic()
+        with self.lock:
+            radars = [(radar_id, list(detections.values()))
+                      for radar_id, (detections, received) in self.radars.items()
+                      if now - received <= self.stale_after]
+        latitude, longitude, confidence, radar_ids, vessel_types = [], [], [], [], []
+        for radar_id, detections in radars:
+            for detection in detections:
+                latitude.append(detection['latitude'])
+                longitude.append(detection['longitude'])
+                confidence.append(detection['confidence'])
+                vessel_types.append(detection.get('vessel_type'))
+            radar_ids.extend([radar_id] * len(detections))
+        return (np.asarray(latitude, dtype=np.float64), np.asarray(longitude, dtype=np.float64),
+                np.asarray(confidence, dtype=np.float64), np.asarray(radar_ids, dtype=np.int64), vessel_types)
+
+    def fuse(self):
+        """
+        Cluster the latest detections of all radars
+
+        Returns:
+            list: One dict per fused track with fused_id, latitude, longitude, confidence,
+                  n_radars, radar_ids (comma separated) and vessel_type
+        """
+        # Only needed once there are detections to fuse
+        from scipy.spatial import cKDTree
+
+        latitude, longitude, confidence, radar_ids, vessel_types = self.snapshot()
+        n = len(latitude)
+        if n == 0:
+            self.fused, self.fused_ids = np.zeros((0, 2)), np.zeros(0, dtype=np.int64)
+            return []
+
+        # Metric positions around a fixed reference, the fused area spans tens of kilometres
+        center_lat, center_long = float(latitude.mean()), float(longitude.mean())
+        positions = to_local(latitude, longitude, center_lat, center_long)
+
+        # Pairs of detections of different radars within merge_radius
+        pairs = cKDTree(positions).query_pairs(self.merge_radius, output_type='ndarray')
+        pairs = pairs[radar_ids[pairs[:, 0]] != radar_ids[pairs[:, 1]]]
+        n_clusters, labels = self.cluster(pairs, positions, radar_ids)
+
+        # Confidence weighted position; a ship is missed only if every radar misses it
+        weights = np.maximum(confidence, 1e-6)
+        weight_sum = np.bincount(labels, weights, n_clusters)
+        fused_lat = np.bincount(labels, weights * latitude, n_clusters) / weight_sum
+        fused_long = np.bincount(labels, weights * longitude, n_clusters) / weight_sum
+        fused_conf = 1 - np.exp(np.bincount(labels, np.log1p(-np.minimum(confidence, 1 - 1e-9)), n_clusters))
+
+        fused_positions = to_local(fused_lat, fused_long, center_lat, center_long)
+        fused_ids = self.match_ids(fused_positions, (center_lat, center_long))
+        self.fused = np.stack([fused_lat, fused_long], axis=1)
+        self.fused_ids = fused_ids
+
+        order = np.argsort(labels, kind='stable')
+        bounds = np.searchsorted(labels[order], np.arange(n_clusters + 1))
+        fused = []
+        for cluster in range(n_clusters):
+            members = order[bounds[cluster]:bounds[cluster + 1]]
+            cluster_radars = sorted(set(radar_ids[members].tolist()))
+            best = members[np.argmax(confidence[members])]
+            fused.append({
+                'fused_id': int(fused_ids[cluster]),
+                'latitude': float(fused_lat[cluster]),
+                'longitude': float(fused_long[cluster]),
+                'confidence': float(fused_conf[cluster]),
+                'n_radars': len(cluster_radars),
+                'radar_ids': ','.join(map(str, cluster_radars)),
+                'vessel_type': vessel_types[best],
+            })
+
+        with self.stats_lock:
+            self.last_counts = (n, n_clusters)
+        return fused
+
+    @staticmethod
+    def cluster(pairs, positions, radar_ids):
+        """
+        Merge the closest pairs first, skipping merges that would put two detections of
+        one radar into a cluster. Plain connected components would chain two nearby ships
+        seen by the same two radars into one track through their cross pairs.
+
+        Returns:
+            tuple: (number of clusters, [N] cluster label of every detection)
+        """
+        n = len(positions)
+        parent = list(range(n))
+        radars = [{radar_id} for radar_id in radar_ids.tolist()]
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        distances = np.hypot(*(positions[pairs[:, 0]] - positions[pairs[:, 1]]).T)
+        for i, j in pairs[np.argsort(distances, kind='stable')].tolist():
+            root_i, root_j = find(i), find(j)
+            if root_i != root_j and radars[root_i].isdisjoint(radars[root_j]):
+                parent[root_j] = root_i
+                radars[root_i] |= radars[root_j]
+
+        roots, labels = np.unique([find(i) for i in range(n)], return_inverse=True)
+        return len(roots), labels
+
+    def match_ids(self, positions, reference):
+        """Reuse the id of the nearest previous fused track within merge_radius"""
+        from scipy.spatial import cKDTree
+
+        ids = np.zeros(len(positions), dtype=np.int64)
+        previous = self.fused
+        if len(self.fused_ids):
+            # Previous positions were stored as lat/long so a moved reference point does not matter
+            previous = to_local(previous[:, 0], previous[:, 1], *reference)
+            distance, index = cKDTree(previous).query(positions, distance_upper_bound=self.merge_radius)
+            taken = set()
+            for i in np.argsort(distance, kind='stable').tolist():
+                if np.isfinite(distance[i]) and index[i] not in taken:
+                    taken.add(index[i])
+                    ids[i] = self.fused_ids[index[i]]
+
+        new = ids == 0
+        ids[new] = np.arange(self.next_id, self.next_id + new.sum())
+        self.next_id += int(new.sum())
+        return ids
+
+    def stats(self):
+        with self.stats_lock:
+            detections, clusters = self.last_counts
+            return {
+                'radars': len(self.radars),
+                'ingested': self.ingested,
+                'passes': self.passes,
+                'last_fuse_ms': self.last_fuse * 1000,
+                'detections': detections,
+                'fused_tracks': clusters,
+            }
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            self.dirty.wait()
+            if self.stop_event.is_set():
+                return
+            self.dirty.clear()
+
+            start = time.perf_counter()
+            try:
+                fused = self.fuse()
+                if self.write is not None:
+                    self.write(fused)
+            except Exception as e:
+                print(f"Error fusing detections: {e}")
+            with self.stats_lock:
+                self.passes += 1
+                self.last_fuse = time.perf_counter() - start
+
+            # Detections arriving meanwhile are picked up by the next pass
+            self.stop_event.wait(self.interval)
@@ -0,0 +1,292 @@
+# retention.py
+"""
+Retention of the detection history.
+
+Detections are kept in time windows of `partition_hours`. A background thread expires
+every window that ended more than `retention_hours` ago, after optionally exporting it
+to a zstd compressed Parquet file in `archive_dir`, so rows are kept for between
+retention_hours and retention_hours + partition_hours.
+
+On PostgreSQL each window is a native range partition of the detections table. The
+thread creates partitions ahead of time and expires a window with DROP TABLE, which
+costs the same at any table size and leaves no dead tuples behind; the delete churn of
+the per-sweep replace endpoints stays in the small partition of the current window.
+SQLite has no partitions, so there a window is deleted in batches along the time index,
+each batch its own transaction so ingest is not blocked, and the freed pages are
+returned with incremental vacuum.
+"""
+import os
+import re
+import time
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import text, select, delete, func, table as table_clause, column
+
+EPOCH = datetime(1970, 1, 1)
+PARTITION_BOUNDS = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+class DetectionRetention:
+    """Time windowed storage of the detections table, expired by a background thread"""
+
+    def __init__(self, engine, table, retention_hours=0.0, partition_hours=24.0, premake=2,
+                 archive_dir=None, interval=300.0, batch_size=10000, expired=None):
+        """
+        Args:
+            engine: Sync engine of the database
+            table: The detections Table, partitioned on detection_time under PostgreSQL
+            retention_hours: Windows that ended longer ago than this are expired, 0 (default) keeps everything
+            partition_hours: Width of a window
+            premake: Partitions created ahead of the current one
+            archive_dir: Expired windows are exported here before they are dropped, None to skip
+            interval: Seconds between maintenance passes
+            batch_size: Rows per archive chunk and per SQLite delete
+            expired: Called with the end of every window after its rows were removed
+        """
+        self.engine = engine
+        self.table = table
+        self.retention = timedelta(hours=retention_hours)
+        self.width = timedelta(hours=partition_hours)
+        self.premake = premake
+        self.archive_dir = archive_dir
+        self.interval = interval
+        self.batch_size = batch_size
+        self.expired = expired
+        # Known after the first prepare(); tables created before partitioning was added are not
+        self.partitioned = None
+
+        self.stop_event = threading.Event()
+        self.worker = None
+
+        self.stats_lock = threading.Lock()
+        self.passes = 0
+        self.last_pass = 0.0
+        self.created_partitions = 0
+        self.expired_windows = 0
+        self.expired_rows = 0
+        self.archived_rows = 0
+        self.archive_files = 0
+
+    def start(self):
+        """Create the partitions of the current window before the first insert, then maintain them"""
+        if self.worker is None:
+            self.prepare()
+            self.stop_event.clear()
+            self.worker = threading.Thread(target=self._run, daemon=True)
+            self.worker.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.worker is not None:
+            self.worker.join()
+            self.worker = None
+
+    def window_start(self, moment):
+        """Start of the window a time falls in, windows are aligned to the Unix epoch"""
+        return EPOCH + self.width * ((moment - EPOCH) // self.width)
+
+    def rows_of(self, name):
+        """Table clause with the detection columns for a partition or the default partition"""
+        return table_clause(name, *(column(c.name, c.type) for c in self.table.columns))
+
+    def partition_name(self, start):
+        return f"{self.table.name}_p{start:%Y%m%d%H%M}"
+
+    def partitions(self, connection):
+        """(name, start, end) of the range partitions, oldest first"""
+        rows = connection.execute(text(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = CAST(:parent AS regclass)"
+        ), {"parent": self.table.name}).all()
+        partitions = []
+        for name, bound in rows:
+            match = PARTITION_BOUNDS.search(bound)
+            if match:  # The default partition has no bounds
+                partitions.append((name, datetime.fromisoformat(match.group(1)),
+                                   datetime.fromisoformat(match.group(2))))
+        return sorted(partitions, key=lambda partition: partition[1])
+
+    def prepare(self, now=None):
+        """Default partition, then one partition per window from the current one to `premake` ahead"""
+        parent = self.table.name
+        if self.partitioned is None:
+            self.partitioned = False
+            if self.engine.dialect.name == 'postgresql':
+                with self.engine.connect() as connection:
+                    self.partitioned = connection.execute(text(
+                        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = CAST(:parent AS regclass)"
+                    ), {"parent": parent}).first() is not None
+                if not self.partitioned:
+                    print(f"Table {parent} is not partitioned, expired detections are deleted instead")
+        if not self.partitioned:
+            return
+        now = now or datetime.utcnow()
+        with self.engine.begin() as connection:
+            connection.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {parent}_default PARTITION OF {parent} DEFAULT"
+            ))
+        with self.engine.connect() as connection:
+            existing = {start for _, start, _ in self.partitions(connection)}
+        first = self.window_start(now)
+        for index in range(self.premake + 1):
+            start = first + self.width * index
+            if start not in existing:
+                self.create_partition(start)
+
+    def create_partition(self, start):
+        """
+        Partition of the window starting at `start`. It is built as a plain table and then
+        attached, which takes a weaker lock on the parent than CREATE TABLE ... PARTITION OF
+        and moves rows that landed in the default partition, e.g. after a clock jump.
+        """
+        end = start + self.width
+        parent, name = self.table.name, self.partition_name(start)
+        bounds = {"start": start, "end": end}
+        with self.engine.begin() as connection:
+            # Vacuumed after 2% dead rows instead of 20%, the current window takes the replace churn
+            connection.execute(text(
+                f"CREATE TABLE {name} (LIKE {parent} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+                f"WITH (autovacuum_vacuum_scale_factor = 0.02)"
+            ))
+            connection.execute(text(
+                f"WITH moved AS (DELETE FROM {parent}_default WHERE detection_time >= :start "
+                f"AND detection_time < :end RETURNING *) INSERT INTO {name} SELECT * FROM moved"
+            ), bounds)
+            connection.execute(text(
+                f"ALTER TABLE {parent} ATTACH PARTITION {name} "
+                f"FOR VALUES FROM ('{start.isoformat(' ')}') TO ('{end.isoformat(' ')}')"
+            ))
+        with self.stats_lock:
+            self.created_partitions += 1
+
+    def expire(self, now=None):
+        """
+        Archive and remove every window that ended before now - retention
+
+        Returns:
+            int: Number of rows removed
+        """
+        if not self.retention:
+            return 0
+        cutoff = (now or datetime.utcnow()) - self.retention
+        removed = 0
+
+        if self.partitioned:
+            with self.engine.connect() as connection:
+                expired = [partition for partition in self.partitions(connection) if partition[2] <= cutoff]
+            for name, start, end in expired:
+                removed += self.archive(select(self.rows_of(name)), start)
+                with self.engine.begin() as connection:
+                    connection.execute(text(f"DROP TABLE {name}"))
+                self._expired(end)
+            # Rows outside of any partition are expired like under SQLite
+            removed += self.expire_rows(self.rows_of(f"{self.table.name}_default"), cutoff)
+        else:
+            removed = self.expire_rows(self.table, cutoff)
+            if self.engine.dialect.name == 'sqlite':
+                with self.engine.begin() as connection:
+                    connection.execute(text("PRAGMA incremental_vacuum"))
+
+        with self.stats_lock:
+            self.expired_rows += removed
+        return removed
+
+    def expire_rows(self, table, cutoff):
+        """Archive and delete the rows of `table` window by window, in batches along the time index"""
+        with self.engine.connect() as connection:
+            oldest = connection.execute(select(func.min(table.c.detection_time))).scalar()
+        removed = 0
+        if oldest is None:
+            return removed
+        start = self.window_start(oldest)
+        while start + self.width <= cutoff and not self.stop_event.is_set():
+            end = start + self.width
+            in_window = (table.c.detection_time >= start) & (table.c.detection_time < end)
+            self.archive(select(table).where(in_window), start)
+            while True:
+                with self.engine.begin() as connection:
+                    batch = select(table.c.detection_id).where(in_window).limit(self.batch_size)
+                    deleted = connection.execute(delete(table).where(table.c.detection_id.in_(batch))).rowcount
+                removed += deleted
+                if deleted < self.batch_size:
+                    break
+            self._expired(end)
+            start = end
+        return removed
+
+    def _expired(self, end):
+        with self.stats_lock:
+            self.expired_windows += 1
+        if self.expired is not None:
+            self.expired(end)
+
+    def archive(self, query, start):
+        """
+        Export the rows of a window to <archive_dir>/<table>_<window start>.parquet
+
+        Returns:
+            int: Number of rows exported, or of rows in the window when archiving is off
+        """
+        if self.archive_dir is None:
+            with self.engine.connect() as connection:
+                return connection.execute(select(func.count()).select_from(query.subquery())).scalar()
+
+        # Only needed when archiving is configured
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        types = {int: pa.int64(), float: pa.float64(), str: pa.string(), datetime: pa.timestamp('us')}
+        schema = pa.schema([(column.name, types[column.type.python_type]) for column in self.table.columns])
+        os.makedirs(self.archive_dir, exist_ok=True)
+        path = os.path.join(self.archive_dir, f"{self.table.name}_{start:%Y%m%d%H%M}.parquet")
+        # A window whose delete was interrupted is exported again, into a new file
+        suffix = 1
+        while os.path.exists(path):
+            path = os.path.join(self.archive_dir, f"{self.table.name}_{start:%Y%m%d%H%M}-{suffix}.parquet")
+            suffix += 1
+
+        rows = 0
+        partial = path + '.part'
+        with self.engine.connect() as connection, pq.ParquetWriter(partial, schema, compression='zstd') as writer:
+            result = connection.execution_options(stream_results=True).execute(query)
+            for chunk in result.partitions(self.batch_size):
+                writer.write_batch(pa.RecordBatch.from_pylist([row._asdict() for row in chunk], schema=schema))
+                rows += len(chunk)
+        # Only complete files carry the .parquet name, and only then is the window dropped
+        os.replace(partial, path)
+        with self.stats_lock:
+            self.archived_rows += rows
+            self.archive_files += 1
+        return rows
+
+    def maintain(self, now=None):
+        """One pass: partitions ahead, then expiry"""
+        start = time.perf_counter()
+        self.prepare(now)
+        self.expire(now)
+        with self.stats_lock:
+            self.passes += 1
+            self.last_pass = time.perf_counter() - start
+
+    def stats(self):
+        with self.stats_lock:
+            return {
+                'partitioned': self.partitioned,
+                'retention_hours': self.retention / timedelta(hours=1),
+                'partition_hours': self.width / timedelta(hours=1),
+                'passes': self.passes,
+                'last_pass_ms': self.last_pass * 1000,
+                'created_partitions': self.created_partitions,
+                'expired_windows': self.expired_windows,
+                'expired_rows': self.expired_rows,
+                'archived_rows': self.archived_rows,
+                'archive_files': self.archive_files,
+            }
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.maintain()
+            except Exception as e:
+                print(f"Error maintaining detection history: {e}")
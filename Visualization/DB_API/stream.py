@@ -0,0 +1,145 @@
+# stream.py
+"""
+Push delivery of table changes to the map.
+
+A DeltaStream numbers every committed change set (rows added, updated and removed)
+and fans it out to Server-Sent Events subscribers. The last `history` change sets are
+kept, so a client that reconnects with the id of the last event it saw (the standard
+SSE Last-Event-ID header, or ?since=) only receives what it missed. Clients too far
+behind, and new clients, first get a snapshot of the whole table. Change sets may
+overlap the snapshot, so clients apply them by primary key: removes first, as a key
+can be deleted and reused within one change set, then adds and updates replace the row.
+
+Publishing happens on the request threads of the sync endpoints, the subscribers live
+on the event loop, so events are handed over with call_soon_threadsafe.
+"""
+import os
+import json
+import asyncio
+import threading
+from collections import deque
+
+
+class DeltaStream:
+    """Sequence-numbered change sets of one table, replayable from a bounded history"""
+
+    def __init__(self, snapshot, history=1024, queue_size=256, keepalive=15.0):
+        """
+        Args:
+            snapshot: Called without arguments, returns all current rows as dicts
+            history: Change sets kept for resuming clients
+            queue_size: Change sets buffered per subscriber before it is dropped
+            keepalive: Seconds without changes after which a comment line is sent, so idle
+                       connections survive proxies and dead clients are noticed
+        """
+        self.snapshot = snapshot
+        self.keepalive = keepalive
+        self.history = deque(maxlen=history)
+        self.queue_size = queue_size
+        # Event ids are <epoch>-<seq>, ids from before a restart lead to a snapshot
+        self.epoch = os.urandom(4).hex()
+        self.seq = 0
+        self.lock = threading.Lock()
+        self.subscribers = set()
+        self.loop = None
+
+        self.published = 0
+        self.dropped_subscribers = 0
+
+    def bind(self, loop):
+        """Event loop the subscribers run on, set at application startup"""
+        self.loop = loop
+
+    def publish(self, added=(), updated=(), removed=()):
+        """
+        Record one committed change set and push it to the subscribers
+
+        Args:
+            added: New rows as dicts
+            updated: Changed rows as dicts
+            removed: Primary keys of deleted rows
+        """
+        if not (added or updated or removed):
+            return
+        with self.lock:
+            self.seq += 1
+            event = (self.seq, self.format_event('delta', self.seq, {
+                'added': list(added), 'updated': list(updated), 'removed': list(removed)
+            }))
+            self.history.append(event)
+            self.published += 1
+            subscribers = list(self.subscribers)
+        if self.loop is not None:
+            for queue in subscribers:
+                self.loop.call_soon_threadsafe(self._deliver, queue, event)
+
+    def _deliver(self, queue, event):
+        if not queue.full():
+            queue.put_nowait(event)
+            return
+        # A client this far behind is disconnected, it resumes from the history or a snapshot
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+        with self.lock:
+            self.subscribers.discard(queue)
+            self.dropped_subscribers += 1
+
+    def parse_id(self, event_id):
+        """Sequence number of an event id of this stream, None for foreign or malformed ids"""
+        epoch, _, seq = (event_id or '').partition('-')
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    async def subscribe(self, last_event_id=None):
+        """
+        Async generator of SSE messages: the missed change sets (or a snapshot), then live ones
+        """
+        since = self.parse_id(last_event_id)
+        queue = asyncio.Queue(self.queue_size)
+        with self.lock:
+            # Registered before the replay is taken, so nothing falls in between
+            self.subscribers.add(queue)
+            seq = self.seq
+            replay = None
+            if since is not None and self.history and since >= self.history[0][0] - 1 and since <= seq:
+                replay = [message for event_seq, message in self.history if event_seq > since]
+
+        try:
+            if replay is None:
+                rows = await asyncio.get_running_loop().run_in_executor(None, self.snapshot)
+                yield self.format_event('snapshot', seq, {'rows': rows})
+            else:
+                for message in replay:
+                    yield message
+            last = seq
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), self.keepalive)
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+                if event is None:
+                    return
+                event_seq, message = event
+                # Change sets already covered by the snapshot or the replay
+                if event_seq > last:
+                    last = event_seq
+                    yield message
+        finally:
+            with self.lock:
+                self.subscribers.discard(queue)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'seq': self.seq,
+                'subscribers': len(self.subscribers),
+                'published': self.published,
+                'dropped_subscribers': self.dropped_subscribers,
+            }
+
+    def format_event(self, name, seq, data):
+        return f"id: {self.epoch}-{seq}\nevent: {name}\ndata: {json.dumps(data, default=str)}\n\n"
@@ -1,25 +1,29 @@
 import React, { useState, useEffect } from "react";
 import Map, { Marker } from "react-map-gl";
 
+const API_URL = "http://localhost:7777";
 const REFRESH_INTERVAL = 10000; // 10 seconds
+// Stream errors without any event in between before falling back to polling
+const MAX_STREAM_FAILURES = 3;
 
 export default function App() {
   const [detections, setDetections] = useState([]);
   const [radars, setRadars] = useState([]);
 
-  // Fetch recent detections
+  // Fetch fused tracks, one per ship even where radars overlap
   const fetchDetections = async () => {
     try {
-      const response = await fetch(
-        "http://localhost:7777/detections/recent/?minutes=10000",
-      );
+      const response = await fetch(`${API_URL}/fused_tracks/`);
       const data = await response.json();
       setDetections(data);
     } catch (error) {
-      console.error("Error fetching detections:", error);
+      console.error("Error fetching fused tracks:", error);
     }
+  };
+
+  const fetchRadars = async () => {
     try {
-      const response = await fetch("http://localhost:7777/radars");
+      const response = await fetch(`${API_URL}/radars`);
       const data = await response.json();
       setRadars(data);
     } catch (error) {
@@ -27,13 +31,60 @@ export default function App() {
     }
   };
 
-  // Initial fetch and setup interval
+  // Radars change rarely and are polled
   useEffect(() => {
-    fetchDetections();
-    const interval = setInterval(fetchDetections, REFRESH_INTERVAL);
+    fetchRadars();
+    const interval = setInterval(fetchRadars, REFRESH_INTERVAL);
     return () => clearInterval(interval);
   }, []);
 
+  // Fused tracks are pushed by the API; polling is the fallback where the stream is unavailable
+  useEffect(() => {
+    let interval = null;
+    const startPolling = () => {
+      fetchDetections();
+      interval = setInterval(fetchDetections, REFRESH_INTERVAL);
+    };
+    if (typeof EventSource === "undefined") {
+      startPolling();
+      return () => clearInterval(interval);
+    }
+
+    // EventSource reconnects by itself and resumes after the last event id it received
+    const source = new EventSource(`${API_URL}/stream/fused_tracks`);
+    const tracks = new globalThis.Map();
+    let failures = 0;
+    const show = () => setDetections(Array.from(tracks.values()));
+
+    source.addEventListener("snapshot", (event) => {
+      failures = 0;
+      tracks.clear();
+      JSON.parse(event.data).rows.forEach((track) => tracks.set(track.fused_id, track));
+      show();
+    });
+    source.addEventListener("delta", (event) => {
+      failures = 0;
+      const { added, updated, removed } = JSON.parse(event.data);
+      // Removes first, an id can be removed and reused within one delta
+      removed.forEach((fusedId) => tracks.delete(fusedId));
+      added.concat(updated).forEach((track) => tracks.set(track.fused_id, track));
+      show();
+    });
+    source.onerror = () => {
+      failures += 1;
+      if (failures >= MAX_STREAM_FAILURES && interval === null) {
+        console.log("Fused track stream unavailable, polling instead");
+        source.close();
+        startPolling();
+      }
+    };
+
+    return () => {
+      source.close();
+      clearInterval(interval);
+    };
+  }, []);
+
   return (
     <div className="w-screen h-screen">
       <Map
@@ -48,7 +99,7 @@ export default function App() {
       >
         {detections.map((detection) => (
           <Marker
-            key={detection.detection_id}
+            key={detection.fused_id}
             latitude={detection.latitude}
             longitude={detection.longitude}
           >
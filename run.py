@@ -8,12 +8,32 @@ import websocket
 import threading
 import argparse
 import numpy as np
+from OnboardSoftware.ppi_codec import decode_message, negotiation_message, FORMAT_BINARY
+from OnboardSoftware.frame_shards import ShardWriter
+
+OUTPUT_SHARDS = 'shards'
+OUTPUT_JSON = 'json'
+
+
+def clip_ppi(radar_id, data):
+    """Clip the PPI like the dataset always has been, at min(5000, mean + 2/3 std)"""
+    ppi = data['PPI']
+    mean = np.mean(ppi)
+    std = np.std(ppi)
+    data['PPI'] = np.clip(ppi, 0, min(5000, mean + (2/3) * std))
+    return data
 
 class SimulationManager:
-    def __init__(self, config_path, unity_exe_path, output_dir):
+    def __init__(self, config_path, unity_exe_path, output_dir, output_format=OUTPUT_SHARDS,
+                 compress=False, shard_size_mb=256, max_pending=64):
         self.config = self.load_config(config_path)
         self.unity_exe_path = unity_exe_path
         self.output_dir = output_dir
+        self.output_format = output_format
+        self.compress = compress
+        self.shard_size_mb = shard_size_mb
+        self.max_pending = max_pending
+        self.writer = None
         self.simulation_process = None
         self.websocket_threads = []
         self.stop_event = threading.Event()
@@ -33,6 +53,7 @@ class SimulationManager:
 
     def collect_radar_data(self, radar_id):
         ws = websocket.WebSocketApp(f"ws://localhost:8080/radar{radar_id}",
+                                    on_open=lambda ws: ws.send(negotiation_message(FORMAT_BINARY)),
                                     on_message=lambda ws, msg: self.on_message(radar_id, msg),
                                     on_error=lambda ws, err: print(f"Radar {radar_id} error: {err}"),
                                     on_close=lambda ws: print(f"Radar {radar_id} connection closed"))
@@ -44,26 +65,44 @@ class SimulationManager:
                 time.sleep(5)  # Wait before reconnecting
 
     def on_message(self, radar_id, message):
-        data = json.loads(message)
-        timestamp = int(time.time())
-        filename = f"{self.output_dir}/radar_{radar_id}_{timestamp}.json"
+        data = decode_message(message)
+        if data is None:
+            return
 
-        # Extract the PPI array
-        ppi = np.array(data['PPI'], dtype=np.float32)
+        if self.writer is not None:
+            # Clipping, encoding and disk writes happen on the writer thread
+            self.writer.write(radar_id, data)
+            return
 
-        mean = np.mean(ppi)
-        std = np.std(ppi)
-        ppi = np.clip(ppi, 0, min(5000, mean + (2/3) * std))
+        # Millisecond timestamps so two frames in the same second do not overwrite each other
+        timestamp = int(time.time() * 1000)
+        filename = f"{self.output_dir}/radar_{radar_id}_{timestamp}.json"
 
-        data['PPI'] = ppi.tolist()
+        data = clip_ppi(radar_id, data)
+        data['PPI'] = data['PPI'].tolist()
         
         with open(filename, 'w') as f:
             json.dump(data, f)
 
+    def print_writer_stats(self):
+        stats = self.writer.stats()
+        print(f"Frames written: {stats['frames']}, {stats['bytes_per_s'] / 1e6:.1f} MB/s, "
+              f"backlog: {stats['backlog']} (max {stats['max_backlog']}), "
+              f"blocked writes: {stats['blocked_writes']}, shards: {stats['shards']}")
+
     def run(self):
         self.start_simulation()
         time.sleep(10)  # Wait for the simulation to start up
 
+        if self.output_format == OUTPUT_SHARDS:
+            self.writer = ShardWriter(
+                self.output_dir,
+                max_shard_bytes=self.shard_size_mb * 1024 * 1024,
+                compress=self.compress,
+                max_pending=self.max_pending,
+                transform=clip_ppi
+            ).start()
+
         for i in range(self.config['nRadars']):
             thread = threading.Thread(target=self.collect_radar_data, args=(i,))
             thread.start()
@@ -71,7 +110,9 @@ class SimulationManager:
 
         try:
             while True:
-                time.sleep(1)
+                time.sleep(10)
+                if self.writer is not None:
+                    self.print_writer_stats()
         except KeyboardInterrupt:
             print("Stopping simulation...")
             self.stop()
@@ -85,13 +126,24 @@ class SimulationManager:
         for thread in self.websocket_threads:
             thread.join()
 
+        if self.writer is not None:
+            self.writer.stop()
+            self.print_writer_stats()
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Simulation Manager")
     parser.add_argument("config_path", help="Path to the configuration file")
+    parser.add_argument("--output-format", choices=[OUTPUT_SHARDS, OUTPUT_JSON], default=OUTPUT_SHARDS,
+                        help="Write frames to rolling binary shards or one JSON file per frame")
+    parser.add_argument("--compress", action="store_true", help="zlib-compress shard records")
+    parser.add_argument("--shard-size", type=int, default=256, help="Shard size in MB")
+    parser.add_argument("--max-pending", type=int, default=64, help="Frames buffered before collection waits on disk")
     
     args = parser.parse_args()
 
-    manager = SimulationManager(args.config_path, "", "")
+    manager = SimulationManager(args.config_path, "", "", output_format=args.output_format,
+                                compress=args.compress, shard_size_mb=args.shard_size,
+                                max_pending=args.max_pending)
 
     run_manager = False
     for key, value in manager.config.items():
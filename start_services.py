@@ -153,6 +153,10 @@ def load_config(config_path):
             if key not in config:
                 raise KeyError(f"Missing required configuration key: {key}")
                 
+        # Only centernet-infer.py accepts several radar IDs and batches them through one model
+        if config.get('shared_inference', False) and os.path.basename(config.get('onboard_name', '')) != 'centernet-infer.py':
+            raise ValueError(f"shared_inference requires onboard_name centernet-infer.py, not {config.get('onboard_name')}")
+
         # Convert paths to absolute paths
         for key in ['onboard_path', 'viz_path', 'api_path', 'db_path']:
             config[key] = os.path.abspath(os.path.expanduser(config[key]))
@@ -204,11 +208,18 @@ def main():
     clearall()
     
 
-    # Start onboard instances
-    for i in range(args.num_instances):
+    # Start onboard instances. With shared_inference a single process serves every
+    # radar with one batched model instead of one process (and model copy) per radar
+    if config.get('shared_inference', False):
+        onboard_groups = [list(range(args.num_instances))]
+    else:
+        onboard_groups = [[i] for i in range(args.num_instances)]
+
+    for group in onboard_groups:
+        radar_ids = ' '.join(str(i) for i in group)
         if not pm.start_process(
-            f'onboard_{i}',
-            f"{python_path} {config['onboard_name']} -r {i} {'-v' if config['plot_ppi'] else ' '} {'--model ' + config['model_path'] if config['model_path'] else ''}",
+            f"onboard_{'_'.join(str(i) for i in group)}",
+            f"{python_path} {config['onboard_name']} -r {radar_ids} {'-v' if config['plot_ppi'] else ' '} {'--model ' + config['model_path'] if config['model_path'] else ''}",
             f"{config['onboard_path']}"
         ):
             pm.stop_all()